@@ -0,0 +1,276 @@
+"""
+Prefix autocomplete for photo tags and usernames, served from memory.
+
+Each process keeps a sorted index per kind: tags weighted by the number of
+photos carrying them, users by how often they are tagged in photos. A prefix
+is a bisect into the sorted keys; the most popular completions of short
+prefixes, which match too many keys to scan per keystroke, are memoized
+until a key under them changes.
+
+Writers append changes to a Redis stream (`record_tags`, `record_user`);
+processes apply entries newer than the last one they have seen at most every
+PHOTO_AUTOCOMPLETE_SYNC_INTERVAL, and rebuild from the database every
+PHOTO_AUTOCOMPLETE_REBUILD_INTERVAL, which also repairs any drift. Entries
+older than that interval are trimmed since nothing still needs them.
+
+A rebuild takes the stream position after loading, so changes published
+while the snapshot was read are not replayed on top of it, and an entry is
+applied only if it is past the position the indexes already reflect.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+import redis
+from django.conf import settings
+from django.db.models import Count
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from photos.metrics import get_redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'autocomplete:changes'
+KINDS = ('tag', 'user')
+MAX_LIMIT = 50
+# Prefixes matching more keys than this are answered from the memo
+SCAN_LIMIT = 1000
+
+
+class PrefixIndex:
+    """Keys kept sorted for prefix ranges, each with a weight and a payload."""
+
+    def __init__(self, items=()):
+        self._entries = {key: [weight, payload] for key, weight, payload in items}
+        self._keys = sorted(self._entries)
+        self._memo = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def weight(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else 0
+
+    def add(self, key, delta, payload=None, keep_empty=False):
+        """Add `delta` to `key`'s weight, inserting it if new; drops keys at zero unless `keep_empty`."""
+        entry = self._entries.get(key)
+        if entry is None:
+            if delta <= 0 and not keep_empty:
+                return
+            entry = self._entries[key] = [0, payload]
+            insort(self._keys, key)
+        entry[0] += delta
+        if payload is not None:
+            entry[1] = payload
+        if entry[0] <= 0 and not keep_empty:
+            self.remove(key)
+        else:
+            self._forget(key)
+
+    def remove(self, key):
+        if self._entries.pop(key, None) is not None:
+            del self._keys[bisect_left(self._keys, key)]
+            self._forget(key)
+
+    def _forget(self, key):
+        for end in range(len(key) + 1):
+            self._memo.pop(key[:end], None)
+
+    def top(self, prefix, limit):
+        """Up to `limit` (key, weight, payload) starting with `prefix`, heaviest first."""
+        memo = self._memo.get(prefix)
+        if memo is not None:
+            return memo[:limit]
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + '\U0010ffff', lo)
+        count = MAX_LIMIT if hi - lo > SCAN_LIMIT else limit
+        best = heapq.nsmallest(
+            count,
+            (self._keys[i] for i in range(lo, hi)),
+            key=lambda key: (-self._entries[key][0], key),
+        )
+        result = [(key, *self._entries[key]) for key in best]
+        if hi - lo > SCAN_LIMIT:
+            self._memo[prefix] = result
+        return result[:limit]
+
+
+class _State:
+    def __init__(self):
+        # `lock` guards the indexes; `sync_lock` lets one thread at a time
+        # rebuild or catch up while the others keep serving
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.indexes = None
+        # Stream position the indexes reflect; None when built without Redis
+        self.last_id = None
+        self.synced_at = self.built_at = 0.0
+
+
+_state = _State()
+
+
+def _user_key(username, user_id):
+    # Usernames are unique case-sensitively; the id keeps "Bob" and "bob" apart
+    return f'{username.lower()}\0{user_id}'
+
+
+def _load():
+    """Fresh indexes from the database: tag counts in one query, tagged-in counts in another."""
+    from photos.facets import count_facets
+    from photos.models import Photo
+    from users.models import CustomUser
+
+    tags = {}
+    for _, tag, _, count in count_facets(Photo.objects.all(), ['tag']):
+        tags[tag.lower()] = tags.get(tag.lower(), 0) + count
+    users = CustomUser.objects.annotate(tagged=Count('tagged_in')).values_list('id', 'username', 'tagged')
+    return {
+        'tag': PrefixIndex((tag, count, None) for tag, count in tags.items()),
+        'user': PrefixIndex((_user_key(username, pk), tagged, (pk, username)) for pk, username, tagged in users),
+    }
+
+
+def _apply(indexes, fields):
+    kind, op = fields['kind'], fields['op']
+    if kind == 'tag':
+        indexes['tag'].add(fields['key'], int(fields['delta']))
+        return
+    user_id = int(fields['id'])
+    key = _user_key(fields['key'], user_id)
+    if op == 'remove':
+        indexes['user'].remove(key)
+    elif op == 'rename':
+        old_key = _user_key(fields['old'], user_id)
+        weight = indexes['user'].weight(old_key)
+        indexes['user'].remove(old_key)
+        indexes['user'].add(key, weight, (user_id, fields['key']), keep_empty=True)
+    else:
+        indexes['user'].add(key, int(fields['delta']), (user_id, fields['key']), keep_empty=True)
+
+
+def _stream_position(entry_id):
+    ms, _, seq = entry_id.partition('-')
+    return int(ms), int(seq or 0)
+
+
+def _rebuild(client):
+    indexes = _load()
+    last_id = None
+    if client is not None:
+        # Writers publish after their write, so entries up to here are in the
+        # snapshot; only later ones are replayed on top of it
+        try:
+            latest = client.xrevrange(STREAM_KEY, count=1)
+            last_id = latest[0][0] if latest else '0-0'
+        except redis.RedisError:
+            logger.warning('Autocomplete change stream unavailable', exc_info=True)
+    with _state.lock:
+        _state.indexes = indexes
+        _state.last_id = last_id
+    _state.built_at = time.monotonic()
+
+
+def _sync():
+    now = time.monotonic()
+    if _state.indexes is not None and now - _state.synced_at < settings.PHOTO_AUTOCOMPLETE_SYNC_INTERVAL:
+        return
+    # Until the first build every request waits for it; later, requests
+    # arriving while another thread syncs use the indexes as they are
+    if not _state.sync_lock.acquire(blocking=_state.indexes is None):
+        return
+    try:
+        if _state.indexes is not None and now - _state.synced_at < settings.PHOTO_AUTOCOMPLETE_SYNC_INTERVAL:
+            return
+        try:
+            client = get_redis()
+            stale = _state.indexes is None or now - _state.built_at > settings.PHOTO_AUTOCOMPLETE_REBUILD_INTERVAL
+            if not stale and _state.last_id is None:
+                # Built while Redis was down, so there is no telling which
+                # entries the indexes hold: rebuild once it answers again
+                client.ping()
+                stale = True
+            if stale:
+                _rebuild(client)
+            while _state.last_id is not None:
+                entries = client.xrange(STREAM_KEY, min=f'({_state.last_id}', count=1000)
+                with _state.lock:
+                    for entry_id, fields in entries:
+                        # Deltas are not idempotent: never apply an entry twice
+                        if _stream_position(entry_id) <= _stream_position(_state.last_id):
+                            continue
+                        _apply(_state.indexes, fields)
+                        _state.last_id = entry_id
+                if len(entries) < 1000:
+                    break
+        except redis.RedisError:
+            logger.warning('Autocomplete change stream unavailable', exc_info=True)
+            if _state.indexes is None:
+                _rebuild(None)
+        _state.synced_at = now
+    finally:
+        _state.sync_lock.release()
+
+
+def _publish(changes):
+    try:
+        # Entries older than a rebuild are never read again
+        min_id = int(time.time() * 1000) - int(settings.PHOTO_AUTOCOMPLETE_REBUILD_INTERVAL * 1000)
+        pipe = get_redis().pipeline(transaction=False)
+        for fields in changes:
+            pipe.xadd(STREAM_KEY, fields, minid=min_id, approximate=True)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not publish autocomplete changes', exc_info=True)
+
+
+def record_tags(deltas):
+    """Publish changes in the number of photos per tag ({tag: delta})."""
+    changes = [
+        {'kind': 'tag', 'op': 'add', 'key': tag.lower(), 'delta': delta}
+        for tag, delta in deltas.items() if delta
+    ]
+    if changes:
+        _publish(changes)
+
+
+def record_user(user, delta=0, op='add', old_username=None):
+    """
+    Publish a user change: `delta` more photos tagged with them (0 for a new
+    user), op='rename' with `old_username`, or op='remove'.
+    """
+    fields = {'kind': 'user', 'op': op, 'key': user.username, 'id': user.pk, 'delta': delta}
+    if old_username is not None:
+        fields['old'] = old_username
+    _publish([fields])
+
+
+def suggest(kind, prefix, limit):
+    """Most popular completions of `prefix` for `kind` ('tag' or 'user')."""
+    _sync()
+    prefix = prefix.strip().lower()
+    with _state.lock:
+        matches = _state.indexes[kind].top(prefix, limit)
+    if kind == 'tag':
+        return [{'value': key, 'count': weight} for key, weight, _ in matches]
+    return [{'id': pk, 'username': username, 'count': weight} for _, weight, (pk, username) in matches]
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def autocomplete(request):
+    """`?q=` prefix completions of `?kind=tag` (default) or `?kind=user`."""
+    kind = request.query_params.get('kind', 'tag')
+    if kind not in KINDS:
+        raise ValidationError({'kind': [f'Must be one of: {", ".join(KINDS)}.']})
+    limit = request.query_params.get('limit', '')
+    if limit and (not limit.isdigit() or int(limit) == 0):
+        raise ValidationError({'limit': ['Must be a positive integer.']})
+    limit = min(int(limit), MAX_LIMIT) if limit else settings.PHOTO_AUTOCOMPLETE_LIMIT
+    return Response(suggest(kind, request.query_params.get('q', ''), limit))
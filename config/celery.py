@@ -1,6 +1,7 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -15,3 +16,16 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def close_database_pools(**kwargs):
+    """
+    Close this process's connection pools before it forks the prefork
+    children, so none inherits a pool sharing its sockets; each child opens
+    its own on first use.
+    """
+    from django.db import connections
+    for connection in connections.all():
+        if connection.settings_dict.get('OPTIONS', {}).get('pool'):
+            connection.close_pool()
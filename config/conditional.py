@@ -0,0 +1,60 @@
+"""
+Conditional GET for API views.
+
+Views derive a strong ETag from cheap version markers (see
+events/cache.get_version) plus everything else the response depends on, and
+answer `If-None-Match` with 304 before running a query or serializer.
+"""
+import hashlib
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(request, *markers):
+    """
+    Strong ETag for `markers` as seen by this request: the path, query,
+    negotiated format and user all change the response body.
+    """
+    user = request.user.pk if request.user.is_authenticated else ''
+    parts = (
+        *map(str, markers),
+        request.path,
+        '&'.join(sorted(f'{key}={value}' for key, values in request.query_params.lists() for value in values)),
+        request.META.get('HTTP_ACCEPT', ''),
+        str(user),
+    )
+    return '"%s"' % hashlib.sha1('\0'.join(parts).encode()).hexdigest()
+
+
+def _matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # Weak comparison (RFC 9110 13.1.2): compression middleware weakens the
+    # tags it sends, so W/"x" must still match "x"
+    tags = parse_etags(header)
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def conditional(request, etag, respond):
+    """
+    Return 304 Not Modified if the client already has `etag`, otherwise
+    `respond()` with the ETag attached. `etag` None (no marker available)
+    always responds.
+    """
+    if etag is None:
+        return respond()
+    if _matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = respond()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate; it can be per user
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
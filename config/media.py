@@ -0,0 +1,161 @@
+"""
+Media file delivery.
+
+Views resolve and authorize the file, then `send_file` hands the transfer to
+the mode selected by PHOTO_MEDIA_SERVING. Only public renditions are served
+at MEDIA_URL (`serve_media`); originals need the authorized download view.
+
+- 'x-accel': nginx sends it (`X-Accel-Redirect` to an internal location
+  aliased to MEDIA_ROOT, PHOTO_MEDIA_ACCEL_PREFIX).
+- 'x-sendfile': Apache mod_xsendfile or lighttpd send it (`X-Sendfile`).
+- 'python': served here, with Range and If-None-Match support. The response
+  body is the open file itself, so WSGI servers whose wsgi.file_wrapper uses
+  os.sendfile (gunicorn) send it without copying through Python; ASGI
+  servers stream it in BLOCK_SIZE chunks.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import content_disposition_header, http_date, parse_etags
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+# Renditions meant for anyone who can see the gallery; only these are served
+# at MEDIA_URL without authentication. Originals go through an authorized view.
+PUBLIC_PREFIXES = ('photos/thumbnails/', 'photos/watermarked/')
+BLOCK_SIZE = 512 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class _FileRange:
+    """The next `length` bytes of an open file; exposes fileno() for sendfile."""
+
+    def __init__(self, file, length):
+        self._file = file
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size) if size else b''
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def _resolve(path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Invalid path')
+    if not os.path.isfile(full_path):
+        raise Http404('File not found')
+    return full_path
+
+
+def parse_byte_range(header, size):
+    """
+    Inclusive (start, end) for a single `bytes=` range, None when the header
+    should be ignored (malformed or several ranges), False if unsatisfiable.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+def _file_response(request, full_path, content_type):
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        fresh = any(tag in ('*', etag, 'W/' + etag) for tag in parse_etags(if_none_match))
+    else:
+        fresh = not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime)
+    if fresh:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and (not if_range or if_range == etag):
+        byte_range = parse_byte_range(request.META['HTTP_RANGE'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    start, end = byte_range or (0, size - 1)
+
+    file = open(full_path, 'rb')
+    file.seek(start)
+    response = FileResponse(
+        _FileRange(file, end - start + 1),
+        content_type=content_type,
+        status=206 if byte_range else 200,
+    )
+    response.block_size = BLOCK_SIZE
+    response['Content-Length'] = str(end - start + 1)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+def send_file(request, path, download_name=None, cache_control=None):
+    """
+    Response delivering MEDIA_ROOT/`path`. Raises Http404 if there is no
+    such file. `download_name` makes it an attachment.
+    """
+    full_path = _resolve(path)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    if settings.PHOTO_MEDIA_SERVING == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.PHOTO_MEDIA_ACCEL_PREFIX + quote(path)
+    elif settings.PHOTO_MEDIA_SERVING == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+    else:
+        response = _file_response(request, full_path, content_type)
+
+    if download_name:
+        response['Content-Disposition'] = content_disposition_header(True, download_name)
+    if cache_control and response.status_code in (200, 206, 304):
+        response['Cache-Control'] = cache_control
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Public renditions at MEDIA_URL; anything else is not found here."""
+    if not path.startswith(PUBLIC_PREFIXES):
+        raise Http404('File not found')
+    # Rendition names derive from the uniquely named original, so they never change
+    return send_file(request, path, cache_control=settings.PHOTO_RENDITION_CACHE_CONTROL)
@@ -0,0 +1,77 @@
+"""
+Response compression above a size threshold.
+
+Like django.middleware.gzip.GZipMiddleware, but negotiates brotli when the
+optional `brotli` package is installed, only compresses text-like content
+(JPEG renditions and ZIP downloads do not shrink) and leaves bodies under
+PHOTO_COMPRESS_MIN_BYTES alone, where headers and CPU outweigh the savings.
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def _accepted_codings(header):
+    """Codings in an Accept-Encoding header that are not refused with q=0."""
+    codings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+def _compress(coding, content):
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.PHOTO_COMPRESS_BROTLI_QUALITY)
+    return compress_string(content)
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.PHOTO_COMPRESS_MIN_BYTES:
+            return response
+
+        accepted = _accepted_codings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            coding = 'br'
+        elif 'gzip' in accepted:
+            coding = 'gzip'
+        else:
+            return response
+
+        compressed = _compress(coding, response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        # The encoded bytes differ from the identity ones, so the tag can no
+        # longer be strong (config.conditional compares weakly)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
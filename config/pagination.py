@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class NewestFirstCursorPagination(CursorPagination):
+    """
+    Cursor pagination on created_at, newest first, with no COUNT(*).
+
+    DRF positions the cursor on the first ordering field only: each page is a
+    range scan on the (created_at, id) index from the cursor's created_at, and
+    rows sharing that timestamp are skipped with a small offset carried in the
+    cursor. `id` keeps the order of such ties stable between pages.
+    """
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    ordering = ('-created_at', '-id')
+
+
+class OldestFirstCursorPagination(NewestFirstCursorPagination):
+    ordering = ('created_at', 'id')
@@ -0,0 +1,44 @@
+"""
+orjson-based JSON renderer and parser for Django REST framework.
+
+Drop-in replacements for DRF's JSONRenderer/JSONParser: the wire format is
+the same, encoding and decoding are several times faster. Types orjson does
+not know natively (lazy translation strings, Decimal, querysets...) go through
+DRF's own JSONEncoder.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = orjson.OPT_NON_STR_KEYS
+        # Honour `Accept: application/json; indent=...` like JSONRenderer (orjson only indents by 2)
+        if accepted_media_type and 'indent' in accepted_media_type:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,85 @@
+"""
+Ranked search over photos (their tags), events (name, location,
+description) and comments.
+
+Each model has a `search_vector` column generated by Postgres and GIN
+indexed, matched with websearch syntax (quoted phrases, `or`, `-word`).
+For typo tolerance a row also matches when the query is word-similar
+(pg_trgm) to its raw text: photo tags, event name or comment content, each
+with a gin_trgm_ops index.
+
+The rank is ts_rank plus that word similarity, so rows containing the terms
+as typed (similarity 1) come before rows only matched despite a typo.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from events.models import Event
+from events.serializers import EventSerializer
+from photos.models import Photo
+from photos.serializers import PhotoSerializer, annotate_for_serializer, compile_photo_renderer
+from social.models import Comment
+from social.serializers import CommentSearchResultSerializer
+
+# The text search configuration the search_vector columns are generated with
+SEARCH_CONFIG = 'english'
+MAX_QUERY_LENGTH = 200
+
+
+def ranked(queryset, q, text_field, newest):
+    """
+    Rows of `queryset` matching `q`, best first. Only the newest
+    PHOTO_SEARCH_CANDIDATES matches (ordered by `newest`) are ranked.
+    """
+    query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+    matches = queryset.filter(Q(search_vector=query) | Q(**{f'{text_field}__trigram_word_similar': q}))
+    candidates = matches.order_by(*newest).values('pk')[:settings.PHOTO_SEARCH_CANDIDATES]
+    return (
+        queryset.filter(pk__in=candidates)
+        .annotate(rank=SearchRank(F('search_vector'), query) + TrigramWordSimilarity(q, text_field))
+        .order_by('-rank', '-pk')
+    )
+
+
+def _limit(request):
+    limit = request.query_params.get('limit', '')
+    if not limit:
+        return settings.PHOTO_SEARCH_LIMIT
+    if not limit.isdigit() or int(limit) == 0:
+        raise ValidationError({'limit': ['Must be a positive integer.']})
+    return min(int(limit), settings.PHOTO_SEARCH_LIMIT)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def search(request):
+    """
+    `?q=` across photos, events and comments, up to `?limit=` of each. One
+    query per kind; photos are rendered like a gallery page.
+    """
+    q = request.query_params.get('q', '').strip()
+    if not q:
+        raise ValidationError({'q': ['This parameter is required.']})
+    if len(q) > MAX_QUERY_LENGTH:
+        raise ValidationError({'q': [f'Ensure this value has at most {MAX_QUERY_LENGTH} characters.']})
+    limit = _limit(request)
+
+    fields = PhotoSerializer.LIST_FIELDS
+    photos = ranked(Photo.objects.all(), q, 'search_text', ('-created_at', '-id'))
+    photos = annotate_for_serializer(photos, request.user, fields)[:limit]
+    events = ranked(Event.objects.defer('search_vector'), q, 'name', ('-date', '-id'))[:limit]
+    comments = ranked(Comment.objects.all(), q, 'content', ('-created_at', '-id'))
+    comments = comments.select_related('engagement', 'author').only(
+        'id', 'content', 'created_at', 'engagement__photo', 'author__username',
+    )[:limit]
+
+    return Response({
+        'photos': compile_photo_renderer(fields)(photos, request),
+        'events': EventSerializer(events, many=True, context={'request': request}).data,
+        'comments': CommentSearchResultSerializer(comments, many=True).data,
+    })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from datetime import timedelta
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third party
     'rest_framework',
@@ -53,6 +55,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # CORS First
+    'config.middleware.CompressionMiddleware',  # Compresses what everything below returns
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,6 +98,26 @@ DATABASES = {
     }
 }
 
+# Connections are reused across requests. With psycopg 3 and psycopg-pool
+# installed each process shares a pool, checked on checkout, whose waits are
+# reported by GET /api/v1/photos/metrics/. Otherwise each thread keeps its
+# connection for PHOTO_DB_CONN_MAX_AGE seconds, checked before reuse; Django
+# advises against that under ASGI, so install the pool where Daphne serves.
+PHOTO_DB_POOL = {
+    'min_size': 2,  # connections kept open
+    'max_size': 10,  # the pool grows to this under load, closing extras once idle
+    'max_idle': 300,  # seconds before an idle extra connection is closed
+    'timeout': 10,  # seconds a request waits for a connection before failing
+    'max_lifetime': 1800,  # seconds before a connection is replaced
+}
+PHOTO_DB_CONN_MAX_AGE = 600
+
+if find_spec('psycopg') and find_spec('psycopg_pool'):
+    DATABASES['default']['OPTIONS'] = {'pool': PHOTO_DB_POOL}
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = PHOTO_DB_CONN_MAX_AGE
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,6 +173,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson encodes/decodes the same JSON several times faster than the stdlib
+    'DEFAULT_RENDERER_CLASSES': (
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'config.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
@@ -173,6 +206,163 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Photo processing is split into a live and an archive queue. A Redis worker
+# reading several queues serves them strictly by message priority, not by
+# weight, so the split comes from capacity: run a worker dedicated to the live
+# queue alongside one consuming both, so live photos never wait behind an
+# archive backlog and archive work keeps the shared worker's capacity. Periodic
+# maintenance (like flush, counter reconcile, deferred sweep) has its own
+# queue, outside the photo backlog, at top priority so a worker that also
+# reads the photo queues serves it first; a dedicated maintenance worker
+# keeps it from waiting for a running photo task as well.
+CELERY_TASK_ROUTES = {
+    'photos.tasks.sweep_deferred_photos_task': {'queue': 'maintenance', 'priority': 0},
+    'photos.tasks.*': {'queue': 'photos_archive'},
+    'social.tasks.*': {'queue': 'maintenance', 'priority': 0},
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+# Redis emulates priorities with one list per step; 0 is served first
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+# Prefetching would let a worker hoard low-priority tasks ahead of new ones
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Ack after the task finishes so work in a child killed for memory is redelivered
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+
+# Image worker memory watchdog
+# Pool children whose peak RSS has passed this are replaced once their current task finishes
+PHOTO_WORKER_RSS_CEILING_MB = 1536
+# Above this RSS, garbage is collected and freed heap trimmed after each task
+PHOTO_WORKER_TRIM_RSS_MB = 768
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = PHOTO_WORKER_RSS_CEILING_MB * 1024  # KiB
+
+# Photo processing scheduling
+# Events dated within this many days of today are treated as live
+PHOTO_LIVE_EVENT_WINDOW_DAYS = 1
+# Target seconds from upload to processed photo for live events
+PHOTO_LIVE_LATENCY_TARGET = 60
+# Every this many in-flight photos an uploader already has costs one priority step
+PHOTO_SCHEDULER_SHARE_STEP = 50
+
+# Adaptive degradation: past either threshold, watermarking and AI tagging
+# are deferred and only the thumbnail is produced
+PHOTO_DEGRADE_QUEUE_DEPTH = 300
+PHOTO_DEGRADE_OLDEST_AGE = 300  # seconds
+# A photo still pending this long after its task was sent is presumed lost
+# (worker crash) and no longer counts towards the oldest-age signal
+PHOTO_TASK_STALE_AFTER = 3600  # seconds
+# The deferred sweep only runs below this queue depth
+PHOTO_DEFERRED_SWEEP_MAX_DEPTH = 50
+PHOTO_DEFERRED_SWEEP_BATCH = 100
+# A claimed photo whose task has not finished after this long is swept again
+PHOTO_DEFERRED_CLAIM_TIMEOUT = 3600  # seconds
+# Photos whose deferred steps fail this many times are left alone
+PHOTO_DEFERRED_MAX_ATTEMPTS = 5
+CELERY_BEAT_SCHEDULE = {
+    'sweep-deferred-photos': {
+        'task': 'photos.tasks.sweep_deferred_photos_task',
+        'schedule': 60.0,
+    },
+    'flush-likes': {
+        'task': 'social.tasks.flush_likes_task',
+        'schedule': 2.0,
+    },
+    # Engagement counters are exact unless rows were edited outside the API
+    'reconcile-engagement-counters': {
+        'task': 'social.tasks.reconcile_engagement_counters_task',
+        'schedule': 3600.0,
+    },
+}
+
+# Image size limits
+# Images above this pixel count are rejected before decoding (decompression bombs)
+PHOTO_MAX_IMAGE_PIXELS = 150_000_000
+# Above this pixel count the watermarked rendition is capped to PHOTO_LARGE_IMAGE_MAX_EDGE
+PHOTO_LARGE_IMAGE_PIXELS = 40_000_000
+PHOTO_LARGE_IMAGE_MAX_EDGE = 6000
+# Only JPEG can be decoded at reduced scale (draft mode); other formats are
+# decoded at full size, so above this pixel count they are rejected
+PHOTO_MAX_FULL_DECODE_PIXELS = 40_000_000
+# Image formats accepted at upload, as detected from the file's magic bytes
+PHOTO_ALLOWED_FORMATS = ['JPEG', 'PNG', 'GIF', 'BMP', 'TIFF', 'WEBP']
+
+# Photo ingestion admission control
+# Queue depth (in tasks) above which uploads are accepted as queued (202)
+PHOTO_INGEST_SOFT_QUEUE_DEPTH = 500
+# Queue depth above which uploads are rejected with 429 + Retry-After
+PHOTO_INGEST_HARD_QUEUE_DEPTH = 5000
+# Max photos a single uploader may have pending/processing at once
+PHOTO_INGEST_PER_UPLOADER_LIMIT = 300
+# Floor for an uploader's fair share when many people upload at once
+PHOTO_INGEST_MIN_UPLOADER_SHARE = 50
+# Window (seconds) used to measure worker throughput
+PHOTO_INGEST_THROUGHPUT_WINDOW = 300
+# Assumed photos/sec when no throughput has been measured yet
+PHOTO_INGEST_NOMINAL_THROUGHPUT = 1.0
+# Celery queues counted towards the processing backlog (not `maintenance`)
+PHOTO_PROCESSING_QUEUES = ['photos_live', 'photos_archive']
+
+# Likes are recorded in Redis and flushed to Postgres in batches
+# How long a photo's cached like set is kept after its last toggle (seconds)
+PHOTO_LIKES_CACHE_TTL = 24 * 3600
+# Max photos persisted per flush_likes_task run
+PHOTO_LIKES_FLUSH_BATCH = 500
+
+# Event gallery response cache (events/cache.py)
+# Seconds a cached gallery page or event detail lives; bumps invalidate sooner
+PHOTO_GALLERY_CACHE_TTL = 60
+# How long a rebuilding request holds the single-flight lock (seconds)
+PHOTO_GALLERY_CACHE_LOCK_TIMEOUT = 10
+# How long other requests wait for that rebuild before building themselves (seconds)
+PHOTO_GALLERY_CACHE_WAIT = 2.0
+
+# Response compression (config/middleware.py); brotli is used when installed
+# Bodies smaller than this are sent uncompressed (bytes)
+PHOTO_COMPRESS_MIN_BYTES = 1024
+# 0-11; 5 compresses JSON close to the maximum at a fraction of the CPU
+PHOTO_COMPRESS_BROTLI_QUALITY = 5
+# Cache-Control for thumbnails and watermarked renditions; their names derive
+# from the uniquely named original, so a URL never changes content
+PHOTO_RENDITION_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Media delivery (config/media.py)
+# 'python' serves files from Django (os.sendfile under gunicorn), 'x-accel'
+# hands them to nginx, 'x-sendfile' to Apache mod_xsendfile or lighttpd
+PHOTO_MEDIA_SERVING = 'python'
+# Internal nginx location aliased to MEDIA_ROOT, used by 'x-accel'
+PHOTO_MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Event ZIP export (events/archive.py)
+# Photos fetched per round trip of the server-side cursor
+PHOTO_ARCHIVE_CURSOR_CHUNK = 500
+# How long a file's CRC is remembered for resumed downloads (seconds)
+PHOTO_ARCHIVE_CRC_TTL = 7 * 24 * 3600
+
+# Search (config/search.py)
+# Results returned per kind (photos, events, comments); ?limit= may lower it
+PHOTO_SEARCH_LIMIT = 20
+# Only the newest this many matches of each kind are ranked, which bounds the
+# cost of terms that match a large share of the photos
+PHOTO_SEARCH_CANDIDATES = 500
+
+# Facet counts on photo lists (photos/facets.py)
+# Values returned per facet, most frequent first
+PHOTO_FACET_SIZE = 20
+# Per-event counts are adjusted in place on writes and rebuilt after this
+# long, which repairs any drift (seconds)
+PHOTO_FACET_CACHE_TTL = 3600
+
+# Tag and username autocomplete (config/autocomplete.py)
+# Suggestions returned unless ?limit= asks for fewer or more (up to 50)
+PHOTO_AUTOCOMPLETE_LIMIT = 10
+# Each process applies published changes at most this often (seconds)
+PHOTO_AUTOCOMPLETE_SYNC_INTERVAL = 1.0
+# ... and reloads its index from the database this often (seconds)
+PHOTO_AUTOCOMPLETE_REBUILD_INTERVAL = 3600
 
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True  # For development convenience
@@ -14,18 +14,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+from config.autocomplete import autocomplete
+from config.media import serve_media
+from config.search import search
 from users.views import UserViewSet
-from events.views import EventViewSet
+from events.views import EventViewSet, download_zip
 from photos.views import PhotoViewSet
 from social.views import CommentViewSet, LikeViewSet
 
@@ -41,11 +45,16 @@ urlpatterns = [
     
     # API V1
     path('api/v1/', include(router.urls)),
+    path('api/v1/events/<slug:slug>/download.zip', download_zip, name='event-download-zip'),
+    path('api/v1/search/', search, name='search'),
+    path('api/v1/autocomplete/', autocomplete, name='autocomplete'),
     
     # Auth
     path('api/v1/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/v1/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media is delivered according to PHOTO_MEDIA_SERVING (config/media.py)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+]
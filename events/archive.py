@@ -0,0 +1,211 @@
+"""
+Streaming ZIP export of an event's photos.
+
+The archive is stored rather than deflated (the photos are already JPEG) and
+always ZIP64, so its layout depends only on the entry names and file sizes:
+the total length is known before the first byte is sent and any byte range
+can be produced on its own, which is what resumed downloads ask for.
+
+Each file's CRC is written in a data descriptor after its data, so files are
+read once while streaming. CRCs are cached in Redis; a resumed download only
+reads the files before its starting offset whose CRC it has not seen.
+"""
+import hashlib
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+import redis
+from django.conf import settings
+
+from photos.metrics import get_redis
+from photos.models import Photo
+
+Entry = namedtuple('Entry', 'name path size mtime')
+
+_LOCAL = struct.Struct('<IHHHHHIIIHH')
+_LOCAL_ZIP64 = struct.Struct('<HHQQ')
+_DESCRIPTOR = struct.Struct('<IIQQ')
+_CENTRAL = struct.Struct('<IHHHHHHIIIHHHHHII')
+_CENTRAL_ZIP64 = struct.Struct('<HHQQQ')
+_END64 = struct.Struct('<IQHHIIQQQQ')
+_END64_LOCATOR = struct.Struct('<IIQI')
+_END = struct.Struct('<IHHHHIIH')
+
+_VERSION = 45  # 4.5: ZIP64
+_FLAGS = 0x0808  # sizes and CRC in a data descriptor, UTF-8 names
+_MAX32 = 0xFFFFFFFF
+_READ_SIZE = 1024 * 1024
+
+
+def _dos_datetime(mtime):
+    t = time.localtime(max(mtime, 315532800))  # 1980-01-01, the earliest DOS date
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _crc_key(entry):
+    return f'archive:crc:{entry.path}:{entry.mtime}:{entry.size}'
+
+
+class EventArchive:
+    def __init__(self, entries):
+        self.entries = entries
+        self.crcs = [None] * len(entries)
+        self.offsets = []
+        offset = 0
+        for entry in entries:
+            self.offsets.append(offset)
+            offset += _LOCAL.size + len(entry.name) + _LOCAL_ZIP64.size + entry.size + _DESCRIPTOR.size
+        self.central_offset = offset
+        self.central_size = sum(_CENTRAL.size + len(e.name) + _CENTRAL_ZIP64.size for e in entries)
+        self.size = self.central_offset + self.central_size + _END64.size + _END64_LOCATOR.size + _END.size
+
+        digest = hashlib.sha1()
+        for entry in entries:
+            digest.update(b'%s\0%d\0%d\0' % (entry.name, entry.size, entry.mtime))
+        self.etag = f'"{digest.hexdigest()}"'
+
+    @classmethod
+    def for_event(cls, event):
+        """
+        Archive of the event's original photos, oldest first. Photos are read
+        through a server-side cursor; missing files are left out.
+        """
+        photos = (
+            Photo.objects.filter(event=event).exclude(original_image='')
+            .order_by('created_at', 'id').values_list('id', 'original_image')
+            .iterator(chunk_size=settings.PHOTO_ARCHIVE_CURSOR_CHUNK)
+        )
+        entries = []
+        for photo_id, name in photos:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # The id prefix keeps names unique and in upload order
+            entries.append(Entry(f'{photo_id}_{os.path.basename(name)}'.encode(), path, stat.st_size, stat.st_mtime_ns))
+        return cls(entries)
+
+    def stream(self, start=0, end=None):
+        """Yield bytes `start` to `end` (inclusive) of the archive."""
+        end = self.size - 1 if end is None else end
+        if start > 0:
+            self._load_cached_crcs(start)
+
+        for i, entry in enumerate(self.entries):
+            position = self.offsets[i]
+            if position > end:
+                return
+            header = self._local_header(entry)
+            yield from self._clip(header, position, start, end)
+
+            data_start = position + len(header)
+            data_end = data_start + entry.size
+            if data_end > start and data_start <= end:
+                lo, hi = max(start - data_start, 0), min(end + 1, data_end) - data_start
+                yield from self._read(i, lo, hi)
+            if data_end + _DESCRIPTOR.size > start and data_end <= end:
+                descriptor = _DESCRIPTOR.pack(0x08074B50, self._crc(i), entry.size, entry.size)
+                yield from self._clip(descriptor, data_end, start, end)
+
+        position = self.central_offset
+        for i, entry in enumerate(self.entries):
+            if position > end:
+                return
+            size = _CENTRAL.size + len(entry.name) + _CENTRAL_ZIP64.size
+            if position + size > start:
+                yield from self._clip(self._central_record(i), position, start, end)
+            position += size
+        yield from self._clip(self._end_records(), position, start, end)
+
+    @staticmethod
+    def _clip(data, position, start, end):
+        chunk = data[max(start - position, 0):max(end + 1 - position, 0)]
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _local_header(entry):
+        dos_time, dos_date = _dos_datetime(entry.mtime / 1e9)
+        return b''.join((
+            _LOCAL.pack(0x04034B50, _VERSION, _FLAGS, 0, dos_time, dos_date, 0, _MAX32, _MAX32,
+                        len(entry.name), _LOCAL_ZIP64.size),
+            entry.name,
+            _LOCAL_ZIP64.pack(0x0001, 16, entry.size, entry.size),
+        ))
+
+    def _read(self, i, lo, hi):
+        """Yield bytes [lo, hi) of entry i, recording its CRC when the whole file goes by."""
+        entry = self.entries[i]
+        crc = 0 if lo == 0 and hi == entry.size else None
+        with open(entry.path, 'rb') as f:
+            f.seek(lo)
+            remaining = hi - lo
+            while remaining:
+                chunk = f.read(min(_READ_SIZE, remaining))
+                if not chunk:
+                    # Shrunk since the archive was laid out; the promised length can't be met
+                    raise OSError(f'{entry.path} changed while being archived')
+                if crc is not None:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if crc is not None:
+            self._store_crc(i, crc)
+
+    def _crc(self, i):
+        if self.crcs[i] is None:
+            crc = 0
+            for chunk in self._read_all(self.entries[i]):
+                crc = zlib.crc32(chunk, crc)
+            self._store_crc(i, crc)
+        return self.crcs[i]
+
+    @staticmethod
+    def _read_all(entry):
+        with open(entry.path, 'rb') as f:
+            while chunk := f.read(_READ_SIZE):
+                yield chunk
+
+    def _store_crc(self, i, crc):
+        self.crcs[i] = crc
+        try:
+            get_redis().set(_crc_key(self.entries[i]), crc, ex=settings.PHOTO_ARCHIVE_CRC_TTL)
+        except redis.RedisError as e:
+            print(f"Could not cache archive CRC: {e}")
+
+    def _load_cached_crcs(self, start):
+        """Fetch cached CRCs of the entries a resumed download skips past."""
+        skipped = [i for i, offset in enumerate(self.offsets) if offset < start]
+        try:
+            client = get_redis()
+            for batch in range(0, len(skipped), 1000):
+                indexes = skipped[batch:batch + 1000]
+                for i, crc in zip(indexes, client.mget([_crc_key(self.entries[i]) for i in indexes])):
+                    if crc is not None:
+                        self.crcs[i] = int(crc)
+        except redis.RedisError as e:
+            print(f"Archive CRC cache unavailable: {e}")
+
+    def _central_record(self, i):
+        entry = self.entries[i]
+        dos_time, dos_date = _dos_datetime(entry.mtime / 1e9)
+        return b''.join((
+            _CENTRAL.pack(0x02014B50, _VERSION, _VERSION, _FLAGS, 0, dos_time, dos_date, self._crc(i),
+                          _MAX32, _MAX32, len(entry.name), _CENTRAL_ZIP64.size, 0, 0, 0, 0, _MAX32),
+            entry.name,
+            _CENTRAL_ZIP64.pack(0x0001, 24, entry.size, entry.size, self.offsets[i]),
+        ))
+
+    def _end_records(self):
+        count = len(self.entries)
+        end64_offset = self.central_offset + self.central_size
+        return b''.join((
+            _END64.pack(0x06064B50, _END64.size - 12, _VERSION, _VERSION, 0, 0, count, count,
+                        self.central_size, self.central_offset),
+            _END64_LOCATOR.pack(0x07064B50, 0, end64_offset, 1),
+            _END.pack(0x06054B50, 0, 0, 0xFFFF, 0xFFFF, _MAX32, _MAX32, 0),
+        ))
@@ -0,0 +1,126 @@
+"""
+Redis response cache for event galleries.
+
+When an event's QR code is on screen, hundreds of phones request the same
+gallery page at once. Responses for an event are cached under a per-event
+version number: anything that changes what the gallery shows (uploads
+finishing, likes, comments, tags, edits) calls `bump(event_id)`, which
+orphans every cached page of that event at once; orphaned entries expire via
+their TTL.
+
+On a miss only one request rebuilds the entry (single-flight). Others wait
+briefly for it to appear and only build themselves if it does not.
+
+The same version numbers double as cheap ETag markers (`get_version`): every
+bump also increments a global version, which covers photos outside any event.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+import orjson
+import redis
+from django.conf import settings
+
+from config.renderers import ORJSONRenderer
+from photos.metrics import get_redis, incr_counter
+
+
+GLOBAL_VERSION_KEY = 'gallery:version'
+
+
+def _version_key(event_id):
+    return f'gallery:event:{event_id}:version'
+
+
+def bump(event_id):
+    """Invalidate every cached response for `event_id` (None: a photo outside any event)."""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.incr(GLOBAL_VERSION_KEY)
+        if event_id is not None:
+            pipe.incr(_version_key(event_id))
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Could not invalidate gallery cache for event {event_id}: {e}")
+
+
+def get_version(event_id=None):
+    """
+    Current version of `event_id`, or the global version when None, as a
+    string. Returns None when Redis is unavailable.
+    """
+    key = GLOBAL_VERSION_KEY if event_id is None else _version_key(event_id)
+    try:
+        return get_redis().get(key) or '0'
+    except redis.RedisError as e:
+        print(f"Gallery version unavailable: {e}")
+        return None
+
+
+def normalized_query(request):
+    """Query string with keys and values sorted and blanks dropped, plus the host used in links."""
+    params = sorted(
+        (key, value.strip())
+        for key, values in request.query_params.lists()
+        for value in values
+        if value.strip()
+    )
+    return f'{request.get_host()}?{urlencode(params)}'
+
+
+def get_or_build(request, event_id, kind, build):
+    """
+    Return the response data for `kind` of `event_id` and this query, calling
+    `build()` (which returns JSON-serializable data) only on a miss.
+
+    Falls back to `build()` when Redis is unavailable.
+    """
+    try:
+        client = get_redis()
+        version = client.get(_version_key(event_id)) or 0
+        digest = hashlib.sha1(normalized_query(request).encode()).hexdigest()
+        key = f'gallery:event:{event_id}:v{version}:{kind}:{digest}'
+        cached = client.get(key)
+    except redis.RedisError as e:
+        print(f"Gallery cache unavailable: {e}")
+        return build()
+
+    if cached is not None:
+        incr_counter('gallery_cache_hits')
+        return orjson.loads(cached)
+    incr_counter('gallery_cache_misses')
+
+    lock = f'{key}:lock'
+    try:
+        leader = client.set(lock, 1, nx=True, ex=settings.PHOTO_GALLERY_CACHE_LOCK_TIMEOUT)
+        if not leader:
+            # Another request is rebuilding this entry; wait for it rather than
+            # running the same query again
+            deadline = time.monotonic() + settings.PHOTO_GALLERY_CACHE_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                cached = client.get(key)
+                if cached is not None:
+                    incr_counter('gallery_cache_coalesced')
+                    return orjson.loads(cached)
+    except redis.RedisError as e:
+        print(f"Gallery cache unavailable: {e}")
+        return build()
+
+    try:
+        data = build()
+        client.set(key, ORJSONRenderer().render(data), ex=settings.PHOTO_GALLERY_CACHE_TTL)
+    except redis.RedisError as e:
+        print(f"Could not store gallery cache entry: {e}")
+    finally:
+        if leader:
+            _release(client, lock)
+    return data
+
+
+def _release(client, lock):
+    try:
+        client.delete(lock)
+    except redis.RedisError:
+        pass  # expires on its own after PHOTO_GALLERY_CACHE_LOCK_TIMEOUT
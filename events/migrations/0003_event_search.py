@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_created_at_event_created_by_alter_event_slug'),
+    ]
+
+    operations = [
+        # gin_trgm_ops indexes here and in photos/social need pg_trgm
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=(
+                    django.contrib.postgres.search.SearchVector('name', config='english', weight='A')
+                    + django.contrib.postgres.search.SearchVector('location', config='english', weight='B')
+                    + django.contrib.postgres.search.SearchVector('description', config='english', weight='C')
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='event_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.conf import settings
 from django.utils.text import slugify
@@ -18,6 +20,23 @@ class Event(models.Model):
         related_name='created_events'
     )
     created_at = models.DateTimeField(auto_now_add=True, null=True)
+    # Maintained by Postgres for /search (config/search.py)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', config='english', weight='A')
+            + SearchVector('location', config='english', weight='B')
+            + SearchVector('description', config='english', weight='C')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='event_search_idx'),
+            # Typo-tolerant name matching (pg_trgm)
+            GinIndex(fields=['name'], opclasses=['gin_trgm_ops'], name='event_name_trgm_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
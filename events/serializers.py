@@ -4,5 +4,5 @@ from .models import Event
 class EventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ('search_vector',)
         read_only_fields = ('slug', 'created_by', 'created_at')
@@ -1,3 +1,72 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from photos.models import Photo
+from users.models import CustomUser, Profile
+from .models import Event
+
+
+class EventZipDownloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = CustomUser.objects.create_user(
+            username='organizer', email='organizer@example.com', password='pw', role='coordinator',
+        )
+        cls.guest = CustomUser.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        for user in (cls.organizer, cls.guest):
+            Profile.objects.create(user=user)
+        cls.event = Event.objects.create(name='Fest', date=date(2026, 10, 19), created_by=cls.organizer)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        os.makedirs(os.path.join(media_root.name, 'photos', 'originals'))
+        self.files = {}
+        for i in range(3):
+            name = f'photos/originals/IMG_{i}.jpg'
+            content = os.urandom(1000 * (i + 1))
+            with open(os.path.join(media_root.name, name), 'wb') as f:
+                f.write(content)
+            photo = Photo.objects.create(original_image=name, uploader=self.organizer, event=self.event)
+            self.files[f'{photo.id}_IMG_{i}.jpg'] = content
+        # A photo whose file is gone is left out rather than failing the export
+        Photo.objects.create(original_image='photos/originals/missing.jpg', uploader=self.organizer, event=self.event)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.url = f'/api/v1/events/{self.event.slug}/download.zip'
+
+    def test_archive_contains_every_photo(self):
+        response = self.client.get(self.url)
+        body = b''.join(response.streaming_content)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        archive = zipfile.ZipFile(io.BytesIO(body))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual({name: archive.read(name) for name in archive.namelist()}, self.files)
+        self.assertTrue(all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist()))
+
+    def test_range_resumes_download(self):
+        full = self.client.get(self.url)
+        body = b''.join(full.streaming_content)
+
+        resumed = self.client.get(self.url, HTTP_RANGE='bytes=1500-', HTTP_IF_RANGE=full['ETag'])
+
+        self.assertEqual(resumed.status_code, 206)
+        self.assertEqual(resumed['Content-Range'], f'bytes 1500-{len(body) - 1}/{len(body)}')
+        self.assertEqual(b''.join(resumed.streaming_content), body[1500:])
+
+    def test_guests_cannot_download(self):
+        self.client.force_authenticate(self.guest)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
@@ -1,5 +1,15 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import content_disposition_header
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from config.conditional import conditional, make_etag
+from config.media import parse_byte_range
+from photos import facets
+from . import cache as gallery_cache
+from .archive import EventArchive
 from .models import Event
 from .serializers import EventSerializer
 
@@ -18,9 +28,69 @@ class IsAdminOrCoordinatorOrReadOnly(permissions.BasePermission):
         return request.user.role in ['admin', 'coordinator']
 
 class EventViewSet(viewsets.ModelViewSet):
-    queryset = Event.objects.all().order_by('-date')
+    queryset = Event.objects.defer('search_vector').order_by('-date')
     serializer_class = EventSerializer
     permission_classes = [IsAdminOrCoordinatorOrReadOnly]
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+
+    def perform_update(self, serializer):
+        event = serializer.save()
+        gallery_cache.bump(event.id)
+        # The cached facet counts carry the event's name
+        facets.invalidate(event.id)
+
+    def perform_destroy(self, instance):
+        event_id = instance.id
+        instance.delete()
+        gallery_cache.bump(event_id)
+        facets.invalidate(event_id)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Event pages are opened by everyone scanning the QR code at once
+        pk = str(kwargs.get(self.lookup_field, ''))
+        if not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        version = gallery_cache.get_version(int(pk))
+        etag = None if version is None else make_etag(request, 'event', version)
+        retrieve = super().retrieve
+        return conditional(request, etag, lambda: Response(gallery_cache.get_or_build(
+            request, int(pk), 'detail', lambda: retrieve(request, *args, **kwargs).data,
+        )))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_zip(request, slug):
+    """
+    Every photo of the event as a stored ZIP, streamed while it is generated.
+    The length is sent up front and interrupted downloads resume with Range.
+    """
+    event = get_object_or_404(Event, slug=slug)
+    if request.user.role not in ['admin', 'coordinator'] and event.created_by_id != request.user.id:
+        raise PermissionDenied("Only the event's organizers can download all of its photos.")
+
+    archive = EventArchive.for_event(event)
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and (not if_range or if_range == archive.etag):
+        byte_range = parse_byte_range(request.META['HTTP_RANGE'], archive.size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{archive.size}'
+            return response
+    start, end = byte_range or (0, archive.size - 1)
+
+    response = StreamingHttpResponse(
+        archive.stream(start, end),
+        content_type='application/zip',
+        status=206 if byte_range else 200,
+    )
+    response['Content-Length'] = str(end - start + 1)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{archive.size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = archive.etag
+    response['Content-Disposition'] = content_disposition_header(True, f'{event.slug}.zip')
+    return response
@@ -0,0 +1,32 @@
+"""Add photos.processed_at and uploader/status index
+
+Revision ID: 3b9c1d2e4f51
+Revises: 1f8f3b65e3ec
+Create Date: 2026-10-19 09:20:41.112734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9c1d2e4f51'
+down_revision: Union[str, Sequence[str], None] = '1f8f3b65e3ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('photos', sa.Column('processed_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_photos_processed_at'), 'photos', ['processed_at'], unique=False)
+    op.create_index('ix_photos_uploader_status', 'photos', ['uploader_id', 'processing_status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_photos_uploader_status', table_name='photos')
+    op.drop_index(op.f('ix_photos_processed_at'), table_name='photos')
+    op.drop_column('photos', 'processed_at')
@@ -0,0 +1,30 @@
+"""Add photos.width and photos.height
+
+Revision ID: 5d2a7e9c0b13
+Revises: 3b9c1d2e4f51
+Create Date: 2026-10-19 13:52:07.480215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a7e9c0b13'
+down_revision: Union[str, Sequence[str], None] = '3b9c1d2e4f51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('photos', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('photos', sa.Column('height', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('photos', 'height')
+    op.drop_column('photos', 'width')
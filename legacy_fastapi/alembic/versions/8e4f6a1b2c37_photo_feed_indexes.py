@@ -0,0 +1,30 @@
+"""Add keyset pagination indexes on photos
+
+Revision ID: 8e4f6a1b2c37
+Revises: 5d2a7e9c0b13
+Create Date: 2026-10-19 15:21:44.903518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4f6a1b2c37'
+down_revision: Union[str, Sequence[str], None] = '5d2a7e9c0b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_photos_feed', 'photos', [sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_photos_event_feed', 'photos', ['event_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_photos_event_feed', table_name='photos')
+    op.drop_index('ix_photos_feed', table_name='photos')
@@ -0,0 +1,33 @@
+"""Add denormalized comments_count to engagements
+
+Revision ID: a4c7e2d91f05
+Revises: 8e4f6a1b2c37
+Create Date: 2026-10-19 16:52:10.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c7e2d91f05'
+down_revision: Union[str, Sequence[str], None] = '8e4f6a1b2c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('engagements', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE engagements SET "
+        "likes_count = (SELECT count(*) FROM likes WHERE likes.photo_id = engagements.photo_id), "
+        "comments_count = (SELECT count(*) FROM comments WHERE comments.engagement_id = engagements.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('engagements', 'comments_count')
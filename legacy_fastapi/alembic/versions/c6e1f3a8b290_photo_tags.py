@@ -0,0 +1,47 @@
+"""Normalized, indexed photo tags
+
+Revision ID: c6e1f3a8b290
+Revises: a4c7e2d91f05
+Create Date: 2026-10-19 18:04:37.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e1f3a8b290'
+down_revision: Union[str, Sequence[str], None] = 'a4c7e2d91f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'photo_tags',
+        sa.Column('photo_id', sa.Integer(), sa.ForeignKey('photos.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('tag', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('photo_id', 'tag'),
+    )
+    op.execute(
+        "INSERT INTO photo_tags (photo_id, tag) "
+        "SELECT DISTINCT photos.id, lower(btrim(t.value)) FROM photos "
+        "CROSS JOIN LATERAL jsonb_array_elements_text("
+        "CASE WHEN jsonb_typeof(photos.ai_tags) = 'array' THEN photos.ai_tags ELSE '[]'::jsonb END || "
+        "CASE WHEN jsonb_typeof(photos.manual_tags) = 'array' THEN photos.manual_tags ELSE '[]'::jsonb END"
+        ") AS t(value) "
+        "WHERE btrim(t.value) <> ''"
+    )
+    op.create_index(
+        'ix_photo_tags_tag', 'photo_tags', ['tag', 'photo_id'],
+        postgresql_ops={'tag': 'text_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_photo_tags_tag', table_name='photo_tags')
+    op.drop_table('photo_tags')
@@ -0,0 +1,32 @@
+"""Index likes and tags by user, and tags by photo
+
+Revision ID: e2b8d4f7a619
+Revises: c6e1f3a8b290
+Create Date: 2026-10-19 21:12:08.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8d4f7a619'
+down_revision: Union[str, Sequence[str], None] = 'c6e1f3a8b290'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_likes_user_photo', 'likes', ['user_id', 'photo_id'], unique=False)
+    op.create_index('ix_tagged_in_user_photo', 'tagged_in', ['user_id', 'photo_id'], unique=False)
+    op.create_index('ix_tagged_in_photo', 'tagged_in', ['photo_id', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tagged_in_photo', table_name='tagged_in')
+    op.drop_index('ix_tagged_in_user_photo', table_name='tagged_in')
+    op.drop_index('ix_likes_user_photo', table_name='likes')
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from app.core.database import get_db
+from urllib.parse import quote
+from app.core.archive import EventArchive
+from app.core.database import get_async_db, get_db
 from app.core.dependencies import require_admin_or_coordinator
+from app.core.media import parse_byte_range
 from app.crud import event as crud_event
 from app.schemas.event import Event, EventCreate, EventUpdate
 from app.models.models import User
@@ -21,23 +26,23 @@ def create_event(
 
 
 @router.get("/", response_model=List[Event])
-def read_events(
+async def read_events(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all events with pagination."""
-    events = crud_event.get_events(db, skip=skip, limit=limit)
+    events = await crud_event.get_events_async(db, skip=skip, limit=limit)
     return events
 
 
 @router.get("/{event_id}", response_model=Event)
-def read_event(
+async def read_event(
     event_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific event by ID."""
-    db_event = crud_event.get_event(db, event_id=event_id)
+    db_event = await crud_event.get_event_async(db, event_id=event_id)
     if db_event is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -47,12 +52,12 @@ def read_event(
 
 
 @router.get("/slug/{slug}", response_model=Event)
-def read_event_by_slug(
+async def read_event_by_slug(
     slug: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific event by slug."""
-    db_event = crud_event.get_event_by_slug(db, slug=slug)
+    db_event = await crud_event.get_event_by_slug_async(db, slug=slug)
     if db_event is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -61,6 +66,52 @@ def read_event_by_slug(
     return db_event
 
 
+@router.get("/{slug}/download.zip")
+def download_event_zip(
+    slug: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin_or_coordinator)
+):
+    """
+    Every photo of the event as a stored ZIP, streamed while it is generated.
+    The length is sent up front and interrupted downloads resume with Range.
+    """
+    db_event = crud_event.get_event_by_slug(db, slug=slug)
+    if db_event is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+
+    archive = EventArchive.for_event(db, db_event.id)
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if "range" in request.headers and (not if_range or if_range == archive.etag):
+        byte_range = parse_byte_range(request.headers["range"], archive.size)
+        if byte_range is False:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{archive.size}"},
+            )
+    start, end = byte_range or (0, archive.size - 1)
+
+    headers = {
+        "Content-Length": str(end - start + 1),
+        "Accept-Ranges": "bytes",
+        "ETag": archive.etag,
+        "Content-Disposition": f"attachment; filename*=utf-8''{quote(db_event.slug)}.zip",
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+    return StreamingResponse(
+        archive.stream(start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type="application/zip",
+        headers=headers,
+    )
+
+
 @router.put("/{event_id}", response_model=Event)
 def update_event(
     event_id: int,
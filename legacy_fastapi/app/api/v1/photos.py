@@ -1,28 +1,37 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, BackgroundTasks, Query, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status, BackgroundTasks, Query, Form, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Literal, Optional
 from pathlib import Path
 from datetime import datetime
 import uuid
 import os
-from app.core.database import get_db
-from app.core.dependencies import get_current_user, get_optional_user
-from app.models.models import User
-from app.crud.photo import create_photo, save_uploaded_file, search_photos, get_photo, update_photo_tags
-from app.crud.engagement import (
-    toggle_like, create_comment, get_comments_by_photo,
-    get_user_liked_photos, get_user_tagged_photos
+from app.core.database import get_async_db, get_db
+from app.core.dependencies import get_current_user, get_optional_user, get_optional_user_async
+from app.core.admission import check_admission
+from app.core.conditional import is_fresh, make_etag
+from app.core.media import send_file
+from app.core.validation import EXTENSIONS, InvalidImage, inspect_image
+from app.core.pagination import encode_cursor
+from app.models.models import Photo as PhotoModel, User
+from app.core.facets import FACETS
+from app.crud.photo import create_photo, save_uploaded_file, search_photos_async, get_photo, update_photo_tags, photo_facets
+from app.crud.engagement import toggle_like, create_comment, get_comments_by_photo
+from app.schemas.photo import (
+    PHOTO_LIST_FIELDS, FacetValue, PhotoUploadResponse, Photo, PhotoFilterParams, PhotoListItem, PhotoUpdate
 )
-from app.schemas.photo import PhotoUploadResponse, Photo, PhotoFilterParams, PhotoWithEngagement, PhotoUpdate
 from app.schemas.engagement import LikeResponse, CommentCreate, CommentResponse
-from app.worker.tasks import process_photo_task
+from app.crud.event import get_event
+from app.worker.scheduling import enqueue_photo
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 
 @router.post("/upload", response_model=List[PhotoUploadResponse], status_code=status.HTTP_201_CREATED)
-async def upload_photos(
+def upload_photos(
     background_tasks: BackgroundTasks,
+    response: Response,
     files: List[UploadFile] = File(...),
     event_id: Optional[int] = Form(None),
     db: Session = Depends(get_db),
@@ -30,6 +39,9 @@ async def upload_photos(
 ):
     """
     Upload multiple photos. Each photo will be processed asynchronously via Celery.
+
+    A plain `def` so FastAPI runs it in the threadpool: admission, header
+    validation, file writes and enqueueing all block.
     """
     print(f"DEBUG: upload_photos called with {len(files)} files and event_id: {event_id}")
 
@@ -53,31 +65,49 @@ async def upload_photos(
             detail="No files provided"
         )
     
-    # Validate file types
-    allowed_extensions = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff"}
+    decision = check_admission(db, uploader_id, len(files))
+    if decision.too_large:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=decision.reason
+        )
+    if not decision.admitted:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=decision.reason,
+            headers={"Retry-After": str(decision.retry_after)}
+        )
+    
+    # Validate every file from its header (no full decode) before saving or enqueueing any
+    valid_files = []
+    rejected = []
+    for file in files:
+        filename = file.filename or f"upload_{uuid.uuid4()}"
+        file_content = file.file.read()
+        try:
+            fmt, width, height = inspect_image(file_content)
+        except InvalidImage as e:
+            print(f"DEBUG: Rejecting file {filename}: {e}")
+            rejected.append({"filename": filename, "error": str(e)})
+            continue
+        valid_files.append((filename, file_content, fmt, width, height))
+    
+    if rejected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=rejected
+        )
+    
     uploaded_photos = []
     
     media_dir = Path("media/originals")
     media_dir.mkdir(parents=True, exist_ok=True)
     
-    for file in files:
-        # Check file extension
-        filename = file.filename or f"upload_{uuid.uuid4()}.jpg"
-        file_ext = Path(filename).suffix.lower()
-        if not file_ext:
-            file_ext = ".jpg"
-            
-        print(f"DEBUG: Processing file: {filename} with extension: {file_ext}")
-            
-        if file_ext not in allowed_extensions:
-            print(f"DEBUG: Skipping file with invalid extension: {file_ext}")
-            continue
-        
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        
-        # Read file content
-        file_content = await file.read()
+    event = get_event(db, event_id) if event_id else None
+    
+    for filename, file_content, fmt, width, height in valid_files:
+        # Extension comes from the detected format, not the client-supplied name
+        unique_filename = f"{uuid.uuid4()}{EXTENSIONS[fmt]}"
         
         # Save file
         original_path = save_uploaded_file(file_content, unique_filename, media_dir)
@@ -89,12 +119,14 @@ async def upload_photos(
             original_path=original_path,
             uploader_id=uploader_id,
             event_id=event_id,
-            processing_status="pending"
+            processing_status="pending",
+            width=width,
+            height=height
         )
         
         # Trigger Celery task directly
         print(f"DEBUG: Enqueuing Celery task for photo_id: {db_photo.id}")
-        process_photo_task.delay(db_photo.id, str(original_path))
+        enqueue_photo(db_photo.id, str(original_path), event, decision.uploader_backlog + len(uploaded_photos))
         
         uploaded_photos.append({
             "photo_id": db_photo.id,
@@ -108,28 +140,78 @@ async def upload_photos(
             detail="No valid image files provided"
         )
     
+    response.headers["X-Queue-Depth"] = str(decision.queue_depth)
+    response.headers["X-Estimated-Processing-Seconds"] = str(decision.estimated_seconds)
+    if decision.queued:
+        # Backlog is deep: photos are stored but processing will lag
+        response.status_code = status.HTTP_202_ACCEPTED
+    
     return uploaded_photos
 
 
-@router.get("/", response_model=List[PhotoWithEngagement])
-def get_photos(
+def _select_fields(fields: Optional[str], expand: Optional[str], default: tuple) -> list[str]:
+    """
+    Fields to return from `fields` (exactly these) or `expand` (added to
+    `default`). Raises 400 for unknown names.
+    """
+    available = PhotoListItem.model_fields
+
+    def parse(param: str, value: Optional[str]) -> list[str]:
+        names = [name.strip() for name in (value or "").split(",") if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown {param}: {', '.join(unknown)}"
+            )
+        return names
+
+    selected = parse("fields", fields)
+    if selected:
+        return selected if "id" in selected else ["id", *selected]
+    return [*default, *(name for name in parse("expand", expand) if name not in default)]
+
+
+@router.get("/", response_model=List[PhotoListItem], response_model_exclude_unset=True)
+async def get_photos(
+    request: Request,
+    response: Response,
     event_id: Optional[int] = Query(None, description="Filter by event ID"),
     photographer_id: Optional[int] = Query(None, description="Filter by photographer (uploader) ID"),
     date_from: Optional[datetime] = Query(None, description="Filter photos from this date"),
     date_to: Optional[datetime] = Query(None, description="Filter photos until this date"),
-    tags: Optional[str] = Query(None, description="Comma-separated list of tags to search"),
-    skip: int = Query(0, ge=0),
+    tags: Optional[str] = Query(None, description="Comma-separated list of tags to search (case-insensitive)"),
+    tag_prefix: bool = Query(False, description="Match tags starting with each term rather than equal to it"),
+    tag_match: Literal["any", "all"] = Query("any", description="Photos with any of the tags, or with all of them"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return instead of the default"),
+    expand: Optional[str] = Query(None, description="Comma-separated fields to return in addition to the default"),
+    skip: int = Query(0, ge=0, description="Offset pagination; prefer cursor for deep pages"),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_optional_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_optional_user_async)
 ):
     """
     Advanced photo search with filtering by:
     - Event ID
     - Photographer ID
     - Date range
-    - Tags (searches in AI-generated tags)
+    - Tags (AI-generated and manual; exact or prefix, any or all of them)
+
+    Returns the compact PHOTO_LIST_FIELDS per photo unless `fields` or
+    `expand` select others; columns not returned are not loaded.
+    Answers 304 when If-None-Match still matches the list version.
     """
+    user_id = current_user.id if current_user else None
+    etag = await run_in_threadpool(make_etag, request, user_id)
+    if is_fresh(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+
+    selected = _select_fields(fields, expand, PHOTO_LIST_FIELDS)
+
     # Parse tags if provided
     tag_list = None
     if tags:
@@ -141,49 +223,82 @@ def get_photos(
         date_from=date_from,
         date_to=date_to,
         tags=tag_list,
+        tag_prefix=tag_prefix,
+        tag_match=tag_match,
+        cursor=cursor,
         skip=skip,
         limit=limit
     )
     
-    user_id = current_user.id if current_user else None
-    photos = search_photos(db, filters, user_id)
+    photos = await search_photos_async(db, filters, user_id, columns=selected)
+    
+    if len(photos) == limit:
+        last = photos[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
     
-    # Add engagement data
-    from app.models.models import Engagement, TaggedIn
+    # Engagement fields were computed by the same query
+    columns = [name for name in selected if name in PhotoModel.__table__.columns]
     result = []
     for photo in photos:
-        photo_dict = {
-            "id": photo.id,
-            "original_path": photo.original_path,
-            "thumbnail_path": photo.thumbnail_path,
-            "exif_data": photo.exif_data,
-            "ai_tags": photo.ai_tags,
-            "uploader_id": photo.uploader_id,
-            "event_id": photo.event_id,
-            "processing_status": photo.processing_status,
-            "created_at": photo.created_at,
-            "likes_count": getattr(photo, "likes_count", 0),
-            "is_liked": getattr(photo, "is_liked", False),
-            "comments_count": 0,
-            "tagged_users": []
-        }
+        photo_dict = {name: getattr(photo, name) for name in columns}
+        for name in ("likes_count", "is_liked", "comments_count"):
+            if name in selected:
+                photo_dict[name] = getattr(photo, name)
+        if "tagged_users" in selected:
+            photo_dict["tagged_users"] = photo.tagged_user_ids
         
-        # Get comments count
-        engagement = db.query(Engagement).filter(Engagement.photo_id == photo.id).first()
-        if engagement:
-            from app.models.models import Comment
-            comments_count = db.query(Comment).filter(Comment.engagement_id == engagement.id).count()
-            photo_dict["comments_count"] = comments_count
-        
-        # Get tagged users
-        tagged = db.query(TaggedIn).filter(TaggedIn.photo_id == photo.id).all()
-        photo_dict["tagged_users"] = [t.user_id for t in tagged]
-        
-        result.append(PhotoWithEngagement(**photo_dict))
+        result.append(PhotoListItem(**photo_dict))
     
     return result
 
 
+@router.get("/facets", response_model=Dict[str, List[FacetValue]], response_model_exclude_none=True)
+def get_photo_facets(
+    request: Request,
+    response: Response,
+    facets: str = Query(..., description=f"Comma-separated facets to count: {', '.join(FACETS)}"),
+    event_id: Optional[int] = Query(None, description="Filter by event ID"),
+    photographer_id: Optional[int] = Query(None, description="Filter by photographer (uploader) ID"),
+    date_from: Optional[datetime] = Query(None, description="Filter photos from this date"),
+    date_to: Optional[datetime] = Query(None, description="Filter photos until this date"),
+    tags: Optional[str] = Query(None, description="Comma-separated list of tags to search (case-insensitive)"),
+    tag_prefix: bool = Query(False, description="Match tags starting with each term rather than equal to it"),
+    tag_match: Literal["any", "all"] = Query("any", description="Photos with any of the tags, or with all of them"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """
+    Photo counts per tag, photographer, event and month for the same filters
+    as `GET /photos/`, most frequent values first. All requested facets are
+    counted in one query; a whole event is served from cached counts.
+    """
+    names = [name.strip() for name in facets.split(",") if name.strip()]
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown facets: {', '.join(unknown)}"
+        )
+
+    etag = make_etag(request, current_user.id if current_user else None)
+    if is_fresh(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+
+    filters = PhotoFilterParams(
+        event_id=event_id,
+        photographer_id=photographer_id,
+        date_from=date_from,
+        date_to=date_to,
+        tags=[tag.strip() for tag in tags.split(",") if tag.strip()] if tags else None,
+        tag_prefix=tag_prefix,
+        tag_match=tag_match,
+    )
+    return photo_facets(db, filters, names)
+
+
 @router.put("/{photo_id}", response_model=Photo)
 def update_photo(
     photo_id: int,
@@ -247,22 +362,18 @@ def like_photo(
 @router.get("/{photo_id}/download")
 def download_photo(
     photo_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
-    """Download the original photo."""
-    from fastapi.responses import FileResponse
+    """Download the original photo; the transfer is handed off per settings.MEDIA_SERVING."""
     photo = get_photo(db, photo_id)
-    if not photo or not os.path.exists(photo.original_path):
+    if not photo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Photo file not found"
         )
     
-    return FileResponse(
-        path=photo.original_path,
-        filename=os.path.basename(photo.original_path),
-        media_type="image/jpeg"
-    )
+    return send_file(request, photo.original_path, download_name=os.path.basename(photo.original_path))
 
 
 @router.post("/{photo_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
@@ -345,7 +456,6 @@ def get_photo_comments(
     comments = get_comments_by_photo(db, photo_id)
     
     # Build response with author emails
-    from app.models.models import User
     result = []
     for comment in comments:
         author = db.query(User).filter(User.id == comment.author_id).first()
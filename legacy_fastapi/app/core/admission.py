@@ -0,0 +1,161 @@
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Photo
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_STATUSES = ("pending", "processing")
+
+# Queue depth is read from the broker at most once per interval per process
+_DEPTH_CACHE_SECONDS = 2
+_depth_cache = {"value": 0, "expires": 0.0}
+
+
+@dataclass
+class AdmissionDecision:
+    admitted: bool
+    queued: bool = False
+    retry_after: int = 0
+    estimated_seconds: int = 0
+    queue_depth: int = 0
+    uploader_backlog: int = 0
+    # Set when the batch alone is over the per-uploader limit, so retrying cannot help
+    too_large: bool = False
+    batch_limit: int = 0
+    reason: str = ""
+
+
+def get_queue_depth() -> int:
+    """Number of tasks waiting in the photo processing queues."""
+    now = time.monotonic()
+    if now < _depth_cache["expires"]:
+        return _depth_cache["value"]
+
+    from app.worker.celery_app import celery_app
+
+    depth = 0
+    try:
+        with celery_app.connection_for_read() as conn:
+            channel = conn.default_channel
+            for queue in settings.PROCESSING_QUEUES:
+                try:
+                    depth += channel.queue_declare(queue=queue, passive=True).message_count
+                except Exception:
+                    # Queue not declared yet - nothing waiting in it
+                    pass
+    except Exception:
+        # Admission falls back to the last depth read, so make the blind spot visible
+        logger.exception("Could not read broker queue depth")
+        _count_depth_error()
+        return _depth_cache["value"]
+
+    _depth_cache["value"] = depth
+    _depth_cache["expires"] = now + _DEPTH_CACHE_SECONDS
+    return depth
+
+
+def _count_depth_error() -> None:
+    """Count a failed broker read in the shared metrics hash."""
+    import redis
+    from app.worker.watchdog import COUNTERS_KEY, get_redis
+
+    try:
+        get_redis().hincrby(COUNTERS_KEY, "broker_depth_errors", 1)
+    except redis.RedisError:
+        logger.exception("Could not record broker depth error")
+
+
+def get_throughput(db: Session) -> float:
+    """Photos processed per second over the recent throughput window."""
+    window = settings.INGEST_THROUGHPUT_WINDOW
+    since = datetime.utcnow() - timedelta(seconds=window)
+    processed = db.query(func.count(Photo.id)).filter(Photo.processed_at >= since).scalar()
+    if not processed:
+        return settings.INGEST_NOMINAL_THROUGHPUT
+    return processed / window
+
+
+def get_active_uploaders(db: Session) -> int:
+    """Number of distinct uploaders that currently have photos in flight."""
+    return db.query(func.count(func.distinct(Photo.uploader_id))).filter(
+        Photo.processing_status.in_(IN_FLIGHT_STATUSES)
+    ).scalar() or 0
+
+
+def get_uploader_backlog(db: Session, uploader_id: int) -> int:
+    return db.query(func.count(Photo.id)).filter(
+        Photo.uploader_id == uploader_id,
+        Photo.processing_status.in_(IN_FLIGHT_STATUSES)
+    ).scalar() or 0
+
+
+def uploader_share(active_uploaders: int) -> int:
+    """Max in-flight photos per uploader given how many people are uploading."""
+    share = settings.INGEST_HARD_QUEUE_DEPTH // max(active_uploaders, 1)
+    share = max(share, settings.INGEST_MIN_UPLOADER_SHARE)
+    return min(share, settings.INGEST_PER_UPLOADER_LIMIT)
+
+
+def check_admission(db: Session, uploader_id: int, batch_size: int) -> AdmissionDecision:
+    """
+    Decide whether a batch of uploads may be enqueued.
+
+    Rejects outright (`too_large`) a batch bigger than the uploader's whole
+    share, rejects with a retry estimate when the global backlog is past the
+    hard limit or the uploader would exceed their fair share, and marks the
+    batch as queued (with an estimate) when the backlog is past the soft limit.
+    """
+    depth = get_queue_depth()
+    throughput = get_throughput(db)
+
+    backlog = get_uploader_backlog(db, uploader_id)
+    active = get_active_uploaders(db)
+    if not backlog:
+        # The uploader is about to become active
+        active += 1
+    share = uploader_share(active)
+
+    if batch_size > share:
+        return AdmissionDecision(
+            admitted=False,
+            too_large=True,
+            batch_limit=share,
+            queue_depth=depth,
+            uploader_backlog=backlog,
+            reason=f"Batch of {batch_size} photos is over the per-batch limit of {share}; upload in smaller batches",
+        )
+
+    if depth + batch_size > settings.INGEST_HARD_QUEUE_DEPTH:
+        overflow = depth + batch_size - settings.INGEST_HARD_QUEUE_DEPTH
+        return AdmissionDecision(
+            admitted=False,
+            retry_after=max(1, math.ceil(overflow / throughput)),
+            queue_depth=depth,
+            reason="Processing queue is full",
+        )
+
+    if backlog + batch_size > share:
+        # Each active uploader gets roughly an equal slice of throughput
+        overflow = backlog + batch_size - share
+        per_uploader_rate = throughput / max(active, 1)
+        return AdmissionDecision(
+            admitted=False,
+            retry_after=max(1, math.ceil(overflow / per_uploader_rate)),
+            queue_depth=depth,
+            uploader_backlog=backlog,
+            reason=f"Too many photos in flight for this uploader (limit {share})",
+        )
+
+    return AdmissionDecision(
+        admitted=True,
+        queued=depth >= settings.INGEST_SOFT_QUEUE_DEPTH,
+        estimated_seconds=math.ceil((depth + batch_size) / throughput),
+        queue_depth=depth,
+        uploader_backlog=backlog,
+    )
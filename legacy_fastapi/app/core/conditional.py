@@ -0,0 +1,46 @@
+"""
+Conditional GET for the photo list.
+
+A Redis counter is incremented on every write that changes what a photo list
+can show (uploads, processing, tags, likes, comments). Its value, the query
+and the user make a strong ETag that is checked before any database work.
+"""
+import hashlib
+from typing import Optional
+import redis
+from fastapi import Request
+from app.core.likes import get_redis
+
+VERSION_KEY = "photos:version"
+
+
+def bump() -> None:
+    try:
+        get_redis().incr(VERSION_KEY)
+    except redis.RedisError as e:
+        print(f"Could not bump photo list version: {e}")
+
+
+def make_etag(request: Request, user_id: Optional[int]) -> Optional[str]:
+    """ETag for this request, or None when Redis is unavailable."""
+    try:
+        version = get_redis().get(VERSION_KEY) or "0"
+    except redis.RedisError as e:
+        print(f"Photo list version unavailable: {e}")
+        return None
+    parts = (
+        version,
+        request.url.path,
+        "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items())),
+        str(user_id or ""),
+    )
+    return '"%s"' % hashlib.sha1("\0".join(parts).encode()).hexdigest()
+
+
+def is_fresh(request: Request, etag: Optional[str]) -> bool:
+    """Whether If-None-Match already names `etag` (weak comparison; gzip weakens tags)."""
+    header = request.headers.get("if-none-match")
+    if not etag or not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
@@ -1,10 +1,116 @@
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+
+class CheckoutStats:
+    """How long checkouts from a pool waited for a connection, in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = self.timeouts = 0
+        self.wait_ms_total = self.wait_ms_max = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_total": round(self.wait_ms_total, 1),
+                "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 1),
+            }
+
+
+class _TimedCheckout:
+    """Pool mixin recording checkout waits in `self.stats`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = CheckoutStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record((time.perf_counter() - start) * 1000, timed_out)
+
+    def recreate(self):
+        # dispose() swaps in a recreated pool; the counts carry over
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+_POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+engine = create_engine(settings.DATABASE_URL, poolclass=TimedQueuePool, **_POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The hot read endpoints are async and use asyncpg, so a request waiting on
+# the database does not hold one of the threadpool's slots
+async_engine = create_async_engine(
+    make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    poolclass=TimedAsyncQueuePool,
+    **_POOL_OPTIONS,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def dispose_after_fork() -> None:
+    """
+    Drop connections inherited from the parent process, in a forked child
+    (e.g. a Celery prefork worker). They are not closed: the parent still
+    owns the sockets. The child opens its own on first use.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+def pool_status() -> dict:
+    """Size, use and checkout waits of this process's pools."""
+    return {
+        name: {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            **pool.stats.as_dict(),
+        }
+        for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool))
+    }
+
 
 def get_db():
     """Dependency for getting database session."""
@@ -14,3 +120,8 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """Dependency for getting an async database session, for `async def` endpoints."""
+    async with AsyncSessionLocal() as db:
+        yield db
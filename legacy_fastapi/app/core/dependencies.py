@@ -1,7 +1,8 @@
 from fastapi import Depends, HTTPException, status, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.models.models import User
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -51,6 +52,43 @@ def get_optional_user(
         return None
 
 
+def _token_user_id(token: str) -> Optional[int]:
+    """User id from a valid access token, else None."""
+    try:
+        payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+        user_id = payload.get("sub")
+        return int(user_id) if user_id is not None else None
+    except (JWTError, ValueError):
+        return None
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> User:
+    """get_current_user for `async def` endpoints."""
+    user_id = _token_user_id(token)
+    user = await db.get(User, user_id) if user_id is not None else None
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+async def get_optional_user_async(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+) -> Optional[User]:
+    """get_optional_user for `async def` endpoints."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    user_id = _token_user_id(auth_header.split(" ")[1])
+    return await db.get(User, user_id) if user_id is not None else None
+
+
 def require_admin_or_coordinator(current_user: User = Depends(get_current_user)) -> User:
     """Require user to be Admin or Coordinator."""
     if current_user.role not in ["Admin", "Coordinator"]:
@@ -0,0 +1,137 @@
+"""
+Per-event facet counts for the photo list, kept in Redis.
+
+One hash per event (`facets:event:{id}`) holds the number of its photos per
+tag, photographer, event and month (fields `tag:beach`, `month:2026-10`,
+...) plus the labels of id-valued facets. A missing hash is built from the
+single aggregated query in crud.photo.count_facets on first read. After
+that, writes adjust it in place: take a `snapshot` of the photo before and
+after the change and pass both to `record_change`. A change racing a
+rebuild can be lost, so hashes expire after FACET_CACHE_TTL and are rebuilt.
+"""
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import redis
+from app.core.config import settings
+from app.core.likes import get_redis
+
+FACETS = ("tag", "photographer", "event", "month")
+LABELLED = ("photographer", "event")
+
+Snapshot = Optional[Tuple[int, FrozenSet[str]]]
+
+# Only adjust counts of a hash that exists; a missing one is rebuilt on read
+_ADJUST = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call('hincrby', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+def _key(event_id: int) -> str:
+    return f"facets:event:{event_id}"
+
+
+def format_value(name: str, value: str):
+    return int(value) if name in LABELLED else value
+
+
+def sort_and_trim(facets: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+    for entries in facets.values():
+        entries.sort(key=lambda entry: (-entry["count"], str(entry["value"])))
+        del entries[settings.FACET_SIZE:]
+    return facets
+
+
+def _store(client: redis.Redis, event_id: int, rows: Iterable[tuple]) -> Dict[str, str]:
+    fields = {"built": "1"}
+    for name, value, label, count in rows:
+        fields[f"{name}:{value}"] = str(count)
+        if label is not None:
+            fields[f"label:{name}:{value}"] = label
+    pipe = client.pipeline()
+    pipe.delete(_key(event_id))
+    pipe.hset(_key(event_id), mapping=fields)
+    pipe.expire(_key(event_id), settings.FACET_CACHE_TTL)
+    pipe.execute()
+    return fields
+
+
+def for_event(
+    event_id: int,
+    names: List[str],
+    build: Callable[[], Iterable[tuple]],
+) -> Optional[Dict[str, List[dict]]]:
+    """
+    Counts of the event's photos for `names` from its hash, calling
+    `build()` for every (facet, value, label, count) row on a miss. Returns
+    None when Redis is unavailable.
+    """
+    try:
+        client = get_redis()
+        fields = client.hgetall(_key(event_id)) or _store(client, event_id, build())
+    except redis.RedisError as e:
+        print(f"Facet cache unavailable: {e}")
+        return None
+
+    facets = {name: [] for name in names}
+    for field, count in fields.items():
+        name, _, value = field.partition(":")
+        if name in facets and int(count) > 0:
+            entry = {"value": format_value(name, value), "count": int(count)}
+            if name in LABELLED:
+                entry["label"] = fields.get(f"label:{name}:{value}")
+            facets[name].append(entry)
+    return sort_and_trim(facets)
+
+
+def store_labels(event_id: int, name: str, labels: Dict[int, str]) -> None:
+    """Remember labels of ids first counted after the hash was built."""
+    if not labels:
+        return
+    try:
+        get_redis().hset(_key(event_id), mapping={f"label:{name}:{pk}": label for pk, label in labels.items()})
+    except redis.RedisError as e:
+        print(f"Could not store facet labels for event {event_id}: {e}")
+
+
+def snapshot(photo, tags: Iterable[str]) -> Snapshot:
+    """What `photo`, with normalized `tags`, contributes to its event's facets."""
+    if photo is None or photo.event_id is None:
+        return None
+    fields = {f"tag:{tag}" for tag in tags}
+    fields.add(f"photographer:{photo.uploader_id}")
+    fields.add(f"event:{photo.event_id}")
+    if photo.created_at is not None:
+        fields.add(f"month:{photo.created_at:%Y-%m}")
+    return photo.event_id, frozenset(fields)
+
+
+def record_change(before: Snapshot, after: Snapshot) -> None:
+    """Apply a photo's change from `before` to `after` (None: absent or outside any event)."""
+    deltas: Dict[int, Dict[str, int]] = {}
+    for state, sign in ((before, -1), (after, 1)):
+        if state is not None:
+            event_id, fields = state
+            for field in fields:
+                changes = deltas.setdefault(event_id, {})
+                changes[field] = changes.get(field, 0) + sign
+    try:
+        client = get_redis()
+        adjust = client.register_script(_ADJUST)
+        for event_id, changes in deltas.items():
+            args = [part for field, delta in changes.items() if delta for part in (field, delta)]
+            if args:
+                adjust(keys=[_key(event_id)], args=args)
+    except redis.RedisError as e:
+        print(f"Could not update facet counts: {e}")
+
+
+def invalidate(event_id: int) -> None:
+    try:
+        get_redis().delete(_key(event_id))
+    except redis.RedisError as e:
+        print(f"Could not invalidate facet counts for event {event_id}: {e}")
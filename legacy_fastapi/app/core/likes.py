@@ -0,0 +1,200 @@
+"""
+Redis-backed like state with write-behind persistence.
+
+Each photo has a Redis set of user ids and a counter; toggles update them and
+record the user's latest state in a pending hash, which the
+`flush_likes` Celery task persists to Postgres in batches. A photo's set is
+rebuilt from the likes table (plus unflushed changes) the first time it is
+touched after a Redis restart or eviction.
+"""
+from typing import Iterable, Optional
+import redis
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import Like
+
+DIRTY_KEY = "likes:dirty"
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def _keys(photo_id: int) -> dict:
+    # The hash tag keeps a photo's keys in one slot should Redis be clustered
+    prefix = f"likes:{{{photo_id}}}"
+    return {
+        "users": f"{prefix}:users",
+        "count": f"{prefix}:count",
+        "flushing": f"{prefix}:flushing",
+        "pending": f"{prefix}:pending",
+        # Bumped by every finished flush
+        "generation": f"{prefix}:generation",
+    }
+
+
+# Rebuilds the set from a DB snapshot unless a flush finished since the
+# snapshot's generation was read: that flush's changes may be missing from
+# the snapshot and are no longer in the flushing hash, so the caller retries.
+# KEYS: users, count, flushing, pending, generation
+# ARGV: ttl, generation, *user ids from the DB
+_LOAD = """
+if redis.call('EXISTS', KEYS[2]) == 1 then return 0 end
+if (redis.call('GET', KEYS[5]) or '') ~= ARGV[2] then return -1 end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV do redis.call('SADD', KEYS[1], ARGV[i]) end
+for k = 3, 4 do
+    local ops = redis.call('HGETALL', KEYS[k])
+    for i = 1, #ops, 2 do
+        if ops[i + 1] == '1' then
+            redis.call('SADD', KEYS[1], ops[i])
+        else
+            redis.call('SREM', KEYS[1], ops[i])
+        end
+    end
+end
+redis.call('SET', KEYS[2], redis.call('SCARD', KEYS[1]), 'EX', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: users, count, pending, dirty  ARGV: user id, photo id, ttl
+_TOGGLE = """
+local count = redis.call('GET', KEYS[2])
+if not count or (tonumber(count) > 0 and redis.call('EXISTS', KEYS[1]) == 0) then
+    return -1
+end
+local liked = 1
+if redis.call('SREM', KEYS[1], ARGV[1]) == 1 then
+    liked = 0
+else
+    redis.call('SADD', KEYS[1], ARGV[1])
+end
+count = redis.call('INCRBY', KEYS[2], liked == 1 and 1 or -1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('HSET', KEYS[3], ARGV[1], liked)
+redis.call('SADD', KEYS[4], ARGV[2])
+return {liked, count}
+"""
+
+# Moves pending changes into the flushing hash, newer states winning over
+# ones left behind by a failed flush. KEYS: pending, flushing
+_DRAIN = """
+local ops = redis.call('HGETALL', KEYS[1])
+for i = 1, #ops, 2 do redis.call('HSET', KEYS[2], ops[i], ops[i + 1]) end
+redis.call('DEL', KEYS[1])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+
+def _load(db: Session, client: redis.Redis, photo_id: int) -> None:
+    keys = _keys(photo_id)
+    for _ in range(3):
+        generation = client.get(keys["generation"]) or ""
+        user_ids = [row[0] for row in db.query(Like.user_id).filter(Like.photo_id == photo_id)]
+        loaded = client.eval(
+            _LOAD, 5, keys["users"], keys["count"], keys["flushing"], keys["pending"], keys["generation"],
+            settings.LIKES_CACHE_TTL, generation, *user_ids,
+        )
+        if loaded != -1:
+            return
+
+
+def toggle(db: Session, photo_id: int, user_id: int) -> tuple[bool, int]:
+    """
+    Like or unlike a photo in Redis. Returns (liked, likes_count).
+
+    Raises redis.RedisError when Redis is unavailable.
+    """
+    client = get_redis()
+    keys = _keys(photo_id)
+    for _ in range(2):
+        result = client.eval(
+            _TOGGLE, 4, keys["users"], keys["count"], keys["pending"], DIRTY_KEY,
+            user_id, photo_id, settings.LIKES_CACHE_TTL,
+        )
+        if isinstance(result, list):
+            liked, count = result
+            return bool(liked), int(count)
+        _load(db, client, photo_id)
+    raise redis.RedisError(f"Like state for photo {photo_id} could not be loaded")
+
+
+def forget(photo_id: int) -> None:
+    """Drop the cached set after a direct DB write so it is rebuilt on next use."""
+    keys = _keys(photo_id)
+    try:
+        get_redis().delete(keys["users"], keys["count"])
+    except redis.RedisError as e:
+        print(f"Could not invalidate like cache for photo {photo_id}: {e}")
+
+
+def overlay_like_state(photos: list, user_id: Optional[int]) -> None:
+    """
+    Replace `likes_count`/`is_liked` on photos whose like set is cached, so
+    toggles not yet flushed show up immediately.
+    """
+    if not photos:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for photo in photos:
+            keys = _keys(photo.id)
+            pipe.get(keys["count"])
+            if user_id:
+                pipe.sismember(keys["users"], user_id)
+        results = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Could not read like state: {e}")
+        return
+
+    step = 2 if user_id else 1
+    for photo, i in zip(photos, range(0, len(results), step)):
+        count = results[i]
+        if count is None:
+            continue
+        photo.likes_count = int(count)
+        if user_id:
+            photo.is_liked = bool(results[i + 1])
+
+
+def drain_pending(max_photos: int) -> dict[int, dict[int, bool]]:
+    """
+    Take up to `max_photos` dirty photos and return their unflushed changes
+    as {photo_id: {user_id: liked}}.
+
+    The changes stay in each photo's flushing hash until `finish_flush`, so
+    a rebuild during the flush still sees them.
+    """
+    client = get_redis()
+    photo_ids = client.spop(DIRTY_KEY, max_photos) or []
+    pending = {}
+    for photo_id in photo_ids:
+        keys = _keys(photo_id)
+        ops = client.eval(_DRAIN, 2, keys["pending"], keys["flushing"])
+        changes = {int(ops[i]): ops[i + 1] == "1" for i in range(0, len(ops), 2)}
+        if changes:
+            pending[int(photo_id)] = changes
+    return pending
+
+
+def finish_flush(photo_ids: Iterable[int]) -> None:
+    """Drop the flushed changes and invalidate DB snapshots read before the flush."""
+    pipe = get_redis().pipeline()
+    for photo_id in photo_ids:
+        keys = _keys(photo_id)
+        pipe.delete(keys["flushing"])
+        pipe.incr(keys["generation"])
+        pipe.expire(keys["generation"], settings.LIKES_CACHE_TTL)
+    pipe.execute()
+
+
+def retry_flush(photo_ids: Iterable[int]) -> None:
+    """Mark photos dirty again after a failed flush; their changes are still in Redis."""
+    get_redis().sadd(DIRTY_KEY, *photo_ids)
@@ -0,0 +1,80 @@
+"""
+Media file delivery for download endpoints.
+
+Endpoints authorize the request, then `send_file` hands the transfer to the
+mode selected by settings.MEDIA_SERVING:
+
+- "x-accel": nginx sends it (`X-Accel-Redirect` to MEDIA_ACCEL_PREFIX, an
+  internal location aliased to the media directory).
+- "x-sendfile": Apache mod_xsendfile or lighttpd send it (`X-Sendfile`).
+- "python": Starlette's FileResponse, which answers Range requests and uses
+  zero-copy sends on servers implementing the ASGI pathsend extension;
+  If-None-Match is answered here.
+"""
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple, Union
+from urllib.parse import quote
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from app.core.config import settings
+
+MEDIA_ROOT = "media"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _resolve(path: str) -> str:
+    root = os.path.realpath(MEDIA_ROOT)
+    full_path = os.path.realpath(path)
+    if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return full_path
+
+
+def parse_byte_range(header: str, size: int) -> Union[Tuple[int, int], None, bool]:
+    """
+    Inclusive (start, end) for a single `bytes=` range, None when the header
+    should be ignored (malformed or several ranges), False if unsatisfiable.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+def send_file(request: Request, path: str, download_name: Optional[str] = None) -> Response:
+    """Response delivering `path` (inside the media directory) as an attachment named `download_name`."""
+    full_path = _resolve(path)
+    media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+    headers = {}
+    if download_name:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(download_name)}"
+
+    if settings.MEDIA_SERVING == "x-accel":
+        relative = os.path.relpath(full_path, os.path.realpath(MEDIA_ROOT)).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(relative)
+        return Response(media_type=media_type, headers=headers)
+    if settings.MEDIA_SERVING == "x-sendfile":
+        headers["X-Sendfile"] = full_path
+        return Response(media_type=media_type, headers=headers)
+
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    if any(tag.strip().removeprefix("W/") in ("*", etag) for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    headers["ETag"] = etag
+    return FileResponse(full_path, media_type=media_type, headers=headers, stat_result=stat)
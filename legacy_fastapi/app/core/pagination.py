@@ -0,0 +1,19 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the (created_at, id) position of the last row on a page."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """Inverse of encode_cursor; returns None for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
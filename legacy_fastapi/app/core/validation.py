@@ -0,0 +1,110 @@
+import warnings
+from io import BytesIO
+from typing import Optional, Tuple
+from PIL import Image
+from app.core.config import settings
+
+# Pillow's own decompression-bomb check uses the same limit
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+MAGIC_BYTES = {
+    "JPEG": (b"\xff\xd8\xff",),
+    "PNG": (b"\x89PNG\r\n\x1a\n",),
+    "GIF": (b"GIF87a", b"GIF89a"),
+    "BMP": (b"BM",),
+    "TIFF": (b"II*\x00", b"MM\x00*"),
+    "WEBP": (b"RIFF",),
+}
+
+# File extension used when storing each detected format
+EXTENSIONS = {
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "GIF": ".gif",
+    "BMP": ".bmp",
+    "TIFF": ".tiff",
+    "WEBP": ".webp",
+}
+
+# What a complete file of each format ends with
+TRAILERS = {
+    "JPEG": b"\xff\xd9",
+    "PNG": b"IEND\xaeB`\x82",
+    "GIF": b";",
+}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def detect_format(content: bytes) -> Optional[str]:
+    """Detect the image format from magic bytes."""
+    for fmt, prefixes in MAGIC_BYTES.items():
+        if any(content.startswith(prefix) for prefix in prefixes):
+            if fmt == "WEBP" and content[8:12] != b"WEBP":
+                continue
+            return fmt
+    return None
+
+
+def is_truncated(content: bytes, fmt: str) -> bool:
+    """Check the format trailer, decoding cheaply only when it is missing."""
+    trailer = TRAILERS.get(fmt)
+    if trailer is None or content[-32:].rstrip(b"\x00").endswith(trailer):
+        return False
+    
+    # Trailer missing: either truncated, or extra data appended after the image
+    # (motion photos, maker trailers). Decode cheaply to tell them apart.
+    try:
+        with Image.open(BytesIO(content)) as img:
+            if fmt == "JPEG":
+                img.draft("RGB", (img.width // 8, img.height // 8))
+                img.load()
+            else:
+                img.verify()
+    except Exception:
+        return True
+    return False
+
+
+def inspect_image(content: bytes) -> Tuple[str, int, int]:
+    """
+    Validate uploaded image bytes without a full decode.
+    
+    Checks magic bytes, header, dimensions, pixel count and truncation.
+    Returns (format, width, height) or raises InvalidImage.
+    """
+    fmt = detect_format(content[:16])
+    if fmt is None or fmt not in settings.ALLOWED_IMAGE_FORMATS:
+        raise InvalidImage("Unsupported or unrecognised image format")
+    
+    try:
+        # Pillow only warns between its pixel limit and twice that; fail on both
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(BytesIO(content)) as img:
+                # Only the header has been parsed at this point
+                width, height = img.size
+                # Multi-picture JPEGs from some cameras are reported as MPO
+                detected = "JPEG" if img.format == "MPO" else img.format
+                if detected != fmt:
+                    raise InvalidImage("File contents do not match its image format")
+    except InvalidImage:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise InvalidImage(f"Image is over the {settings.MAX_IMAGE_PIXELS} pixel limit")
+    except Exception:
+        raise InvalidImage("Corrupt image header")
+    
+    if width < 1 or height < 1:
+        raise InvalidImage("Image has no pixels")
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise InvalidImage(f"Image is {width}x{height}, larger than {settings.MAX_IMAGE_PIXELS} pixels")
+    if fmt != "JPEG" and width * height > settings.MAX_FULL_DECODE_PIXELS:
+        # Only JPEG can be decoded at reduced scale; other formats decode in full
+        raise InvalidImage(f"{fmt} images are limited to {settings.MAX_FULL_DECODE_PIXELS} pixels")
+    if is_truncated(content, fmt):
+        raise InvalidImage("Image file is truncated")
+    
+    return fmt, width, height
@@ -1,47 +1,69 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
-from typing import Optional, List
+from sqlalchemy import func, or_, select, tuple_, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+import redis
+from typing import Optional, List, Tuple
 from datetime import datetime
-from app.models.models import Like, Comment, Engagement, TaggedIn, Photo
+from app.core import conditional, likes
+from app.models.models import Like, Comment, Engagement, TaggedIn, Photo, User
+from app.crud.photo import attach_engagement, with_engagement
 from app.schemas.engagement import CommentCreate
 
 
-def toggle_like(db: Session, photo_id: int, user_id: int) -> dict:
-    """Toggle like on a photo. Returns like status and updated count."""
-    # Check if like exists
-    existing_like = db.query(Like).filter(
-        Like.photo_id == photo_id,
-        Like.user_id == user_id
-    ).first()
-    
-    # Get or create engagement record
+def _get_or_create_engagement(db: Session, photo_id: int) -> Engagement:
+    """Return the photo's engagement row, creating it on first like or comment."""
     engagement = db.query(Engagement).filter(Engagement.photo_id == photo_id).first()
     if not engagement:
-        engagement = Engagement(photo_id=photo_id, likes_count=0)
+        engagement = Engagement(photo_id=photo_id, likes_count=0, comments_count=0)
         db.add(engagement)
-        db.commit()
-        db.refresh(engagement)
-    
-    if existing_like:
-        # Unlike: remove like and decrement count
-        db.delete(existing_like)
-        engagement.likes_count = max(0, engagement.likes_count - 1)
-        liked = False
-    else:
-        # Like: add like and increment count
-        new_like = Like(photo_id=photo_id, user_id=user_id)
-        db.add(new_like)
-        engagement.likes_count += 1
-        liked = True
-    
-    db.commit()
-    db.refresh(engagement)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request created it first
+            db.rollback()
+            engagement = db.query(Engagement).filter(Engagement.photo_id == photo_id).one()
+    return engagement
+
+
+def _adjust_counts(db: Session, engagement_id: int, likes: int = 0, comments: int = 0) -> None:
+    """
+    Add to the denormalized counters with a single UPDATE.
+
+    Runs in the caller's transaction so the counter commits together with the
+    Like/Comment row it counts; no read-modify-write, so concurrent requests
+    cannot lose updates.
+    """
+    db.query(Engagement).filter(Engagement.id == engagement_id).update(
+        {
+            Engagement.likes_count: Engagement.likes_count + likes,
+            Engagement.comments_count: Engagement.comments_count + comments,
+        },
+        synchronize_session=False,
+    )
+
+
+def toggle_like(db: Session, photo_id: int, user_id: int) -> dict:
+    """
+    Toggle like on a photo. Returns like status and updated count.
+
+    Recorded in Redis and persisted by the flush_likes task; written straight
+    to Postgres when Redis is unavailable.
+    """
+    try:
+        liked, likes_count = likes.toggle(db, photo_id, user_id)
+    except redis.RedisError as e:
+        print(f"Like cache unavailable, writing through: {e}")
+        liked, likes_count = _toggle_like_in_db(db, photo_id, user_id)
+    conditional.bump()
     
     # Broadcast like count update via WebSocket
     from app.websockets.broadcast import broadcast_like_update
     broadcast_like_update(
         photo_id=photo_id,
-        likes_count=engagement.likes_count,
+        likes_count=likes_count,
         liked=liked,
         user_id=user_id
     )
@@ -50,21 +72,85 @@ def toggle_like(db: Session, photo_id: int, user_id: int) -> dict:
         "photo_id": photo_id,
         "user_id": user_id,
         "liked": liked,
-        "likes_count": engagement.likes_count
+        "likes_count": likes_count
     }
 
 
+def _toggle_like_in_db(db: Session, photo_id: int, user_id: int) -> tuple[bool, int]:
+    engagement = _get_or_create_engagement(db, photo_id)
+
+    # Unlike if a like exists, otherwise like
+    unliked = db.query(Like).filter(
+        Like.photo_id == photo_id,
+        Like.user_id == user_id
+    ).delete(synchronize_session=False)
+    if not unliked:
+        db.add(Like(photo_id=photo_id, user_id=user_id))
+    _adjust_counts(db, engagement.id, likes=-1 if unliked else 1)
+    
+    db.commit()
+    db.refresh(engagement)
+    likes.forget(photo_id)
+    return not unliked, engagement.likes_count
+
+
+def apply_like_changes(db: Session, pending: dict[int, dict[int, bool]]) -> set[int]:
+    """
+    Persist {photo_id: {user_id: liked}} from the like cache in one transaction.
+
+    Changes for photos or users deleted in the meantime are dropped; likes_count
+    is recounted for every touched photo.
+    """
+    user_ids = {user_id for changes in pending.values() for user_id in changes}
+    live_photos = {row[0] for row in db.query(Photo.id).filter(Photo.id.in_(pending))}
+    live_users = {row[0] for row in db.query(User.id).filter(User.id.in_(user_ids))}
+
+    try:
+        for photo_id in live_photos:
+            changes = pending[photo_id]
+            unliked = [user_id for user_id, liked in changes.items() if not liked]
+            if unliked:
+                db.query(Like).filter(
+                    Like.photo_id == photo_id, Like.user_id.in_(unliked)
+                ).delete(synchronize_session=False)
+            likers = [user_id for user_id, liked in changes.items() if liked and user_id in live_users]
+            if likers:
+                # likes has no unique (photo_id, user_id) constraint, so skip existing rows
+                existing = {
+                    row[0] for row in db.query(Like.user_id).filter(
+                        Like.photo_id == photo_id, Like.user_id.in_(likers)
+                    )
+                }
+                db.add_all(Like(photo_id=photo_id, user_id=user_id) for user_id in likers if user_id not in existing)
+
+        if live_photos:
+            db.execute(
+                pg_insert(Engagement)
+                .values([{"photo_id": photo_id, "likes_count": 0, "comments_count": 0} for photo_id in live_photos])
+                .on_conflict_do_nothing()
+            )
+            actual_likes = (
+                select(func.count(Like.id))
+                .where(Like.photo_id == Engagement.photo_id)
+                .correlate(Engagement)
+                .scalar_subquery()
+            )
+            db.query(Engagement).filter(Engagement.photo_id.in_(live_photos)).update(
+                {Engagement.likes_count: actual_likes},
+                synchronize_session=False,
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return live_photos
+
+
 def create_comment(db: Session, photo_id: int, user_id: int, comment: CommentCreate) -> Comment:
     """Create a new comment on a photo."""
-    # Get or create engagement record
-    engagement = db.query(Engagement).filter(Engagement.photo_id == photo_id).first()
-    if not engagement:
-        engagement = Engagement(photo_id=photo_id, likes_count=0)
-        db.add(engagement)
-        db.commit()
-        db.refresh(engagement)
+    engagement = _get_or_create_engagement(db, photo_id)
     
-    # Create comment
+    # Create comment and count it in the same transaction
     db_comment = Comment(
         engagement_id=engagement.id,
         author_id=user_id,
@@ -72,11 +158,44 @@ def create_comment(db: Session, photo_id: int, user_id: int, comment: CommentCre
         parent_id=comment.parent_id
     )
     db.add(db_comment)
+    _adjust_counts(db, engagement.id, comments=1)
     db.commit()
     db.refresh(db_comment)
+    conditional.bump()
     return db_comment
 
 
+def reconcile_engagement_counts(db: Session) -> int:
+    """
+    Recount likes and comments for engagements whose counters have drifted.
+
+    Only rows edited outside toggle_like/create_comment can drift. Returns the
+    number of engagements corrected.
+    """
+    actual_likes = (
+        select(func.count(Like.id))
+        .where(Like.photo_id == Engagement.photo_id)
+        .correlate(Engagement)
+        .scalar_subquery()
+    )
+    actual_comments = (
+        select(func.count(Comment.id))
+        .where(Comment.engagement_id == Engagement.id)
+        .correlate(Engagement)
+        .scalar_subquery()
+    )
+    corrected = db.query(Engagement).filter(
+        or_(Engagement.likes_count != actual_likes, Engagement.comments_count != actual_comments)
+    ).update(
+        {Engagement.likes_count: actual_likes, Engagement.comments_count: actual_comments},
+        synchronize_session=False,
+    )
+    db.commit()
+    if corrected:
+        conditional.bump()
+    return corrected
+
+
 def get_comments_by_photo(db: Session, photo_id: int) -> List[Comment]:
     """Get all comments for a photo, organized in threads."""
     engagement = db.query(Engagement).filter(Engagement.photo_id == photo_id).first()
@@ -91,19 +210,44 @@ def get_comments_by_photo(db: Session, photo_id: int) -> List[Comment]:
     return comments
 
 
-def get_user_liked_photos(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Photo]:
-    """Get all photos liked by a user."""
-    photos = db.query(Photo).join(Like).filter(
-        Like.user_id == user_id
-    ).offset(skip).limit(limit).all()
+def _library_query(user_id: int, position: Optional[Tuple[datetime, int]], limit: int):
+    mine = union(
+        select(Like.photo_id).where(Like.user_id == user_id),
+        select(TaggedIn.photo_id).where(TaggedIn.user_id == user_id),
+    ).subquery("mine")
+    query = with_engagement(select(Photo).join(mine, mine.c.photo_id == Photo.id), user_id)
+    if position:
+        query = query.filter(tuple_(Photo.created_at, Photo.id) < position)
+    return query.order_by(Photo.created_at.desc(), Photo.id.desc()).limit(limit)
+
+
+def get_user_library(
+    db: Session,
+    user_id: int,
+    position: Optional[Tuple[datetime, int]] = None,
+    limit: int = 100
+) -> List[Photo]:
+    """
+    Photos the user liked or is tagged in, newest first, after the keyset
+    `position` (created_at, id). One query: the user's photo ids are a UNION
+    of their likes and tags, and `likes_count`, `comments_count`, `is_liked`
+    and `tagged_user_ids` are set on each photo from the same row.
+    """
+    photos = attach_engagement(db.execute(_library_query(user_id, position, limit)).all())
+    # Toggles not yet flushed from the like cache
+    likes.overlay_like_state(photos, user_id)
     return photos
 
 
-def get_user_tagged_photos(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Photo]:
-    """Get all photos where user is tagged."""
-    photos = db.query(Photo).join(TaggedIn).filter(
-        TaggedIn.user_id == user_id
-    ).offset(skip).limit(limit).all()
+async def get_user_library_async(
+    db: AsyncSession,
+    user_id: int,
+    position: Optional[Tuple[datetime, int]] = None,
+    limit: int = 100
+) -> List[Photo]:
+    """get_user_library on an AsyncSession."""
+    photos = attach_engagement((await db.execute(_library_query(user_id, position, limit))).all())
+    await run_in_threadpool(likes.overlay_like_state, photos, user_id)
     return photos
 
 
@@ -123,5 +267,6 @@ def tag_user_in_photo(db: Session, photo_id: int, user_id: int) -> TaggedIn:
     db.add(tagged)
     db.commit()
     db.refresh(tagged)
+    conditional.bump()
     return tagged
 
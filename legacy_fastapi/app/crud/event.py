@@ -1,4 +1,6 @@
 import os
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.models import Event
@@ -6,6 +8,7 @@ from app.schemas.event import EventCreate, EventUpdate
 from app.core.slug import generate_slug, get_unique_slug
 from app.core.qrcode_generator import generate_qr_code
 from app.core.config import settings
+from app.core import facets
 
 
 def create_event(db: Session, event: EventCreate, base_url: str = "http://localhost:8000") -> Event:
@@ -51,6 +54,21 @@ def get_events(db: Session, skip: int = 0, limit: int = 100) -> List[Event]:
     return db.query(Event).offset(skip).limit(limit).all()
 
 
+async def get_event_async(db: AsyncSession, event_id: int) -> Optional[Event]:
+    """get_event on an AsyncSession."""
+    return await db.get(Event, event_id)
+
+
+async def get_event_by_slug_async(db: AsyncSession, slug: str) -> Optional[Event]:
+    """get_event_by_slug on an AsyncSession."""
+    return (await db.execute(select(Event).where(Event.slug == slug))).scalar_one_or_none()
+
+
+async def get_events_async(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Event]:
+    """get_events on an AsyncSession."""
+    return list((await db.execute(select(Event).offset(skip).limit(limit))).scalars())
+
+
 def update_event(db: Session, event_id: int, event_update: EventUpdate, base_url: str = "http://localhost:8000") -> Optional[Event]:
     """Update an event."""
     db_event = db.query(Event).filter(Event.id == event_id).first()
@@ -78,6 +96,8 @@ def update_event(db: Session, event_id: int, event_update: EventUpdate, base_url
     
     db.commit()
     db.refresh(db_event)
+    # The cached facet counts carry the event's name
+    facets.invalidate(db_event.id)
     return db_event
 
 
@@ -93,5 +113,6 @@ def delete_event(db: Session, event_id: int) -> bool:
     
     db.delete(db_event)
     db.commit()
+    facets.invalidate(event_id)
     return True
 
@@ -1,33 +1,84 @@
 import os
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, Text
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import String, and_, cast, false, literal, null, or_, func, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
-from app.models.models import Photo
+from app.models.models import Engagement, Event, Like, Photo, PhotoTag, TaggedIn, User
 from app.schemas.photo import PhotoCreate, PhotoFilterParams
+from app.core import conditional, facets, likes
+from app.core.config import settings
+from app.core.pagination import decode_cursor
 from pathlib import Path
 
+# Per-photo engagement computed alongside its columns by with_engagement
+ENGAGEMENT_FIELDS = ("likes_count", "comments_count", "is_liked", "tagged_user_ids")
+
 
 def create_photo(
     db: Session,
     original_path: str,
     uploader_id: int,
     event_id: Optional[int] = None,
-    processing_status: str = "pending"
+    processing_status: str = "pending",
+    width: Optional[int] = None,
+    height: Optional[int] = None
 ) -> Photo:
     """Create a new photo record."""
     db_photo = Photo(
         original_path=original_path,
         uploader_id=uploader_id,
         event_id=event_id,
-        processing_status=processing_status
+        processing_status=processing_status,
+        width=width,
+        height=height
     )
     db.add(db_photo)
     db.commit()
     db.refresh(db_photo)
+    facets.record_change(None, facets.snapshot(db_photo, ()))
+    conditional.bump()
     return db_photo
 
 
+def normalize_tags(*tag_lists: Optional[Iterable[str]]) -> List[str]:
+    """Lower-cased, stripped, deduplicated tags from any number of tag lists, in first-seen order."""
+    tags = {}
+    for tag_list in tag_lists:
+        for tag in tag_list or ():
+            tag = tag.strip().lower()
+            if tag:
+                tags.setdefault(tag, None)
+    return list(tags)
+
+
+def _sync_tags(db: Session, photo: Photo) -> None:
+    """Rewrite the photo's photo_tags rows from ai_tags and manual_tags (caller commits)."""
+    db.query(PhotoTag).filter(PhotoTag.photo_id == photo.id).delete(synchronize_session=False)
+    db.add_all(PhotoTag(photo_id=photo.id, tag=tag) for tag in normalize_tags(photo.ai_tags, photo.manual_tags))
+
+
+def tag_filter(terms: List[str], prefix: bool = False, match: str = "any"):
+    """
+    Condition on Photo for the tag search terms: equal to (or, with `prefix`,
+    starting with) each term, matching any or all of them. Every branch is an
+    index range scan on ix_photo_tags_tag.
+    """
+    terms = normalize_tags(terms)
+
+    def condition(term):
+        if prefix:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            return PhotoTag.tag.like(f"{escaped}%", escape="\\")
+        return PhotoTag.tag == term
+
+    if match == "all":
+        return and_(*(Photo.id.in_(select(PhotoTag.photo_id).where(condition(term))) for term in terms))
+    return Photo.id.in_(select(PhotoTag.photo_id).where(or_(*(condition(term) for term in terms))))
+
+
 def get_photo(db: Session, photo_id: int) -> Optional[Photo]:
     """Get photo by ID."""
     return db.query(Photo).filter(Photo.id == photo_id).first()
@@ -51,6 +102,7 @@ def update_photo_processing(
     db_photo = db.query(Photo).filter(Photo.id == photo_id).first()
     if not db_photo:
         return None
+    before = facets.snapshot(db_photo, normalize_tags(db_photo.ai_tags, db_photo.manual_tags))
     
     if thumbnail_path:
         db_photo.thumbnail_path = thumbnail_path
@@ -60,10 +112,15 @@ def update_photo_processing(
         db_photo.exif_data = exif_data
     if ai_tags:
         db_photo.ai_tags = ai_tags
+        _sync_tags(db, db_photo)
     db_photo.processing_status = processing_status
+    if processing_status in ("completed", "failed"):
+        db_photo.processed_at = datetime.utcnow()
     
     db.commit()
     db.refresh(db_photo)
+    facets.record_change(before, facets.snapshot(db_photo, normalize_tags(db_photo.ai_tags, db_photo.manual_tags)))
+    conditional.bump()
     return db_photo
     db.commit()
     db.refresh(db_photo)
@@ -75,10 +132,14 @@ def update_photo_tags(db: Session, photo_id: int, tags: List[str]) -> Optional[P
     db_photo = db.query(Photo).filter(Photo.id == photo_id).first()
     if not db_photo:
         return None
+    before = facets.snapshot(db_photo, normalize_tags(db_photo.ai_tags, db_photo.manual_tags))
     
     db_photo.manual_tags = tags
+    _sync_tags(db, db_photo)
     db.commit()
     db.refresh(db_photo)
+    facets.record_change(before, facets.snapshot(db_photo, normalize_tags(db_photo.ai_tags, db_photo.manual_tags)))
+    conditional.bump()
     return db_photo
 def save_uploaded_file(file_content: bytes, filename: str, upload_dir: Path) -> str:
     """Save uploaded file to disk and return path with forward slashes."""
@@ -89,14 +150,90 @@ def save_uploaded_file(file_content: bytes, filename: str, upload_dir: Path) ->
     return str(filepath).replace("\\", "/")
 
 
-def search_photos(
-    db: Session,
+def build_search_query(
     filters: PhotoFilterParams,
-    user_id: Optional[int] = None
-) -> List[Photo]:
-    """Advanced photo search with filtering."""
-    query = db.query(Photo)
+    columns: Optional[List[str]] = None,
+    user_id: Optional[int] = None,
+    engagement: Iterable[str] = ()
+):
+    """
+    The filtered, ordered and paginated photo select behind search_photos
+    and search_photos_async; each row is the photo followed by `engagement`.
+
+    `columns` limits the Photo columns loaded (id and created_at are always
+    loaded for pagination); None loads them all. `engagement` names
+    ENGAGEMENT_FIELDS to compute in the same statement (see with_engagement).
+    """
+    query = select(Photo)
+    if columns is not None:
+        loaded = {"id", "created_at", *(c for c in columns if c in Photo.__table__.columns)}
+        query = query.options(load_only(*(getattr(Photo, c) for c in loaded)))
+    query = filter_photos(query, filters)
+    query = with_engagement(query, user_id, engagement)
     
+    # Only show completed photos (Commented out for debug)
+    # query = query.filter(Photo.processing_status == "completed")
+    
+    # Order by creation date (newest first), id breaking ties
+    query = query.order_by(Photo.created_at.desc(), Photo.id.desc())
+    
+    # Apply pagination: keyset when a cursor is given, so deep pages cost the same as the first
+    position = decode_cursor(filters.cursor) if filters.cursor else None
+    if position:
+        query = query.filter(tuple_(Photo.created_at, Photo.id) < position)
+    else:
+        query = query.offset(filters.skip)
+    return query.limit(filters.limit)
+
+
+def _engagement_fields(fields: Iterable[str]) -> List[str]:
+    fields = set(fields)
+    return [name for name in ENGAGEMENT_FIELDS if name in fields]
+
+
+def with_engagement(query, user_id: Optional[int], fields: Iterable[str] = ENGAGEMENT_FIELDS):
+    """
+    Add a column per name in `fields` (of ENGAGEMENT_FIELDS) to a Photo select:
+    counts from a LEFT JOIN on engagements, `is_liked` as an EXISTS on the
+    user's like and `tagged_user_ids` as an array_agg subquery. Read the
+    rows back with attach_engagement.
+    """
+    fields = _engagement_fields(fields)
+    if "likes_count" in fields or "comments_count" in fields:
+        query = query.outerjoin(Engagement, Engagement.photo_id == Photo.id)
+    for name in fields:
+        if name == "likes_count":
+            column = func.coalesce(Engagement.likes_count, 0)
+        elif name == "comments_count":
+            column = func.coalesce(Engagement.comments_count, 0)
+        elif name == "is_liked":
+            if user_id:
+                column = select(Like.id).where(Like.photo_id == Photo.id, Like.user_id == user_id).exists()
+            else:
+                column = false()
+        else:
+            column = (
+                select(func.array_agg(aggregate_order_by(TaggedIn.user_id, TaggedIn.user_id)))
+                .where(TaggedIn.photo_id == Photo.id)
+                .scalar_subquery()
+            )
+        query = query.add_columns(column.label(name))
+    return query
+
+
+def attach_engagement(rows: Iterable[tuple], fields: Iterable[str] = ENGAGEMENT_FIELDS) -> List[Photo]:
+    """The photos of with_engagement rows, with each added column set as an attribute."""
+    fields = _engagement_fields(fields)
+    photos = []
+    for photo, *values in rows:
+        for name, value in zip(fields, values):
+            setattr(photo, name, [] if value is None and name == "tagged_user_ids" else value)
+        photos.append(photo)
+    return photos
+
+
+def filter_photos(query, filters: PhotoFilterParams):
+    """Apply the search filters (not ordering or pagination) to a Photo query or select."""
     # Filter by event
     if filters.event_id:
         query = query.filter(Photo.event_id == filters.event_id)
@@ -111,50 +248,120 @@ def search_photos(
     if filters.date_to:
         query = query.filter(Photo.created_at <= filters.date_to)
     
-    # Filter by tags (using PostgreSQL JSONB array contains)
+    # Filter by tags through the normalized, indexed photo_tags rows
     if filters.tags:
-        tag_conditions = []
-        for tag in filters.tags:
-            # Search in ai_tags JSONB array - check if any array element contains the tag
-            # Using JSONB @> operator to check if array contains a value
-            # For case-insensitive, we'll use a different approach
-            tag_lower = tag.lower()
-            # Check if ai_tags (as text) contains the tag (case-insensitive) OR manual_tags contains the tag
-            tag_conditions.append(
-                or_(
-                    func.cast(Photo.ai_tags, Text).ilike(f"%{tag_lower}%"),
-                    func.cast(Photo.manual_tags, Text).ilike(f"%{tag_lower}%")
-                )
-            )
-        if tag_conditions:
-            # Use OR for multiple tags (photo matches if it has any of the tags)
-            query = query.filter(or_(*tag_conditions))
-    
-    # Only show completed photos (Commented out for debug)
-    # query = query.filter(Photo.processing_status == "completed")
-    
-    # Order by creation date (newest first)
-    query = query.order_by(Photo.created_at.desc())
-    
-    # Apply pagination
-    photos = query.offset(filters.skip).limit(filters.limit).all()
-    
-    # Add engagement data
-    from app.models.models import Like, Engagement
-    for photo in photos:
-        # Get engagement record
-        engagement = db.query(Engagement).filter(Engagement.photo_id == photo.id).first()
-        photo.likes_count = engagement.likes_count if engagement else 0
-        
-        # Check if user liked this photo (if user_id is provided)
-        if user_id:
-            like = db.query(Like).filter(
-                Like.photo_id == photo.id,
-                Like.user_id == user_id
-            ).first()
-            photo.is_liked = like is not None
-        else:
-            photo.is_liked = False
+        query = query.filter(tag_filter(filters.tags, filters.tag_prefix, filters.tag_match))
+    return query
+
+
+def count_facets(db: Session, filters: PhotoFilterParams, names: Iterable[str], size: Optional[int] = None) -> List[tuple]:
+    """
+    (facet, value, label, count) rows for each facet in `names` over the
+    filtered photos, at most `size` values per facet, in one statement: the
+    filtered photos are a CTE and each facet is a GROUP BY over it.
+    """
+    p = filter_photos(select(Photo.id, Photo.uploader_id, Photo.event_id, Photo.created_at), filters).cte("p")
+    month = func.to_char(p.c.created_at, "YYYY-MM")
+
+    def columns(name, value, label):
+        return literal(name).label("facet"), value.label("value"), label.label("label"), func.count().label("n")
+
+    parts = {
+        "tag": select(*columns("tag", PhotoTag.tag, null()))
+        .select_from(PhotoTag).join(p, PhotoTag.photo_id == p.c.id).group_by(PhotoTag.tag),
+        "photographer": select(*columns("photographer", cast(p.c.uploader_id, String), User.email))
+        .select_from(p).join(User, User.id == p.c.uploader_id).group_by(p.c.uploader_id, User.email),
+        "event": select(*columns("event", cast(p.c.event_id, String), Event.name))
+        .select_from(p).join(Event, Event.id == p.c.event_id).group_by(p.c.event_id, Event.name),
+        "month": select(*columns("month", month, null())).select_from(p).group_by(month),
+    }
+    counted = union_all(*(parts[name] for name in names)).subquery("f")
+    if size is None:
+        return db.execute(select(counted)).all()
+    ranked = select(
+        counted,
+        func.row_number().over(partition_by=counted.c.facet, order_by=(counted.c.n.desc(), counted.c.value)).label("r"),
+    ).subquery("ranked")
+    statement = select(ranked.c.facet, ranked.c.value, ranked.c.label, ranked.c.n).where(ranked.c.r <= size)
+    return db.execute(statement).all()
+
+
+def _fill_labels(db: Session, event_id: int, counts: Dict[str, List[dict]]) -> None:
+    """Label ids first counted after the event's facet hash was built."""
+    for name, model, column in (("photographer", User, User.email), ("event", Event, Event.name)):
+        missing = [entry for entry in counts.get(name, ()) if entry["label"] is None]
+        if not missing:
+            continue
+        labels = dict(db.query(model.id, column).filter(model.id.in_([e["value"] for e in missing])).all())
+        for entry in missing:
+            entry["label"] = labels.get(entry["value"])
+        facets.store_labels(event_id, name, labels)
+
+
+def photo_facets(db: Session, filters: PhotoFilterParams, names: List[str]) -> Dict[str, List[dict]]:
+    """
+    Top values of each facet in `names` over the filtered photos. A whole
+    event (no other filter) is served from its cached, incrementally
+    maintained counts; anything else is counted by count_facets.
+    """
+    whole_event = filters.event_id and not (
+        filters.photographer_id or filters.date_from or filters.date_to or filters.tags
+    )
+    if whole_event:
+        counts = facets.for_event(
+            filters.event_id, names, lambda: count_facets(db, PhotoFilterParams(event_id=filters.event_id), facets.FACETS),
+        )
+        if counts is not None:
+            _fill_labels(db, filters.event_id, counts)
+            return counts
+
+    counts = {name: [] for name in names}
+    if not names:
+        return counts
+    for name, value, label, count in count_facets(db, filters, names, settings.FACET_SIZE):
+        entry = {"value": facets.format_value(name, value), "count": count}
+        if name in facets.LABELLED:
+            entry["label"] = label
+        counts[name].append(entry)
+    return facets.sort_and_trim(counts)
+
+
+def _search_engagement(columns: Optional[List[str]]) -> List[str]:
+    # tagged_users is returned as the ids in `tagged_user_ids`
+    if columns is None:
+        return list(ENGAGEMENT_FIELDS)
+    return ["tagged_user_ids" if name == "tagged_users" else name for name in columns]
+
+
+def search_photos(
+    db: Session,
+    filters: PhotoFilterParams,
+    user_id: Optional[int] = None,
+    columns: Optional[List[str]] = None
+) -> List[Photo]:
+    """
+    Advanced photo search with filtering; see build_search_query. Engagement
+    data among `columns` (likes_count, is_liked, comments_count, and
+    tagged_users as `tagged_user_ids`) comes from the same query.
+    """
+    engagement = _search_engagement(columns)
+    rows = db.execute(build_search_query(filters, columns, user_id, engagement)).all()
+    photos = attach_engagement(rows, engagement)
     
+    # Toggles not yet flushed from the like cache
+    likes.overlay_like_state(photos, user_id)
     return photos
 
+
+async def search_photos_async(
+    db: AsyncSession,
+    filters: PhotoFilterParams,
+    user_id: Optional[int] = None,
+    columns: Optional[List[str]] = None
+) -> List[Photo]:
+    """search_photos on an AsyncSession."""
+    engagement = _search_engagement(columns)
+    rows = (await db.execute(build_search_query(filters, columns, user_id, engagement))).all()
+    photos = attach_engagement(rows, engagement)
+    await run_in_threadpool(likes.overlay_like_state, photos, user_id)
+    return photos
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Text, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Text, JSON, DateTime, Index
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import date, datetime
@@ -62,6 +62,8 @@ class Photo(Base):
     original_path = Column(String, nullable=False)
     thumbnail_path = Column(String, nullable=True)
     watermarked_path = Column(String, nullable=True)
+    width = Column(Integer, nullable=True)  # Read from the file header at upload time
+    height = Column(Integer, nullable=True)
     exif_data = Column(JSONB, nullable=True)  # PostgreSQL JSONB for EXIF data
     ai_tags = Column(JSONB, nullable=True)  # PostgreSQL JSONB for AI-generated tags
     manual_tags = Column(JSONB, nullable=True)  # PostgreSQL JSONB for user-added tags
@@ -69,6 +71,14 @@ class Photo(Base):
     uploader_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     processing_status = Column(String, default="pending", nullable=False)  # pending, processing, completed, failed
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True, index=True)  # Set when processing completes or fails
+
+    __table_args__ = (
+        Index("ix_photos_uploader_status", "uploader_id", "processing_status"),
+        # Keyset pagination of the photo feed, overall and per event
+        Index("ix_photos_feed", created_at.desc(), id.desc()),
+        Index("ix_photos_event_feed", "event_id", created_at.desc(), id.desc()),
+    )
 
     # Relationships
     event = relationship("Event", back_populates="photos")
@@ -76,6 +86,23 @@ class Photo(Base):
     engagement = relationship("Engagement", back_populates="photo", uselist=False, cascade="all, delete-orphan")
     likes = relationship("Like", back_populates="photo", cascade="all, delete-orphan")
     tagged_users = relationship("TaggedIn", back_populates="photo", cascade="all, delete-orphan")
+    tags = relationship("PhotoTag", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class PhotoTag(Base):
+    """
+    A photo's ai_tags and manual_tags, lower-cased and deduplicated, one row
+    per tag. Kept in sync by crud.photo; searched by exact value or prefix.
+    """
+    __tablename__ = "photo_tags"
+
+    photo_id = Column(Integer, ForeignKey("photos.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+
+    __table_args__ = (
+        # Equality and LIKE 'prefix%' on tag whatever the database collation
+        Index("ix_photo_tags_tag", "tag", "photo_id", postgresql_ops={"tag": "text_pattern_ops"}),
+    )
 
 
 class Engagement(Base):
@@ -84,7 +111,9 @@ class Engagement(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     photo_id = Column(Integer, ForeignKey("photos.id"), unique=True, nullable=False)
+    # Denormalized counters, updated atomically by app.crud.engagement
     likes_count = Column(Integer, default=0, nullable=False)
+    comments_count = Column(Integer, default=0, server_default="0", nullable=False)
     extra_metadata = Column(JSONB, nullable=True)  # PostgreSQL JSONB for additional metadata
 
     # Relationships
@@ -101,6 +130,11 @@ class Like(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # A user's likes, for their library
+        Index("ix_likes_user_photo", "user_id", "photo_id"),
+    )
+
     # Relationships
     photo = relationship("Photo", back_populates="likes")
     user = relationship("User", back_populates="likes")
@@ -115,6 +149,12 @@ class TaggedIn(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # Photos a user is tagged in, and the users tagged in a photo
+        Index("ix_tagged_in_user_photo", "user_id", "photo_id"),
+        Index("ix_tagged_in_photo", "photo_id", "user_id"),
+    )
+
     # Relationships
     photo = relationship("Photo", back_populates="tagged_users")
     user = relationship("User", back_populates="tagged_in")
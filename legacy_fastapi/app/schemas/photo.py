@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 
@@ -15,6 +15,8 @@ class Photo(PhotoBase):
     id: int
     original_path: str
     thumbnail_path: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
     exif_data: Optional[Dict[str, Any]] = None
     ai_tags: Optional[List[str]] = None
     manual_tags: Optional[List[str]] = None
@@ -43,13 +45,51 @@ class PhotoFilterParams(BaseModel):
     date_from: Optional[datetime] = None
     date_to: Optional[datetime] = None
     tags: Optional[List[str]] = None
+    tag_prefix: bool = False  # match tags starting with each term instead of equal to it
+    tag_match: Literal["any", "all"] = "any"  # photos with any of the terms, or with all of them
+    cursor: Optional[str] = None  # keyset position from the previous page; preferred over skip
     skip: int = 0
     limit: int = 100
 
 
+class FacetValue(BaseModel):
+    """Photos per value of a facet; ids (photographer, event) carry a label."""
+    value: Union[int, str]
+    label: Optional[str] = None
+    count: int
+
+
 class PhotoWithEngagement(Photo):
     """Photo with engagement data."""
     comments_count: Optional[int] = 0
     tagged_users: Optional[List[int]] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+# What a grid needs; the list endpoint returns only these unless ?fields= or
+# ?expand= asks for more
+PHOTO_LIST_FIELDS = (
+    "id", "thumbnail_path", "width", "height", "event_id", "processing_status",
+    "created_at", "likes_count", "is_liked", "comments_count",
+)
+
+
+class PhotoListItem(BaseModel):
+    """Sparse photo in list responses; only the selected fields are set and returned."""
+    id: int
+    event_id: Optional[int] = None
+    original_path: Optional[str] = None
+    thumbnail_path: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    exif_data: Optional[Dict[str, Any]] = None
+    ai_tags: Optional[List[str]] = None
+    manual_tags: Optional[List[str]] = None
+    uploader_id: Optional[int] = None
+    processing_status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    likes_count: Optional[int] = None
+    is_liked: Optional[bool] = None
+    comments_count: Optional[int] = None
+    tagged_users: Optional[List[int]] = None
@@ -1,5 +1,7 @@
 from celery import Celery
+from celery.signals import worker_process_init
 from app.core.config import settings
+from app.core.database import dispose_after_fork
 
 celery_app = Celery(
     "img_project",
@@ -14,5 +16,44 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    # Live events and archival uploads are processed from separate queues,
+    # with a worker dedicated to the live one (docker-compose.yml): a worker
+    # reading several queues serves them by message priority, not by weight.
+    # Periodic maintenance has its own queue and worker, outside the photo
+    # backlog, and top priority for workers that also read photo queues
+    task_routes={
+        "process_photo": {"queue": "photos_archive"},
+        "reconcile_engagement_counts": {"queue": "maintenance", "priority": 0},
+        "flush_likes": {"queue": "maintenance", "priority": 0},
+    },
+    task_default_priority=5,
+    # Redis emulates priorities with one list per step; 0 is served first
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    worker_prefetch_multiplier=1,
+    # Children past the memory ceiling are replaced after their current task;
+    # late acks redeliver the task of a child that is OOM-killed anyway
+    worker_max_memory_per_child=settings.WORKER_RSS_CEILING_MB * 1024,  # KiB
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    beat_schedule={
+        "flush-likes": {
+            "task": "flush_likes",
+            "schedule": 2.0,
+        },
+        "reconcile-engagement-counts": {
+            "task": "reconcile_engagement_counts",
+            "schedule": 3600.0,
+        },
+    },
 )
 
+
+
+@worker_process_init.connect
+def reset_database_pools(**kwargs):
+    """Prefork children must not share the parent's pooled connections."""
+    dispose_after_fork()
@@ -0,0 +1,52 @@
+from PIL import Image
+from app.core.config import settings
+
+# PIL warns at this size and refuses at twice it; we refuse at it ourselves
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+
+# Formats whose decoder supports draft mode (MPO is multi-picture JPEG); the
+# rest decode at full size and are rejected above MAX_FULL_DECODE_PIXELS
+DRAFT_FORMATS = ("JPEG", "MPO")
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def open_image(image_path: str) -> Image.Image:
+    """Open an image lazily, rejecting decompression bombs from the header alone."""
+    img = Image.open(image_path)
+    if img.width * img.height > settings.MAX_IMAGE_PIXELS:
+        width, height = img.size
+        img.close()
+        raise ImageTooLarge(f"Image {width}x{height} exceeds {settings.MAX_IMAGE_PIXELS} pixels")
+    if img.format not in DRAFT_FORMATS and img.width * img.height > settings.MAX_FULL_DECODE_PIXELS:
+        (width, height), fmt = img.size, img.format
+        img.close()
+        raise ImageTooLarge(f"{fmt} image {width}x{height} exceeds {settings.MAX_FULL_DECODE_PIXELS} pixels")
+    return img
+
+
+def load_bounded(img: Image.Image, max_edge: int) -> Image.Image:
+    """
+    Decode an image in RGB with its long side no larger than max_edge.
+    
+    For JPEGs thumbnail() decodes at 1/2, 1/4 or 1/8 scale (draft mode) and
+    reduces in blocks, so the full-resolution frame is never held in memory.
+    """
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def rendition_edge(img: Image.Image) -> int:
+    """
+    Long edge for the watermarked rendition: full size, but capped at
+    LARGE_IMAGE_MAX_EDGE above LARGE_IMAGE_PIXELS. The original is kept as is.
+    """
+    if img.width * img.height > settings.LARGE_IMAGE_PIXELS:
+        return settings.LARGE_IMAGE_MAX_EDGE
+    return max(img.size)
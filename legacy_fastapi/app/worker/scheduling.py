@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+from typing import Optional
+from app.core.config import settings
+from app.models.models import Event
+
+QUEUES = {
+    "live": "photos_live",
+    "archive": "photos_archive",
+}
+
+# Redis priority steps: 0 is served first, 9 last
+HIGHEST_PRIORITY = 0
+LOWEST_PRIORITY = 9
+
+
+def is_live_event(event: Optional[Event]) -> bool:
+    """An event is live if it is dated within LIVE_EVENT_WINDOW_DAYS of today."""
+    if event is None:
+        return False
+    return abs(event.date - date.today()) <= timedelta(days=settings.LIVE_EVENT_WINDOW_DAYS)
+
+
+def priority_for(uploader_backlog: int) -> int:
+    """Broker priority for an uploader who already has `uploader_backlog` photos in flight."""
+    step = uploader_backlog // settings.SCHEDULER_SHARE_STEP
+    return min(HIGHEST_PRIORITY + step, LOWEST_PRIORITY)
+
+
+def enqueue_photo(photo_id: int, original_path: str, event: Optional[Event], uploader_backlog: int = 0):
+    """Send a photo to the live or archive queue with a fair-share priority."""
+    from app.worker.tasks import process_photo_task
+
+    priority_class = "live" if is_live_event(event) else "archive"
+    process_photo_task.apply_async(
+        args=(photo_id, original_path),
+        queue=QUEUES[priority_class],
+        priority=priority_for(uploader_backlog),
+    )
@@ -9,13 +9,15 @@ from torchvision.models import resnet50, ResNet50_Weights
 from app.worker.celery_app import celery_app
 from app.core.database import SessionLocal
 from app.crud.photo import update_photo_processing
+from app.worker.imaging import open_image, load_bounded, rendition_edge
+from app.worker import watchdog  # noqa: F401 - registers the memory sampling signal handlers
 
 
 def extract_exif_data(image_path: str) -> dict:
     """Extract EXIF data from image using Pillow."""
     exif_data = {}
     try:
-        with Image.open(image_path) as img:
+        with open_image(image_path) as img:
             # Try new method first (Pillow >= 8.0)
             if hasattr(img, 'getexif'):
                 exif = img.getexif()
@@ -46,11 +48,9 @@ def extract_exif_data(image_path: str) -> dict:
 def generate_thumbnail(image_path: str, output_path: str, size: tuple = (400, 400)) -> str:
     """Generate a 400x400 thumbnail from the original image."""
     try:
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary (JPEG doesn't support RGBA)
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            # Maintain aspect ratio
+        with open_image(image_path) as img:
+            # Shrink first (decoding at reduced scale), then convert for JPEG output
+            img = load_bounded(img, max(size))
             img.thumbnail(size, Image.Resampling.LANCZOS)
             img.save(output_path, "JPEG", quality=85)
         return output_path
@@ -62,19 +62,15 @@ def generate_thumbnail(image_path: str, output_path: str, size: tuple = (400, 40
 def apply_watermark(image_path: str, output_path: str, watermark_text: str = "IMG Project") -> str:
     """Apply text watermark overlay to image."""
     try:
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Create a copy for watermarking
-            watermarked = img.copy()
+        with open_image(image_path) as img:
+            # Decode once, capped for very large images; drawn on in place
+            watermarked = load_bounded(img, rendition_edge(img))
             draw = ImageDraw.Draw(watermarked)
             
             # Try to load a font, fallback to default if not available
             try:
                 # Try to use a system font
-                font_size = max(20, int(img.width / 30))
+                font_size = max(20, int(watermarked.width / 30))
                 try:
                     font = ImageFont.truetype("arial.ttf", font_size)
                 except:
@@ -92,20 +88,20 @@ def apply_watermark(image_path: str, output_path: str, watermark_text: str = "IM
             
             # Position with padding
             padding = 10
-            x = img.width - text_width - padding
-            y = img.height - text_height - padding
+            x = watermarked.width - text_width - padding
+            y = watermarked.height - text_height - padding
             
-            # Draw semi-transparent background for text
-            overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-            overlay_draw = ImageDraw.Draw(overlay)
-            overlay_draw.rectangle(
-                [x - padding, y - padding, x + text_width + padding, y + text_height + padding],
-                fill=(0, 0, 0, 128)
+            # Draw semi-transparent background for text. Only the corner tile is
+            # converted to RGBA, so no full-frame RGBA copy is ever made.
+            box = (
+                max(0, x - padding),
+                max(0, y - padding),
+                min(watermarked.width, x + text_width + padding),
+                min(watermarked.height, y + text_height + padding),
             )
-            watermarked = Image.alpha_composite(
-                watermarked.convert('RGBA'),
-                overlay
-            ).convert('RGB')
+            tile = watermarked.crop(box).convert('RGBA')
+            overlay = Image.new('RGBA', tile.size, (0, 0, 0, 128))
+            watermarked.paste(Image.alpha_composite(tile, overlay).convert('RGB'), box[:2])
             
             # Draw text
             draw = ImageDraw.Draw(watermarked)
@@ -170,9 +166,9 @@ def generate_ai_tags(image_path: str, top_k: int = 5) -> list:
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
         
-        with Image.open(image_path) as img:
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+        with open_image(image_path) as img:
+            # The model only sees 224x224, so never decode more than a small multiple of that
+            img = load_bounded(img, 512)
             img_tensor = transform(img).unsqueeze(0)
         
         # Get predictions
@@ -300,3 +296,53 @@ def process_photo_task(photo_id: int, original_path: str):
     finally:
         db.close()
 
+
+
+@celery_app.task(name="reconcile_engagement_counts")
+def reconcile_engagement_counts_task():
+    """
+    Periodic repair of engagement counters that drifted through edits made
+    outside the API.
+    """
+    from app.crud.engagement import reconcile_engagement_counts
+
+    db = SessionLocal()
+    try:
+        corrected = reconcile_engagement_counts(db)
+        if corrected:
+            print(f"Reconciled engagement counters for {corrected} photos")
+        return corrected
+    finally:
+        db.close()
+
+
+@celery_app.task(name="flush_likes")
+def flush_likes_task():
+    """
+    Write-behind flush of likes recorded in Redis. Failed batches are marked
+    dirty again and retried on the next run.
+    """
+    import redis
+    from app.core import likes
+    from app.core.config import settings
+    from app.crud.engagement import apply_like_changes
+
+    try:
+        pending = likes.drain_pending(settings.LIKES_FLUSH_BATCH)
+    except redis.RedisError as e:
+        print(f"Could not read pending likes: {e}")
+        return 0
+    if not pending:
+        return 0
+
+    db = SessionLocal()
+    try:
+        apply_like_changes(db, pending)
+    except Exception as e:
+        print(f"Error flushing likes for {len(pending)} photos: {e}")
+        likes.retry_flush(list(pending))
+        raise
+    finally:
+        db.close()
+    likes.finish_flush(list(pending))
+    return len(pending)
@@ -0,0 +1,140 @@
+"""
+Worker-side memory watchdog for the photo processing task.
+
+Samples RSS around every photo task and records the peak per image size
+bucket in Redis. Recycling itself is done by Celery
+(`worker_max_memory_per_child`), which replaces a pool child only after its
+current task has finished; late acks redeliver the task of a child that is
+OOM-killed anyway.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import redis
+from celery.signals import task_postrun, task_prerun
+from PIL import Image
+from app.core.config import settings
+
+WATCHED_TASKS = {"process_photo"}
+
+# Megapixel upper bounds for the size buckets peak memory is recorded under
+SIZE_BUCKETS = ((4, "0-4MP"), (12, "4-12MP"), (24, "12-24MP"), (50, "24-50MP"))
+
+COUNTERS_KEY = "photos:metrics"
+MEMORY_KEY = "photos:memory"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_samples = {}
+_client: Optional[redis.Redis] = None
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"))
+    _malloc_trim = _libc.malloc_trim
+except (OSError, AttributeError, TypeError):
+    _malloc_trim = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux - fall back to the lifetime peak
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def size_bucket(path: str) -> str:
+    try:
+        with Image.open(path) as img:
+            megapixels = img.width * img.height / 1_000_000
+    except Exception:
+        return "unknown"
+    for limit, label in SIZE_BUCKETS:
+        if megapixels < limit:
+            return label
+    return f"{SIZE_BUCKETS[-1][0]}MP+"
+
+
+def recycle_due() -> bool:
+    """
+    Whether Celery will replace this pool child once its task returns. It
+    compares the lifetime peak (ru_maxrss, KiB) with worker_max_memory_per_child,
+    so trimming the heap afterwards does not prevent it.
+    """
+    return peak_rss_mb() > settings.WORKER_RSS_CEILING_MB
+
+
+def release_memory() -> None:
+    """Return freed heap pages to the OS; PIL/torch leave glibc arenas fragmented."""
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+def record_memory_sample(bucket: str, peak_mb: float, growth_mb: float, recycled: bool) -> None:
+    """Record one task's peak RSS and RSS growth under an image size bucket."""
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.hincrby(MEMORY_KEY, f"{bucket}:tasks", 1)
+        pipe.hincrbyfloat(MEMORY_KEY, f"{bucket}:growth_mb_total", growth_mb)
+        if recycled:
+            pipe.hincrby(COUNTERS_KEY, "worker_recycles", 1)
+        pipe.hget(MEMORY_KEY, f"{bucket}:peak_mb")
+        previous_peak = pipe.execute()[-1]
+        if previous_peak is None or peak_mb > float(previous_peak):
+            client.hset(MEMORY_KEY, f"{bucket}:peak_mb", round(peak_mb, 1))
+    except redis.RedisError as e:
+        print(f"Could not record memory sample: {e}")
+
+
+@task_prerun.connect
+def sample_before(task_id=None, task=None, **kwargs):
+    if task is None or task.name not in WATCHED_TASKS:
+        return
+    _samples[task_id] = (current_rss_mb(), peak_rss_mb())
+
+
+@task_postrun.connect
+def sample_after(task_id=None, task=None, args=None, **kwargs):
+    before = _samples.pop(task_id, None)
+    if before is None:
+        return
+    rss_before, peak_before = before
+    rss_after, peak_after = current_rss_mb(), peak_rss_mb()
+
+    # The lifetime peak only moves if this task set a new high-water mark
+    task_peak = peak_after if peak_after > peak_before else max(rss_before, rss_after)
+
+    if rss_after >= settings.WORKER_TRIM_RSS_MB:
+        release_memory()
+    recycled = recycle_due()
+    path = args[1] if args and len(args) > 1 else None
+    record_memory_sample(size_bucket(path) if path else "unknown", task_peak, rss_after - rss_before, recycled)
+    if recycled:
+        # Celery will replace this child before it takes another task
+        print(f"Worker {os.getpid()} peak RSS {peak_after:.0f}MB over ceiling, recycling")
@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.api.v1 import events, photos, me
+from app.core.config import settings
+from app.core.database import pool_status
+from app.core.dependencies import require_admin_or_coordinator
 from app.websockets import notifications
 import os
 
@@ -9,13 +14,45 @@ app = FastAPI(
     title="IMG Project API",
     description="FastAPI application for image management",
     version="1.0.0",
+    # orjson encodes responses several times faster than the stdlib json module
+    default_response_class=ORJSONResponse,
 )
 
 # Create media directory if it doesn't exist
 os.makedirs("media", exist_ok=True)
 
+
+class MediaFiles(StaticFiles):
+    """Serves media; renditions are named after their unique original, so they never change."""
+
+    IMMUTABLE_PREFIXES = ("thumbnails/", "watermarked/")
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = self.get_path(scope)
+        if path.startswith(self.IMMUTABLE_PREFIXES):
+            response.headers["Cache-Control"] = settings.RENDITION_CACHE_CONTROL
+        return response
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """GZip for API responses only: media and downloads are already compressed and are served by byte range."""
+
+    UNCOMPRESSED_SUFFIXES = ("/download", "/download.zip")
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] == "http" and (path.startswith("/media/") or path.endswith(self.UNCOMPRESSED_SUFFIXES)):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 # Mount static files
-app.mount("/media", StaticFiles(directory="media"), name="media")
+app.mount("/media", MediaFiles(directory="media"), name="media")
+
+# Compress responses above the threshold
+app.add_middleware(APIGZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE)
 
 # Configure CORS
 app.add_middleware(
@@ -46,3 +83,9 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+
+@app.get("/health/db", dependencies=[Depends(require_admin_or_coordinator)])
+async def database_health():
+    """Connection pool size, use and checkout waits of the process that answers (admins and coordinators)."""
+    return pool_status()
+
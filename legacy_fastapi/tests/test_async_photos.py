@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from app.core.database import async_engine, get_async_db
+from app.core.security import create_access_token
+from app.models.models import Engagement, Like, Photo, User
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(async_db):
+    app.dependency_overrides[get_async_db] = lambda: async_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+async def viewer(async_db):
+    user = User(email="viewer@example.com", password="x", role="Member")
+    async_db.add(user)
+    await async_db.flush()
+    return user
+
+
+async def _add_photos(db, uploader, count, liked_by=None):
+    start = datetime(2025, 1, 1)
+    photos = [
+        Photo(original_path=f"media/originals/{i}.jpg", uploader_id=uploader.id, created_at=start + timedelta(seconds=i))
+        for i in range(count)
+    ]
+    db.add_all(photos)
+    await db.flush()
+    if liked_by is not None:
+        db.add_all(Engagement(photo_id=photo.id, likes_count=1) for photo in photos)
+        db.add_all(Like(photo_id=photo.id, user_id=liked_by.id) for photo in photos)
+        await db.flush()
+    return photos
+
+
+async def test_list_query_count_does_not_grow_with_page_size(client, async_db, viewer, count_queries):
+    headers = {"Authorization": f"Bearer {create_access_token(viewer.id)}"}
+    await _add_photos(async_db, viewer, 2, liked_by=viewer)
+    with count_queries(async_engine.sync_engine) as small:
+        response = await client.get("/api/v1/photos/", headers=headers)
+    assert response.status_code == 200
+
+    await _add_photos(async_db, viewer, 20, liked_by=viewer)
+    with count_queries(async_engine.sync_engine) as large:
+        response = await client.get("/api/v1/photos/", headers=headers)
+
+    assert len(response.json()) == 22
+    # The viewer is already in the session, so only the page (with its engagement) is queried
+    assert len(small) == len(large) == 1
+    assert all(photo["is_liked"] and photo["likes_count"] == 1 for photo in response.json())
+
+
+async def test_list_returns_the_compact_fields_unless_asked(client, async_db, viewer):
+    await _add_photos(async_db, viewer, 1)
+
+    compact = (await client.get("/api/v1/photos/")).json()[0]
+    selected = (await client.get("/api/v1/photos/", params={"fields": "thumbnail_path"})).json()[0]
+
+    assert {"id", "thumbnail_path", "likes_count", "is_liked", "comments_count"} <= set(compact)
+    assert "exif_data" not in compact
+    assert set(selected) == {"id", "thumbnail_path"}
+
+
+async def test_full_pages_link_to_the_next_by_cursor(client, async_db, viewer):
+    photos = await _add_photos(async_db, viewer, 3)
+
+    first = await client.get("/api/v1/photos/", params={"limit": 2})
+    rest = await client.get("/api/v1/photos/", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+
+    newest_first = [photo.id for photo in reversed(photos)]
+    assert [photo["id"] for photo in first.json()] == newest_first[:2]
+    assert [photo["id"] for photo in rest.json()] == newest_first[2:]
+    assert "X-Next-Cursor" not in rest.headers
+
+
+async def test_unchanged_list_is_not_modified(client, async_db, viewer):
+    await _add_photos(async_db, viewer, 1)
+
+    first = await client.get("/api/v1/photos/")
+    again = await client.get("/api/v1/photos/", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from app.core import database
+from app.core.database import TimedQueuePool, dispose_after_fork, get_db
+from main import app
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_checkouts_and_timeouts_are_counted(small_engine):
+    with small_engine.connect():
+        with pytest.raises(PoolTimeout):
+            small_engine.connect()
+
+    stats = small_engine.pool.stats.as_dict()
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms_max"] > 0
+
+
+def test_stats_survive_pool_recreation(small_engine):
+    with small_engine.connect():
+        pass
+    stats = small_engine.pool.stats
+
+    small_engine.dispose()
+
+    assert small_engine.pool.stats is stats
+    assert stats.checkouts == 1
+
+
+def test_dispose_after_fork_leaves_inherited_connections_open():
+    with database.engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    inherited = database.engine.pool
+    idle = inherited.checkedin()
+    assert idle >= 1
+
+    dispose_after_fork()
+
+    # The parent still owns the sockets: they are dropped, not closed
+    assert database.engine.pool is not inherited
+    assert database.engine.pool.checkedin() == 0
+    assert inherited.checkedin() == idle
+    assert database.engine.pool.stats is inherited.stats
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_pool_status_needs_a_token(client):
+    assert client.get("/health/db").status_code == 401
+
+
+def test_pool_status_is_for_admins_and_coordinators(client, make_user, auth_headers):
+    assert client.get("/health/db", headers=auth_headers(make_user("Member"))).status_code == 403
+
+    response = client.get("/health/db", headers=auth_headers(make_user("Coordinator")))
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"sync", "async"}
+    assert {"size", "checked_out", "checkouts", "timeouts", "wait_ms_avg"} <= set(response.json()["sync"])
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from app.core.database import engine
+from app.core.pagination import encode_cursor
+from app.crud.photo import search_photos
+from app.models.models import Engagement, Like, TaggedIn
+from app.schemas.photo import PhotoFilterParams
+
+
+def _engage(db, photo, likers, tagged, comments=0):
+    db.add(Engagement(photo_id=photo.id, likes_count=len(likers), comments_count=comments))
+    db.add_all(Like(photo_id=photo.id, user_id=user.id) for user in likers)
+    db.add_all(TaggedIn(photo_id=photo.id, user_id=user.id) for user in tagged)
+    db.flush()
+
+
+def test_page_is_one_query_whatever_its_size(db, make_user, make_photos, count_queries):
+    viewer, other = make_user(), make_user()
+    for photo in make_photos(other, 2):
+        _engage(db, photo, [viewer, other], [viewer], comments=1)
+    with count_queries(engine) as small:
+        search_photos(db, PhotoFilterParams(), viewer.id)
+
+    for photo in make_photos(other, 20):
+        _engage(db, photo, [other], [viewer, other])
+    with count_queries(engine) as large:
+        photos = search_photos(db, PhotoFilterParams(), viewer.id)
+
+    assert len(photos) == 22
+    assert len(small) == len(large) == 1
+
+
+def test_engagement_comes_from_the_same_row(db, make_user, make_photos):
+    viewer, other = make_user(), make_user()
+    liked, plain = make_photos(other, 2)
+    _engage(db, liked, [viewer, other], [other, viewer], comments=3)
+
+    photos = {photo.id: photo for photo in search_photos(db, PhotoFilterParams(), viewer.id)}
+
+    assert (photos[liked.id].likes_count, photos[liked.id].comments_count) == (2, 3)
+    assert photos[liked.id].is_liked is True
+    assert photos[liked.id].tagged_user_ids == sorted([viewer.id, other.id])
+    # No engagement row yet
+    assert (photos[plain.id].likes_count, photos[plain.id].comments_count) == (0, 0)
+    assert photos[plain.id].is_liked is False
+    assert photos[plain.id].tagged_user_ids == []
+
+
+def test_anonymous_viewer_has_liked_nothing(db, make_user, make_photos):
+    other = make_user()
+    photo, = make_photos(other, 1)
+    _engage(db, photo, [other], [])
+
+    assert search_photos(db, PhotoFilterParams(), None)[0].is_liked is False
+
+
+def test_only_selected_columns_and_engagement_are_queried(db, make_user, make_photos, count_queries):
+    viewer = make_user()
+    make_photos(viewer, 1, exif_data={"Make": "Canon"})
+
+    with count_queries(engine) as statements:
+        photo, = search_photos(db, PhotoFilterParams(), viewer.id, columns=["id", "thumbnail_path", "likes_count"])
+
+    sql = statements[0]
+    assert "thumbnail_path" in sql
+    assert "exif_data" not in sql
+    assert "likes" not in sql.replace("likes_count", "")
+    assert "tagged_in" not in sql
+    assert photo.likes_count == 0
+
+
+def test_cursor_pages_follow_each_other_across_equal_timestamps(db, make_user, make_photos):
+    uploader = make_user()
+    make_photos(uploader, 3)
+    make_photos(uploader, 4, created_at=datetime(2030, 1, 1))
+    everything = [photo.id for photo in search_photos(db, PhotoFilterParams(limit=100))]
+
+    seen, cursor = [], None
+    while True:
+        page = search_photos(db, PhotoFilterParams(limit=2, cursor=cursor))
+        seen += [photo.id for photo in page]
+        if len(page) < 2:
+            break
+        cursor = encode_cursor(page[-1].created_at, page[-1].id)
+
+    assert seen == everything
+    assert len(seen) == 7
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import select
+
+from app.crud.photo import normalize_tags, tag_filter, update_photo_tags
+from app.models.models import Photo, PhotoTag
+
+
+@pytest.fixture
+def tagged(db, make_user, make_photos):
+    """Photo ids by name: stage (ai "stage", manual "Crowd"), crowd and coach ("stagecoach")."""
+    stage, crowd, coach = make_photos(make_user(), 3)
+    stage.ai_tags = ["stage"]
+    for photo, tags in ((stage, ["Crowd", " crowd "]), (crowd, ["crowd"]), (coach, ["stagecoach"])):
+        update_photo_tags(db, photo.id, tags)
+    return {"stage": stage.id, "crowd": crowd.id, "coach": coach.id}
+
+
+def _matching(db, *args, **kwargs):
+    return set(db.scalars(select(Photo.id).where(tag_filter(*args, **kwargs))))
+
+
+def test_normalize_tags_lowercases_and_deduplicates():
+    assert normalize_tags(["Stage", "crowd"], [" CROWD ", "", "night"], None) == ["stage", "crowd", "night"]
+
+
+def test_tags_are_kept_in_sync_as_normalized_rows(db, tagged):
+    rows = db.execute(select(PhotoTag.tag).where(PhotoTag.photo_id == tagged["stage"]).order_by(PhotoTag.tag))
+    assert [tag for tag, in rows] == ["crowd", "stage"]
+
+
+def test_exact_match_is_case_insensitive_and_not_a_prefix(db, tagged):
+    assert _matching(db, ["STAGE"]) == {tagged["stage"]}
+
+
+def test_prefix_match(db, tagged):
+    assert _matching(db, ["stage"], prefix=True) == {tagged["stage"], tagged["coach"]}
+
+
+def test_prefix_wildcards_are_literal(db, tagged):
+    assert _matching(db, ["st_ge"], prefix=True) == set()
+    assert _matching(db, ["%"], prefix=True) == set()
+
+
+def test_any_and_all(db, tagged):
+    assert _matching(db, ["stage", "crowd"]) == {tagged["stage"], tagged["crowd"]}
+    assert _matching(db, ["stage", "crowd"], match="all") == {tagged["stage"]}
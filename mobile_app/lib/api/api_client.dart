@@ -6,6 +6,10 @@ class ApiClient {
   final Dio _dio;
   final FlutterSecureStorage _storage = const FlutterSecureStorage();
 
+  // Last ETag and body per GET URL, shared by every client; the server
+  // answers 304 when nothing changed and the cached body is reused.
+  static final Map<String, ({String etag, dynamic data})> _etagCache = {};
+
   ApiClient()
       : _dio = Dio(BaseOptions(
           baseUrl: AppConstants.baseUrl,
@@ -19,9 +23,29 @@ class ApiClient {
         if (token != null) {
           options.headers['Authorization'] = 'Bearer $token';
         }
+        final cached = _etagCache[options.uri.toString()];
+        if (options.method == 'GET' && cached != null) {
+          options.headers['If-None-Match'] = cached.etag;
+        }
         return handler.next(options);
       },
+      onResponse: (response, handler) {
+        final etag = response.headers.value('etag');
+        if (response.requestOptions.method == 'GET' && etag != null) {
+          _etagCache[response.requestOptions.uri.toString()] = (etag: etag, data: response.data);
+        }
+        return handler.next(response);
+      },
       onError: (DioException e, handler) async {
+        final cached = _etagCache[e.requestOptions.uri.toString()];
+        if (e.response?.statusCode == 304 && cached != null) {
+          return handler.resolve(Response(
+            requestOptions: e.requestOptions,
+            data: cached.data,
+            statusCode: 200,
+            headers: e.response!.headers,
+          ));
+        }
         if (e.response?.statusCode == 401) {
           // TODO: Handle token expiration / logout
           await _storage.delete(key: AppConstants.tokenKey);
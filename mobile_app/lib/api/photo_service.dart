@@ -6,41 +6,62 @@ import 'api_client.dart';
 import '../models/photo.dart';
 import '../models/like_response.dart';
 
+// One page of the photo feed; [next] is the URL of the following page, or null
+class PhotoPage {
+  final List<Photo> photos;
+  final String? next;
+
+  PhotoPage(this.photos, this.next);
+}
+
 class PhotoService {
   final ApiClient _apiClient;
 
   PhotoService(this._apiClient);
 
-  Future<List<Photo>> searchPhotos({int? eventId, String? tags, int skip = 0, int limit = 100}) async {
+  // The feed uses cursor pagination: pass the previous page's [next] URL to
+  // continue, otherwise the first page matching the filters is fetched.
+  Future<PhotoPage> searchPhotos({int? eventId, String? tags, String? next, int limit = 100}) async {
     try {
-      final Map<String, dynamic> queryParams = {
-        'offset': skip,
-        'limit': limit,
-      };
-      if (eventId != null) {
-        queryParams['event'] = eventId;  // Django uses 'event' not 'event_id'
-      }
-      if (tags != null && tags.isNotEmpty) {
-        queryParams['search'] = tags;  // If using SearchFilter
+      final Response response;
+      if (next != null) {
+        response = await _apiClient.dio.get(next);
+      } else {
+        final Map<String, dynamic> queryParams = {
+          'limit': limit,
+        };
+        if (eventId != null) {
+          queryParams['event'] = eventId;  // Django uses 'event' not 'event_id'
+        }
+        if (tags != null && tags.isNotEmpty) {
+          queryParams['search'] = tags;  // If using SearchFilter
+        }
+        response = await _apiClient.dio.get('/photos/', queryParameters: queryParams);
       }
 
-      final response = await _apiClient.dio.get('/photos/', queryParameters: queryParams);
-      
-      // DRF pagination returns {count, next, previous, results}
-      if (response.data is Map && response.data.containsKey('results')) {
-        final List<dynamic> data = response.data['results'];
-        return data.map((json) => Photo.fromJson(json)).toList();
-      }
-      
-      // Fallback if pagination is disabled or different format
-      final List<dynamic> data = response.data;
-      return data.map((json) => Photo.fromJson(json)).toList();
+      // DRF cursor pagination returns {next, previous, results}
+      final List<dynamic> data = response.data['results'];
+      return PhotoPage(
+        data.map((json) => Photo.fromJson(json)).toList(),
+        response.data['next'] as String?,
+      );
     } catch (e) {
       debugPrint('PhotoService: Error fetching photos: $e');
       rethrow;
     }
   }
 
+  // The list endpoint returns a compact projection; this fetches every field
+  Future<Photo> getPhoto(int photoId) async {
+    try {
+      final response = await _apiClient.dio.get('/photos/$photoId/');
+      return Photo.fromJson(response.data);
+    } catch (e) {
+      debugPrint('PhotoService: Error fetching photo $photoId: $e');
+      rethrow;
+    }
+  }
+
   Future<LikeResponse> toggleLike(int photoId) async {
     try {
       final response = await _apiClient.dio.post('/photos/$photoId/like/');
@@ -15,7 +15,8 @@ class CommentProvider extends ChangeNotifier {
     notifyListeners();
     try {
       final response = await _apiClient.dio.get('/photos/$photoId/comments/');
-      final List<dynamic> data = response.data;
+      // Threads are paginated by top-level comment: {next, previous, results}
+      final List<dynamic> data = response.data is Map ? response.data['results'] : response.data;
       _photoComments[photoId] = data.map((json) => Comment.fromJson(json)).toList();
     } catch (e) {
       debugPrint('Error loading comments: $e');
@@ -8,13 +8,17 @@ class PhotoProvider extends ChangeNotifier {
   final PhotoService _photoService;
   List<Photo> _photos = [];
   bool _isLoading = false;
+  bool _isLoadingMore = false;
   String? _error;
   int? _currentEventId;
+  String? _next;
 
   PhotoProvider() : _photoService = PhotoService(ApiClient());
 
   List<Photo> get photos => _photos;
   bool get isLoading => _isLoading;
+  bool get isLoadingMore => _isLoadingMore;
+  bool get hasMore => _next != null;
   String? get error => _error;
 
   Future<void> loadPhotos(int? eventId, {String? tags}) async {
@@ -22,9 +26,12 @@ class PhotoProvider extends ChangeNotifier {
     _isLoading = true;
     _error = null;
     _photos = []; // Clear previous photos
+    _next = null;
     notifyListeners();
     try {
-      _photos = await _photoService.searchPhotos(eventId: eventId, tags: tags);
+      final page = await _photoService.searchPhotos(eventId: eventId, tags: tags);
+      _photos = page.photos;
+      _next = page.next;
       debugPrint('PhotoProvider: Successfully loaded ${_photos.length} photos.');
     } catch (e) {
       debugPrint('PhotoProvider: Error loading photos: $e');
@@ -35,6 +42,41 @@ class PhotoProvider extends ChangeNotifier {
     }
   }
 
+  // Appends the next page of the current feed, if there is one
+  Future<void> loadMorePhotos() async {
+    if (_next == null || _isLoading || _isLoadingMore) return;
+    _isLoadingMore = true;
+    notifyListeners();
+    try {
+      final page = await _photoService.searchPhotos(next: _next);
+      _photos = [..._photos, ...page.photos];
+      _next = page.next;
+    } catch (e) {
+      debugPrint('PhotoProvider: Error loading more photos: $e');
+      _error = e.toString();
+    } finally {
+      _isLoadingMore = false;
+      notifyListeners();
+    }
+  }
+
+  // Replaces a photo from the (compact) list with its full details
+  Future<Photo?> loadPhotoDetail(int photoId) async {
+    try {
+      final photo = await _photoService.getPhoto(photoId);
+      final index = _photos.indexWhere((p) => p.id == photoId);
+      if (index != -1) {
+        _photos[index] = photo;
+        notifyListeners();
+      }
+      return photo;
+    } catch (e) {
+      _error = e.toString();
+      notifyListeners();
+      return null;
+    }
+  }
+
   Future<void> toggleLike(int photoId) async {
     try {
       final index = _photos.indexWhere((p) => p.id == photoId);
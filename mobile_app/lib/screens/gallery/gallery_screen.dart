@@ -21,10 +21,12 @@ class GalleryScreen extends StatefulWidget {
 class _GalleryScreenState extends State<GalleryScreen> {
   StreamSubscription? _wsSubscription;
   final TextEditingController _searchController = TextEditingController();
+  final ScrollController _scrollController = ScrollController();
 
   @override
   void initState() {
     super.initState();
+    _scrollController.addListener(_onScroll);
     WidgetsBinding.instance.addPostFrameCallback((_) {
       final photoProvider = context.read<PhotoProvider>();
       photoProvider.loadPhotos(widget.eventId);
@@ -45,9 +47,18 @@ class _GalleryScreenState extends State<GalleryScreen> {
   void dispose() {
     _wsSubscription?.cancel();
     _searchController.dispose();
+    _scrollController.dispose();
     super.dispose();
   }
 
+  // Fetches the next page once the grid is scrolled near its end
+  void _onScroll() {
+    final position = _scrollController.position;
+    if (position.pixels >= position.maxScrollExtent - 600) {
+      context.read<PhotoProvider>().loadMorePhotos();
+    }
+  }
+
   void _showDeleteDialog(BuildContext context) {
     showDialog(
       context: context,
@@ -213,6 +224,7 @@ class _GalleryScreenState extends State<GalleryScreen> {
                 return RefreshIndicator(
                   onRefresh: () => provider.loadPhotos(widget.eventId),
                   child: GridView.builder(
+                    controller: _scrollController,
                     padding: const EdgeInsets.all(4),
                     gridDelegate: const SliverGridDelegateWithFixedCrossAxisCount(
                       crossAxisCount: 3,
@@ -19,11 +19,20 @@ class PhotoDetailScreen extends StatefulWidget {
 }
 
 class _PhotoDetailScreenState extends State<PhotoDetailScreen> {
+  // Full photo (EXIF, tags, original URL); the gallery list only has a compact projection
+  Photo? _detail;
+
+  Photo get _photo => _detail ?? widget.photo;
+
   @override
   void initState() {
     super.initState();
-    WidgetsBinding.instance.addPostFrameCallback((_) {
+    WidgetsBinding.instance.addPostFrameCallback((_) async {
       context.read<CommentProvider>().loadComments(widget.photo.id);
+      final detail = await context.read<PhotoProvider>().loadPhotoDetail(widget.photo.id);
+      if (mounted && detail != null) {
+        setState(() => _detail = detail);
+      }
     });
   }
 
@@ -39,7 +48,7 @@ class _PhotoDetailScreenState extends State<PhotoDetailScreen> {
           IconButton(
             icon: const Icon(Icons.download),
             onPressed: () {
-              final url = widget.photo.fullOriginalUrl;
+              final url = _photo.fullOriginalUrl;
               debugPrint('Downloading: $url');
               
               if (kIsWeb) {
@@ -72,7 +81,7 @@ class _PhotoDetailScreenState extends State<PhotoDetailScreen> {
           InteractiveViewer(
             child: Center(
               child: CachedNetworkImage(
-                imageUrl: widget.photo.fullWatermarkedUrl,
+                imageUrl: _photo.fullWatermarkedUrl,
                 placeholder: (context, url) =>
                     const Center(child: CircularProgressIndicator()),
                 errorWidget: (context, url, error) =>
@@ -134,7 +143,7 @@ class _PhotoDetailScreenState extends State<PhotoDetailScreen> {
                   IconButton(
                     icon: const Icon(Icons.info_outline, color: Colors.white),
                     onPressed: () {
-                      _showPhotoInfo(context, widget.photo);
+                      _showPhotoInfo(context, _photo);
                     },
                   ),
                 ],
@@ -0,0 +1,158 @@
+"""
+Admission control for photo ingestion.
+
+Uploads are checked against the Celery backlog and the uploader's own
+in-flight photos before any file is saved or any task is enqueued.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Photo
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT_STATUSES = ('pending', 'processing')
+
+# Queue depth is read from the broker at most once per interval per process
+_DEPTH_CACHE_SECONDS = 2
+_depth_cache = {'value': 0, 'expires': 0.0}
+
+
+@dataclass
+class AdmissionDecision:
+    admitted: bool
+    queued: bool = False
+    retry_after: int = 0
+    estimated_seconds: int = 0
+    queue_depth: int = 0
+    uploader_backlog: int = 0
+    # Set when the batch alone is over the per-uploader limit, so retrying cannot help
+    too_large: bool = False
+    batch_limit: int = 0
+    reason: str = ''
+
+
+def get_queue_depth():
+    """Number of tasks waiting in the photo processing queues."""
+    now = time.monotonic()
+    if now < _depth_cache['expires']:
+        return _depth_cache['value']
+
+    from config.celery import app as celery_app
+
+    depth = 0
+    try:
+        with celery_app.connection_for_read() as conn:
+            channel = conn.default_channel
+            for queue in settings.PHOTO_PROCESSING_QUEUES:
+                try:
+                    depth += channel.queue_declare(queue=queue, passive=True).message_count
+                except Exception:
+                    # Queue not declared yet - nothing waiting in it
+                    pass
+    except Exception:
+        # Admission falls back to the last depth read, so make the blind spot visible
+        from .metrics import incr_counter
+        logger.exception('Could not read broker queue depth')
+        incr_counter('broker_depth_errors')
+        return _depth_cache['value']
+
+    _depth_cache['value'] = depth
+    _depth_cache['expires'] = now + _DEPTH_CACHE_SECONDS
+    return depth
+
+
+def get_throughput():
+    """Photos processed per second over the recent throughput window."""
+    window = settings.PHOTO_INGEST_THROUGHPUT_WINDOW
+    since = timezone.now() - timedelta(seconds=window)
+    processed = Photo.objects.filter(processed_at__gte=since).count()
+    if not processed:
+        return settings.PHOTO_INGEST_NOMINAL_THROUGHPUT
+    return processed / window
+
+
+def get_active_uploaders():
+    """Number of distinct uploaders that currently have photos in flight."""
+    return (
+        Photo.objects.filter(processing_status__in=IN_FLIGHT_STATUSES)
+        .values('uploader')
+        .distinct()
+        .count()
+    )
+
+
+def get_uploader_backlog(user):
+    return Photo.objects.filter(uploader=user, processing_status__in=IN_FLIGHT_STATUSES).count()
+
+
+def uploader_share(active_uploaders):
+    """Max in-flight photos per uploader given how many people are uploading."""
+    share = settings.PHOTO_INGEST_HARD_QUEUE_DEPTH // max(active_uploaders, 1)
+    share = max(share, settings.PHOTO_INGEST_MIN_UPLOADER_SHARE)
+    return min(share, settings.PHOTO_INGEST_PER_UPLOADER_LIMIT)
+
+
+def check_admission(user, batch_size):
+    """
+    Decide whether a batch of `batch_size` uploads from `user` may be enqueued.
+
+    Rejects outright (`too_large`) a batch bigger than the uploader's whole
+    share, rejects with a retry estimate when the global backlog is past the
+    hard limit or the uploader would exceed their fair share, and marks the
+    batch as queued (with an estimate) when the backlog is past the soft limit.
+    """
+    depth = get_queue_depth()
+    throughput = get_throughput()
+
+    backlog = get_uploader_backlog(user)
+    active = get_active_uploaders()
+    if not backlog:
+        # The uploader is about to become active
+        active += 1
+    share = uploader_share(active)
+
+    if batch_size > share:
+        return AdmissionDecision(
+            admitted=False,
+            too_large=True,
+            batch_limit=share,
+            queue_depth=depth,
+            uploader_backlog=backlog,
+            reason=f'Batch of {batch_size} photos is over the per-batch limit of {share}; upload in smaller batches',
+        )
+
+    if depth + batch_size > settings.PHOTO_INGEST_HARD_QUEUE_DEPTH:
+        overflow = depth + batch_size - settings.PHOTO_INGEST_HARD_QUEUE_DEPTH
+        return AdmissionDecision(
+            admitted=False,
+            retry_after=max(1, math.ceil(overflow / throughput)),
+            queue_depth=depth,
+            reason='Processing queue is full',
+        )
+
+    if backlog + batch_size > share:
+        # Each active uploader gets roughly an equal slice of throughput
+        overflow = backlog + batch_size - share
+        per_uploader_rate = throughput / max(active, 1)
+        return AdmissionDecision(
+            admitted=False,
+            retry_after=max(1, math.ceil(overflow / per_uploader_rate)),
+            queue_depth=depth,
+            uploader_backlog=backlog,
+            reason=f'Too many photos in flight for this uploader (limit {share})',
+        )
+
+    return AdmissionDecision(
+        admitted=True,
+        queued=depth >= settings.PHOTO_INGEST_SOFT_QUEUE_DEPTH,
+        estimated_seconds=math.ceil((depth + batch_size) / throughput),
+        queue_depth=depth,
+        uploader_backlog=backlog,
+    )
@@ -0,0 +1,49 @@
+"""
+Load signals used to degrade the processing pipeline under backlog.
+
+When the queue is deep or the oldest waiting photo is old, photos are
+shipped with just EXIF and a thumbnail; watermarking and AI tagging are
+recorded in `Photo.deferred_steps` and picked up by the deferred sweep.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .admission import IN_FLIGHT_STATUSES, get_queue_depth
+from .models import Photo
+
+
+def get_oldest_pending_age():
+    """
+    Seconds the oldest photo with a processing task in flight has been waiting.
+
+    Photos that were never enqueued, or whose task was sent longer than
+    PHOTO_TASK_STALE_AFTER ago (lost with a crashed worker), do not count.
+    """
+    now = timezone.now()
+    oldest = (
+        Photo.objects.filter(
+            processing_status__in=IN_FLIGHT_STATUSES,
+            enqueued_at__gte=now - timedelta(seconds=settings.PHOTO_TASK_STALE_AFTER),
+        )
+        .order_by('enqueued_at')
+        .values_list('enqueued_at', flat=True)
+        .first()
+    )
+    if oldest is None:
+        return 0
+    return (now - oldest).total_seconds()
+
+
+def is_under_load():
+    if get_queue_depth() >= settings.PHOTO_DEGRADE_QUEUE_DEPTH:
+        return True
+    return get_oldest_pending_age() >= settings.PHOTO_DEGRADE_OLDEST_AGE
+
+
+def can_run_deferred():
+    """Deferred work only runs once the backlog has drained well below the degrade threshold."""
+    if get_queue_depth() >= settings.PHOTO_DEFERRED_SWEEP_MAX_DEPTH:
+        return False
+    return get_oldest_pending_age() < settings.PHOTO_DEGRADE_OLDEST_AGE
@@ -0,0 +1,236 @@
+"""
+Facet counts for photo lists: photos per tag, photographer, event and month.
+
+`compute` counts every requested facet of a filtered queryset in one SQL
+statement: the filtered photos are materialized once and each facet is a
+GROUP BY over them, with the top PHOTO_FACET_SIZE values kept per facet.
+
+Event galleries are the hot case, so their counts are kept in Redis, one
+hash per event (`facets:event:{id}`, fields `tag:beach`, `month:2026-10`,
+...). A missing hash is built from the database on first read; after that
+writes adjust it in place: callers take a `snapshot` of a photo before and
+after a change and pass both to `record_change`, which applies only the
+difference. A change racing a rebuild can be lost, so hashes expire after
+PHOTO_FACET_CACHE_TTL and are rebuilt from scratch. Tag changes of every
+photo, in an event or not, are also passed on to tag autocomplete.
+"""
+from datetime import timezone as dt_timezone
+
+import redis
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework import serializers
+
+from config import autocomplete
+from events.models import Event
+from users.models import CustomUser
+from .metrics import get_redis
+from .models import Photo
+
+FACETS = ('tag', 'photographer', 'event', 'month')
+# Facets whose values are ids, labelled with a name
+_LABELLED = {'photographer': (CustomUser, 'username'), 'event': (Event, 'name')}
+
+# Only adjust counts of a hash that exists; a missing one is rebuilt on read
+_ADJUST = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call('hincrby', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+def _key(event_id):
+    return f'facets:event:{event_id}'
+
+
+def requested(request):
+    """Facets asked for with `?facets=tag,month`; raises ValidationError for unknown names."""
+    names = [name.strip() for name in request.query_params.get('facets', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise serializers.ValidationError({'facets': [f'Unknown facet: {name}' for name in unknown]})
+    return names
+
+
+def _facet_sql(name):
+    if name == 'tag':
+        # Tags listed in both ai_tags and manual_tags count once per photo
+        return (
+            "SELECT 'tag', t.tag, NULL, count(*) FROM p CROSS JOIN LATERAL ("
+            "SELECT jsonb_array_elements_text(CASE WHEN jsonb_typeof(p.ai_tags) = 'array' THEN p.ai_tags ELSE '[]' END) "
+            "UNION SELECT jsonb_array_elements_text(CASE WHEN jsonb_typeof(p.manual_tags) = 'array' THEN p.manual_tags ELSE '[]' END)"
+            ") AS t(tag) GROUP BY t.tag"
+        )
+    if name == 'photographer':
+        return (
+            f"SELECT 'photographer', p.uploader_id::text, u.username, count(*) FROM p "
+            f"JOIN {CustomUser._meta.db_table} u ON u.id = p.uploader_id GROUP BY p.uploader_id, u.username"
+        )
+    if name == 'event':
+        return (
+            f"SELECT 'event', p.event_id::text, e.name, count(*) FROM p "
+            f"JOIN {Event._meta.db_table} e ON e.id = p.event_id GROUP BY p.event_id, e.name"
+        )
+    # Connections run in UTC (USE_TZ), so months are UTC months
+    return "SELECT 'month', to_char(p.created_at, 'YYYY-MM'), NULL, count(*) FROM p GROUP BY 2"
+
+
+def count_facets(queryset, names, size=None):
+    """(facet, value, label, count) rows for `names` over `queryset`, in one query."""
+    base_sql, params = (
+        queryset.order_by()
+        .values('id', 'uploader_id', 'event_id', 'created_at', 'ai_tags', 'manual_tags')
+        .query.sql_with_params()
+    )
+    union = ' UNION ALL '.join(_facet_sql(name) for name in names)
+    sql = f'WITH p AS MATERIALIZED ({base_sql}) '
+    if size is None:
+        sql += union
+    else:
+        sql += (
+            f'SELECT facet, value, label, n FROM ('
+            f'SELECT f.*, row_number() OVER (PARTITION BY facet ORDER BY n DESC, value) AS r '
+            f'FROM ({union}) AS f(facet, value, label, n)) AS ranked WHERE r <= %s'
+        )
+        params = (*params, size)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _format(name, value):
+    return int(value) if name in _LABELLED else value
+
+
+def compute(queryset, names):
+    """Counts of the top values of each facet in `names` among `queryset`'s photos."""
+    facets = {name: [] for name in names}
+    if not names:
+        return facets
+    for name, value, label, count in count_facets(queryset, names, settings.PHOTO_FACET_SIZE):
+        entry = {'value': _format(name, value), 'count': count}
+        if name in _LABELLED:
+            entry['label'] = label
+        facets[name].append(entry)
+    for entries in facets.values():
+        entries.sort(key=lambda entry: (-entry['count'], str(entry['value'])))
+    return facets
+
+
+def _build(client, event_id):
+    """Count every facet of the event from the database and store the hash."""
+    fields = {'built': 1}
+    for name, value, label, count in count_facets(Photo.objects.filter(event_id=event_id), FACETS):
+        fields[f'{name}:{value}'] = count
+        if label is not None:
+            fields[f'label:{name}:{value}'] = label
+    pipe = client.pipeline()
+    pipe.delete(_key(event_id))
+    pipe.hset(_key(event_id), mapping=fields)
+    pipe.expire(_key(event_id), settings.PHOTO_FACET_CACHE_TTL)
+    pipe.execute()
+    return {field: str(value) for field, value in fields.items()}
+
+
+def _fill_labels(client, event_id, facets):
+    """Label ids first counted after the hash was built (one query per facet)."""
+    for name, (model, attribute) in _LABELLED.items():
+        missing = [entry for entry in facets.get(name, ()) if entry['label'] is None]
+        if not missing:
+            continue
+        labels = dict(model.objects.filter(pk__in=[e['value'] for e in missing]).values_list('pk', attribute))
+        for entry in missing:
+            entry['label'] = labels.get(entry['value'])
+        if not labels:
+            continue
+        try:
+            client.hset(_key(event_id), mapping={f'label:{name}:{pk}': label for pk, label in labels.items()})
+        except redis.RedisError as e:
+            print(f"Could not store facet labels for event {event_id}: {e}")
+
+
+def for_event(event_id, names):
+    """
+    Facet counts for the whole event, served from its Redis hash. Falls back
+    to `compute` when Redis is unavailable.
+    """
+    try:
+        client = get_redis()
+        fields = client.hgetall(_key(event_id)) or _build(client, event_id)
+    except redis.RedisError as e:
+        print(f"Facet cache unavailable: {e}")
+        return compute(Photo.objects.filter(event_id=event_id), names)
+
+    facets = {name: [] for name in names}
+    for field, count in fields.items():
+        name, _, value = field.partition(':')
+        if name in facets and int(count) > 0:
+            entry = {'value': _format(name, value), 'count': int(count)}
+            if name in _LABELLED:
+                entry['label'] = fields.get(f'label:{name}:{value}')
+            facets[name].append(entry)
+    for name, entries in facets.items():
+        entries.sort(key=lambda entry: (-entry['count'], str(entry['value'])))
+        del entries[settings.PHOTO_FACET_SIZE:]
+    _fill_labels(client, event_id, facets)
+    return facets
+
+
+def snapshot(photo):
+    """What `photo` contributes to facet counts, for `record_change`."""
+    if photo is None:
+        return None
+    tags = {
+        str(tag)
+        for tags in (photo.ai_tags, photo.manual_tags) if isinstance(tags, list)
+        for tag in tags
+    }
+    fields = {f'tag:{tag}' for tag in tags}
+    fields.add(f'photographer:{photo.uploader_id}')
+    fields.add(f'event:{photo.event_id}')
+    created_at = photo.created_at
+    if created_at is not None:
+        if timezone.is_aware(created_at):
+            created_at = created_at.astimezone(dt_timezone.utc)
+        fields.add(f'month:{created_at:%Y-%m}')
+    return photo.event_id, frozenset(fields)
+
+
+def record_change(before, after):
+    """
+    Apply a photo's change from snapshot `before` to snapshot `after` (None
+    for a photo that did not exist) to the cached counts.
+    """
+    deltas, tag_deltas = {}, {}
+    for state, sign in ((before, -1), (after, 1)):
+        if state is not None:
+            event_id, fields = state
+            for field in fields:
+                deltas.setdefault(event_id, {}).setdefault(field, 0)
+                deltas[event_id][field] += sign
+                if field.startswith('tag:'):
+                    tag_deltas[field[4:]] = tag_deltas.get(field[4:], 0) + sign
+    autocomplete.record_tags(tag_deltas)
+    deltas.pop(None, None)
+    try:
+        client = get_redis()
+        adjust = client.register_script(_ADJUST)
+        for event_id, changes in deltas.items():
+            args = [part for field, delta in changes.items() if delta for part in (field, delta)]
+            if args:
+                adjust(keys=[_key(event_id)], args=args)
+    except redis.RedisError as e:
+        print(f"Could not update facet counts: {e}")
+
+
+def invalidate(event_id):
+    """Drop the event's cached counts (e.g. after it is renamed); rebuilt on next read."""
+    try:
+        get_redis().delete(_key(event_id))
+    except redis.RedisError as e:
+        print(f"Could not invalidate facet counts for event {event_id}: {e}")
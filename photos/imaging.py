@@ -0,0 +1,60 @@
+"""
+Memory-bounded image helpers for the processing tasks.
+
+Images are opened header-first and rejected above PHOTO_MAX_IMAGE_PIXELS
+before any pixel data is decoded. Derivatives are decoded at the size they
+are needed: for JPEGs `thumbnail()` uses draft mode to decode at 1/2, 1/4
+or 1/8 scale and then reduces in blocks, so the full-resolution frame of a
+panorama never has to be held in memory. Other formats (PNG, TIFF, WebP, ...)
+can only be decoded at full size, so they are rejected above
+PHOTO_MAX_FULL_DECODE_PIXELS.
+
+The watermarked rendition is full size, except that images above
+PHOTO_LARGE_IMAGE_PIXELS get one capped at PHOTO_LARGE_IMAGE_MAX_EDGE on the
+long side; the original is always kept as uploaded.
+"""
+from django.conf import settings
+from PIL import Image
+
+# PIL warns at this size and refuses at twice it; we refuse at it ourselves
+Image.MAX_IMAGE_PIXELS = settings.PHOTO_MAX_IMAGE_PIXELS
+
+
+# Formats whose decoder supports draft mode (MPO is multi-picture JPEG)
+DRAFT_FORMATS = ('JPEG', 'MPO')
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def open_image(path):
+    """Open an image lazily, rejecting decompression bombs from the header alone."""
+    img = Image.open(path)
+    if img.width * img.height > settings.PHOTO_MAX_IMAGE_PIXELS:
+        size = img.size
+        img.close()
+        raise ImageTooLarge(f"Image {size[0]}x{size[1]} exceeds {settings.PHOTO_MAX_IMAGE_PIXELS} pixels")
+    if img.format not in DRAFT_FORMATS and img.width * img.height > settings.PHOTO_MAX_FULL_DECODE_PIXELS:
+        size, fmt = img.size, img.format
+        img.close()
+        raise ImageTooLarge(
+            f"{fmt} image {size[0]}x{size[1]} exceeds {settings.PHOTO_MAX_FULL_DECODE_PIXELS} pixels"
+        )
+    return img
+
+
+def load_bounded(img, max_edge):
+    """Decode `img` in RGB with its long side no larger than `max_edge`."""
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def rendition_edge(img):
+    """Long edge for the watermarked rendition: full size, capped above PHOTO_LARGE_IMAGE_PIXELS."""
+    if img.width * img.height > settings.PHOTO_LARGE_IMAGE_PIXELS:
+        return settings.PHOTO_LARGE_IMAGE_MAX_EDGE
+    return max(img.size)
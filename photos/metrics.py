@@ -0,0 +1,100 @@
+"""
+Operational metrics for the photo processing pipeline.
+
+Counters live in a Redis hash so every worker process contributes to the
+same totals. Served by `GET /api/v1/photos/metrics/` for admins and
+coordinators.
+"""
+import redis
+from django.conf import settings
+
+from .admission import get_queue_depth, get_throughput
+from .degradation import get_oldest_pending_age, is_under_load
+from .models import Photo
+from .scheduling import latency_report
+
+COUNTERS_KEY = 'photos:metrics'
+MEMORY_KEY = 'photos:memory'
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+    return _client
+
+
+def incr_counter(name, amount=1):
+    try:
+        get_redis().hincrby(COUNTERS_KEY, name, amount)
+    except redis.RedisError as e:
+        print(f"Could not record metric {name}: {e}")
+
+
+def get_counters():
+    try:
+        return {name: int(value) for name, value in get_redis().hgetall(COUNTERS_KEY).items()}
+    except redis.RedisError as e:
+        print(f"Could not read metrics: {e}")
+        return {}
+
+
+def record_memory_sample(bucket, peak_mb, growth_mb):
+    """Record one task's peak RSS and RSS growth under an image size bucket."""
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.hincrby(MEMORY_KEY, f'{bucket}:tasks', 1)
+        pipe.hincrbyfloat(MEMORY_KEY, f'{bucket}:growth_mb_total', growth_mb)
+        pipe.hget(MEMORY_KEY, f'{bucket}:peak_mb')
+        previous_peak = pipe.execute()[-1]
+        if previous_peak is None or peak_mb > float(previous_peak):
+            client.hset(MEMORY_KEY, f'{bucket}:peak_mb', round(peak_mb, 1))
+    except redis.RedisError as e:
+        print(f"Could not record memory sample: {e}")
+
+
+def get_memory_stats():
+    try:
+        raw = get_redis().hgetall(MEMORY_KEY)
+    except redis.RedisError as e:
+        print(f"Could not read memory stats: {e}")
+        return {}
+
+    stats = {}
+    for key, value in raw.items():
+        bucket, field = key.rsplit(':', 1)
+        stats.setdefault(bucket, {})[field] = float(value)
+    for bucket in stats.values():
+        tasks = bucket.pop('tasks', 0)
+        bucket['tasks'] = int(tasks)
+        bucket['avg_growth_mb'] = bucket.pop('growth_mb_total', 0) / tasks if tasks else 0
+    return stats
+
+
+def get_database_pool_stats():
+    """Connection pool counters of this process (psycopg-pool), or None without a pool."""
+    from django.db import connection
+    if not connection.settings_dict.get('OPTIONS', {}).get('pool'):
+        return None
+    stats = connection.pool.get_stats()
+    requests = stats.get('requests_num', 0)
+    stats['requests_wait_ms_avg'] = round(stats.get('requests_wait_ms', 0) / requests, 3) if requests else 0.0
+    return stats
+
+
+def collect():
+    return {
+        'queue_depth': get_queue_depth(),
+        'throughput_per_second': get_throughput(),
+        'oldest_pending_seconds': get_oldest_pending_age(),
+        'degraded': is_under_load(),
+        'pending_deferred_photos': Photo.objects.exclude(deferred_steps=[]).count(),
+        'scheduler': latency_report(),
+        'counters': get_counters(),
+        'worker_memory': get_memory_stats(),
+        'database_pool': get_database_pool_stats(),
+    }
+
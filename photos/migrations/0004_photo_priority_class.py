@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0003_photo_processed_at_photo_uploader_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='priority_class',
+            field=models.CharField(choices=[('live', 'Live'), ('archive', 'Archive')], default='archive', max_length=20),
+        ),
+    ]
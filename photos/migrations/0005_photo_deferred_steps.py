@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0004_photo_priority_class'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='deferred_steps',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('deferred_steps', []), _negated=True), fields=['created_at'], name='photo_deferred_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_event_created_at_event_created_by_alter_event_slug'),
+        ('photos', '0006_photo_width_height'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['-created_at', '-id'], name='photo_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['event', '-created_at', '-id'], name='photo_event_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_search'),
+        ('photos', '0007_photo_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='search_vector',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector('ai_tags', 'manual_tags', config='english'),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='search_text',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.functions.text.Concat(
+                    django.db.models.functions.comparison.Cast('ai_tags', models.TextField()),
+                    models.Value(' ', output_field=models.TextField()),
+                    django.db.models.functions.comparison.Cast('manual_tags', models.TextField()),
+                ),
+                output_field=models.TextField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='photo_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='photo_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0008_photo_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='deferred_enqueued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='deferred_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
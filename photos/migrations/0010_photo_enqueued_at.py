@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0009_photo_deferred_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='enqueued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('processing_status__in', ['pending', 'processing'])), fields=['enqueued_at'], name='photo_in_flight_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Cast, Concat
 from django.conf import settings
 from events.models import Event
 
@@ -9,7 +13,14 @@ class Photo(models.Model):
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     )
+    PRIORITY_CLASS_CHOICES = (
+        ('live', 'Live'),
+        ('archive', 'Archive'),
+    )
     original_image = models.ImageField(upload_to='photos/originals/')
+    # Read from the file header at upload time
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
     thumbnail_image = models.ImageField(upload_to='photos/thumbnails/', blank=True, null=True)
     watermarked_image = models.ImageField(upload_to='photos/watermarked/', blank=True, null=True)
     
@@ -20,7 +31,47 @@ class Photo(models.Model):
     event = models.ForeignKey(Event, on_delete=models.SET_NULL, null=True, blank=True, related_name='photos')
     uploader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='uploaded_photos')
     processing_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    priority_class = models.CharField(max_length=20, choices=PRIORITY_CLASS_CHOICES, default='archive')
     created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    # When the processing task was sent; null until the photo is enqueued
+    enqueued_at = models.DateTimeField(blank=True, null=True)
+    # Processing steps skipped under load, completed later by the deferred sweep
+    deferred_steps = models.JSONField(default=list, blank=True)
+    # Set when the sweep claims the photo so it is not enqueued twice
+    deferred_enqueued_at = models.DateTimeField(blank=True, null=True)
+    # Runs of the deferred steps that left some still failing
+    deferred_attempts = models.PositiveSmallIntegerField(default=0)
+    # Maintained by Postgres for /search (config/search.py): stemmed tags for
+    # full-text matching, and the raw tag text for typo-tolerant matching
+    search_vector = models.GeneratedField(
+        expression=SearchVector('ai_tags', 'manual_tags', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    search_text = models.GeneratedField(
+        expression=Concat(Cast('ai_tags', models.TextField()), Value(' ', output_field=models.TextField()), Cast('manual_tags', models.TextField())),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the photo feed, overall and per event
+            models.Index(fields=['-created_at', '-id'], name='photo_feed_idx'),
+            models.Index(fields=['event', '-created_at', '-id'], name='photo_event_feed_idx'),
+            # Per-uploader backlog lookups used by upload admission control
+            models.Index(fields=['uploader', 'processing_status'], name='photo_uploader_status_idx'),
+            # Oldest enqueued photo still waiting, read by the degradation check
+            models.Index(
+                fields=['enqueued_at'], name='photo_in_flight_idx',
+                condition=models.Q(processing_status__in=['pending', 'processing']),
+            ),
+            # Keeps the deferred sweep from scanning fully processed photos
+            models.Index(fields=['created_at'], name='photo_deferred_idx', condition=~models.Q(deferred_steps=[])),
+            GinIndex(fields=['search_vector'], name='photo_search_idx'),
+            GinIndex(fields=['search_text'], opclasses=['gin_trgm_ops'], name='photo_search_trgm_idx'),
+        ]
 
     def __str__(self):
         return f"Photo {self.id} by {self.uploader.username}"
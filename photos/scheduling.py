@@ -0,0 +1,102 @@
+"""
+Priority scheduling for photo processing tasks.
+
+Photos of live events go to the `photos_live` queue and everything else to
+`photos_archive`. Within a queue, uploaders who already have many photos in
+flight get a lower broker priority so small uploads are not stuck behind a
+single large dump.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Photo
+
+QUEUES = {
+    'live': 'photos_live',
+    'archive': 'photos_archive',
+}
+
+# Redis priority steps: 0 is served first, 9 last
+HIGHEST_PRIORITY = 0
+LOWEST_PRIORITY = 9
+
+
+def is_live_event(event):
+    if event is None:
+        return False
+    window = timedelta(days=settings.PHOTO_LIVE_EVENT_WINDOW_DAYS)
+    return abs(event.date - timezone.localdate()) <= window
+
+
+def priority_class_for(event):
+    return 'live' if is_live_event(event) else 'archive'
+
+
+def priority_for(uploader_backlog):
+    """Broker priority for an uploader with `uploader_backlog` photos already in flight."""
+    step = uploader_backlog // settings.PHOTO_SCHEDULER_SHARE_STEP
+    return min(HIGHEST_PRIORITY + step, LOWEST_PRIORITY)
+
+
+def enqueue_photo(photo, uploader_backlog=0):
+    """Send `photo` to the processing queue matching its priority class."""
+    from .tasks import process_photo_task
+
+    photo.enqueued_at = timezone.now()
+    Photo.objects.filter(pk=photo.pk).update(enqueued_at=photo.enqueued_at)
+    process_photo_task.apply_async(
+        args=(photo.id, photo.original_image.path),
+        queue=QUEUES[photo.priority_class],
+        priority=priority_for(uploader_backlog),
+    )
+
+
+def latency_report(window_seconds=3600):
+    """
+    Upload-to-processed latency per priority class over the last window.
+
+    For live photos this also reports how many met PHOTO_LIVE_LATENCY_TARGET.
+    """
+    since = timezone.now() - timedelta(seconds=window_seconds)
+    target = timedelta(seconds=settings.PHOTO_LIVE_LATENCY_TARGET)
+    latency = F('processed_at') - F('created_at')
+
+    rows = (
+        Photo.objects.filter(processed_at__gte=since)
+        .alias(latency=latency)
+        .values('priority_class')
+        .annotate(
+            processed=Count('id'),
+            avg_latency=Avg('latency'),
+            max_latency=Max('latency'),
+            within_target=Count('id', filter=Q(latency__lte=target)),
+        )
+    )
+
+    report = {}
+    for row in rows:
+        entry = {
+            'processed': row['processed'],
+            'avg_latency_seconds': row['avg_latency'].total_seconds() if row['avg_latency'] else 0,
+            'max_latency_seconds': row['max_latency'].total_seconds() if row['max_latency'] else 0,
+        }
+        if row['priority_class'] == 'live':
+            entry['latency_target_seconds'] = settings.PHOTO_LIVE_LATENCY_TARGET
+            entry['within_target'] = row['within_target']
+            entry['within_target_ratio'] = row['within_target'] / row['processed']
+        report[row['priority_class']] = entry
+
+    # Oldest live photo still waiting tells us if we are missing the target right now
+    oldest_live = (
+        Photo.objects.filter(priority_class='live', processing_status__in=('pending', 'processing'))
+        .order_by('created_at')
+        .values_list('created_at', flat=True)
+        .first()
+    )
+    report['live_oldest_waiting_seconds'] = (
+        (timezone.now() - oldest_live).total_seconds() if oldest_live else 0
+    )
+    return report
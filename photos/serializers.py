@@ -1,5 +1,10 @@
+from functools import lru_cache
+
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import Photo, TaggedIn
+from .validation import InvalidImage, inspect_image
 from users.serializers import UserSerializer
 
 class TaggedInSerializer(serializers.ModelSerializer):
@@ -15,22 +20,181 @@ class PhotoSerializer(serializers.ModelSerializer):
     likes_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
+
+    # What a grid needs; everything else is opt-in on list via ?expand= or ?fields=
+    LIST_FIELDS = (
+        'id', 'thumbnail_image', 'watermarked_image', 'width', 'height', 'event',
+        'processing_status', 'created_at', 'likes_count', 'is_liked', 'comments_count',
+    )
     
     class Meta:
         model = Photo
-        fields = '__all__'
-        read_only_fields = ('uploader', 'processing_status', 'created_at', 'exif_data', 'ai_tags')
+        exclude = ('search_vector', 'search_text')
+        read_only_fields = ('uploader', 'processing_status', 'created_at', 'processed_at', 'priority_class', 'deferred_steps', 'width', 'height', 'exif_data', 'ai_tags')
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset: render only the requested fields
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def validate(self, attrs):
+        image = attrs.get('original_image')
+        if image is not None:
+            try:
+                _, width, height = inspect_image(image)
+            except InvalidImage as e:
+                raise serializers.ValidationError({'original_image': str(e)})
+            attrs['width'] = width
+            attrs['height'] = height
+        return attrs
 
+    # Querysets from annotate_for_serializer carry these values; single
+    # instances (e.g. just created) fall back to querying.
     def get_likes_count(self, obj):
-        return obj.likes.count()
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total
+        if hasattr(obj, 'engagement'):
+            return obj.engagement.likes_count
+        return 0
     
     def get_is_liked(self, obj):
+        if hasattr(obj, 'liked_by_user'):
+            return obj.liked_by_user
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
     
     def get_comments_count(self, obj):
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
         if hasattr(obj, 'engagement'):
-            return obj.engagement.comments.count()
+            return obj.engagement.comments_count
         return 0
+
+
+# Fields the compiled list renderer can produce without PhotoSerializer.
+# Nested serializers (uploader, tagged_users) always go through DRF.
+_PLAIN_FIELDS = ('id', 'width', 'height', 'processing_status', 'priority_class', 'exif_data', 'ai_tags', 'manual_tags', 'deferred_steps')
+_IMAGE_FIELDS = ('original_image', 'thumbnail_image', 'watermarked_image')
+_DATETIME_FIELDS = ('created_at', 'processed_at')
+_ANNOTATED_FIELDS = {'likes_count': 'likes_total', 'is_liked': 'liked_by_user', 'comments_count': 'comments_total'}
+COMPILABLE_FIELDS = frozenset(_PLAIN_FIELDS + _IMAGE_FIELDS + _DATETIME_FIELDS + tuple(_ANNOTATED_FIELDS) + ('event',))
+
+
+@lru_cache(maxsize=64)
+def _compile(fields):
+    """Per-field (name, getter) pairs for `fields`, in PhotoSerializer's key order."""
+    datetime_field = serializers.DateTimeField()
+    getters = []
+    for name in PhotoSerializer().fields:
+        if name not in fields:
+            continue
+        if name in _IMAGE_FIELDS:
+            getter = lambda photo, request, name=name: _file_url(getattr(photo, name), request)
+        elif name in _DATETIME_FIELDS:
+            getter = lambda photo, request, name=name: _datetime(getattr(photo, name), datetime_field)
+        elif name in _ANNOTATED_FIELDS:
+            getter = lambda photo, request, attr=_ANNOTATED_FIELDS[name]: getattr(photo, attr)
+        elif name == 'event':
+            getter = lambda photo, request: photo.event_id
+        else:
+            getter = lambda photo, request, name=name: getattr(photo, name)
+        getters.append((name, getter))
+    return tuple(getters)
+
+
+def _file_url(value, request):
+    # Same output as DRF's ImageField with use_url
+    if not value:
+        return None
+    try:
+        url = value.url
+    except AttributeError:
+        return None
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _datetime(value, field):
+    return field.to_representation(value) if value is not None else None
+
+
+def compile_photo_renderer(fields):
+    """
+    Return a function rendering a page of annotated photos to plain dicts, or
+    None when `fields` needs the full PhotoSerializer.
+
+    Produces the same output as PhotoSerializer(many=True) for the selected
+    fields without DRF's per-field dispatch, which dominates list rendering.
+    """
+    if fields is None or not COMPILABLE_FIELDS.issuperset(fields):
+        return None
+    getters = _compile(frozenset(fields))
+
+    def render(photos, request=None):
+        return [{name: getter(photo, request) for name, getter in getters} for photo in photos]
+    return render
+
+
+def select_fields(request, default=None):
+    """
+    Fields to render from `?fields=a,b` (exactly these) or `?expand=a,b`
+    (added to `default`). Returns None for every field.
+
+    Raises ValidationError for names PhotoSerializer does not have.
+    """
+    available = PhotoSerializer().fields.keys()
+
+    def parse(param):
+        names = [name.strip() for name in request.query_params.get(param, '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise serializers.ValidationError({param: [f'Unknown field: {name}' for name in unknown]})
+        return names
+
+    fields = parse('fields')
+    if fields:
+        return ['id', *fields] if 'id' not in fields else fields
+    expand = parse('expand')
+    if default is None:
+        return None
+    return [*default, *(name for name in expand if name not in default)]
+
+
+def annotate_for_serializer(queryset, user, fields=None):
+    """
+    Load what PhotoSerializer renders for `fields` (None for all) and nothing
+    else: counts and `is_liked` are annotated, relations preloaded, and
+    columns not rendered are left out of the SELECT.
+    """
+    from social.models import Like
+
+    wanted = set(fields) if fields is not None else set(PhotoSerializer().fields)
+
+    if fields is not None:
+        model_fields = {f.name for f in Photo._meta.concrete_fields}
+        # created_at/id are always loaded for cursor pagination
+        queryset = queryset.only('id', 'created_at', *(wanted & model_fields))
+    else:
+        queryset = queryset.defer('search_vector', 'search_text')
+    if 'uploader' in wanted:
+        queryset = queryset.select_related('uploader__profile')
+    if 'tagged_users' in wanted:
+        queryset = queryset.prefetch_related(
+            Prefetch('tagged_users', queryset=TaggedIn.objects.select_related('user__profile')),
+        )
+    # Counts come from the denormalized Engagement counters (one LEFT JOIN)
+    if 'likes_count' in wanted:
+        queryset = queryset.annotate(likes_total=Coalesce('engagement__likes_count', Value(0)))
+    if 'comments_count' in wanted:
+        queryset = queryset.annotate(comments_total=Coalesce('engagement__comments_count', Value(0)))
+    if 'is_liked' in wanted:
+        if user is not None and user.is_authenticated:
+            queryset = queryset.annotate(
+                liked_by_user=Exists(Like.objects.filter(photo=OuterRef('pk'), user=user)),
+            )
+        else:
+            queryset = queryset.annotate(liked_by_user=Value(False))
+    return queryset
@@ -1,10 +1,14 @@
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from .models import Photo, TaggedIn
 from social.models import Like
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageDraw, ImageFont
 from PIL.ExifTags import TAGS
 from pathlib import Path
+from datetime import timedelta
+from django.utils import timezone
 import json
 import os
 import torch
@@ -12,6 +16,13 @@ import torchvision.transforms as transforms
 from torchvision.models import resnet50, ResNet50_Weights
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from . import facets
+from .degradation import is_under_load, can_run_deferred
+from .metrics import incr_counter
+from .scheduling import QUEUES, LOWEST_PRIORITY
+from .imaging import open_image, load_bounded, rendition_edge
+from events import cache as gallery_cache
+from . import watchdog  # noqa: F401 - registers the memory sampling signal handlers
 
 # Initialize ResNet Model once
 try:
@@ -38,11 +49,70 @@ def get_imagenet_labels():
             _imagenet_labels = []
     return _imagenet_labels
 
+def _watermark(original_file, photo):
+    """Write the full-size watermarked copy of the original."""
+    media_root = Path(settings.MEDIA_ROOT)
+    (media_root / "photos/watermarked").mkdir(parents=True, exist_ok=True)
+    watermarked_path = f"photos/watermarked/water_{original_file.name}"
+
+    with open_image(original_file) as img:
+        img = load_bounded(img, rendition_edge(img))
+        draw = ImageDraw.Draw(img)
+        # Simple text watermark for now
+        text = "IMG Project"
+        font = ImageFont.load_default()
+        bbox = draw.textbbox((0, 0), text, font=font)
+        textwidth = bbox[2] - bbox[0]
+        textheight = bbox[3] - bbox[1]
+        x = img.width - textwidth - 10
+        y = img.height - textheight - 10
+        draw.text((x, y), text, font=font, fill=(255, 255, 255, 128))
+        img.save(media_root / watermarked_path, "JPEG", quality=95)
+    photo.watermarked_image = str(watermarked_path)
+
+
+def _ai_tags(original_file, photo):
+    """Tag the photo with the top-5 ResNet labels."""
+    if not _resnet_model:
+        return
+    with open_image(original_file) as img:
+        # The model only sees 224x224, so never decode more than a small multiple of that
+        img = load_bounded(img, 512)
+        
+        preprocess = transforms.Compose([
+            transforms.Resize(256),
+            transforms.CenterCrop(224),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+        ])
+        input_tensor = preprocess(img)
+        input_batch = input_tensor.unsqueeze(0)
+
+        with torch.no_grad():
+            output = _resnet_model(input_batch)
+        
+        probabilities = torch.nn.functional.softmax(output[0], dim=0)
+        top5_prob, top5_catid = torch.topk(probabilities, 5)
+        
+        labels = get_imagenet_labels()
+        if labels:
+            tags = [labels[idx.item()] for idx in top5_catid]
+            photo.ai_tags = tags
+
+
+# Expensive steps that may be deferred when the pipeline is under load
+DEFERRABLE_STEPS = {
+    'watermark': _watermark,
+    'ai_tags': _ai_tags,
+}
+
+
 @shared_task
 def process_photo_task(photo_id, original_path):
     print(f"Processing photo {photo_id} at {original_path}")
     try:
         photo = Photo.objects.get(id=photo_id)
+        before = facets.snapshot(photo)
         photo.processing_status = 'processing'
         photo.save()
         
@@ -52,17 +122,13 @@ def process_photo_task(photo_id, original_path):
         
         # Ensure directories exist
         (media_root / "photos/thumbnails").mkdir(parents=True, exist_ok=True)
-        (media_root / "photos/watermarked").mkdir(parents=True, exist_ok=True)
 
         thumbnail_path = f"photos/thumbnails/thumb_{original_file.name}"
-        watermarked_path = f"photos/watermarked/water_{original_file.name}"
-        
         full_thumb_path = media_root / thumbnail_path
-        full_water_path = media_root / watermarked_path
 
         # 1. EXIF Data
         exif_data = {}
-        with Image.open(original_file) as img:
+        with open_image(original_file) as img:
             if hasattr(img, 'getexif'):
                 exif = img.getexif()
                 if exif:
@@ -72,58 +138,26 @@ def process_photo_task(photo_id, original_path):
         photo.exif_data = exif_data
 
         # 2. Thumbnail
-        with Image.open(original_file) as img:
-             if img.mode != 'RGB':
-                img = img.convert('RGB')
-             img.thumbnail((400, 400), Image.Resampling.LANCZOS)
+        with open_image(original_file) as img:
+             img = load_bounded(img, 400)
              img.save(full_thumb_path, "JPEG", quality=85)
         photo.thumbnail_image = str(thumbnail_path)
 
-        # 3. Watermark
-        with Image.open(original_file) as img:
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            draw = ImageDraw.Draw(img)
-            # Simple text watermark for now
-            text = "IMG Project"
-            font = ImageFont.load_default()
-            bbox = draw.textbbox((0, 0), text, font=font)
-            textwidth = bbox[2] - bbox[0]
-            textheight = bbox[3] - bbox[1]
-            x = img.width - textwidth - 10
-            y = img.height - textheight - 10
-            draw.text((x, y), text, font=font, fill=(255, 255, 255, 128))
-            img.save(full_water_path, "JPEG", quality=95)
-        photo.watermarked_image = str(watermarked_path)
-
-        # 4. AI Tagging
-        if _resnet_model:
-            with Image.open(original_file) as img:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                preprocess = transforms.Compose([
-                    transforms.Resize(256),
-                    transforms.CenterCrop(224),
-                    transforms.ToTensor(),
-                    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-                ])
-                input_tensor = preprocess(img)
-                input_batch = input_tensor.unsqueeze(0)
-
-                with torch.no_grad():
-                    output = _resnet_model(input_batch)
-                
-                probabilities = torch.nn.functional.softmax(output[0], dim=0)
-                top5_prob, top5_catid = torch.topk(probabilities, 5)
-                
-                labels = get_imagenet_labels()
-                if labels:
-                    tags = [labels[idx.item()] for idx in top5_catid]
-                    photo.ai_tags = tags
+        # 3. Watermark and 4. AI Tagging - deferred to the sweep when the queue is backed up
+        if is_under_load():
+            photo.deferred_steps = list(DEFERRABLE_STEPS)
+            incr_counter('degraded_tasks')
+            for step in DEFERRABLE_STEPS:
+                incr_counter(f'deferred_{step}')
+        else:
+            for step_fn in DEFERRABLE_STEPS.values():
+                step_fn(original_file, photo)
 
         photo.processing_status = 'completed'
+        photo.processed_at = timezone.now()
         photo.save()
+        facets.record_change(before, facets.snapshot(photo))
+        gallery_cache.bump(photo.event_id)
         
         # Notify Uploader (optional - gracefully handle if channels not available)
         try:
@@ -148,8 +182,79 @@ def process_photo_task(photo_id, original_path):
         print(f"Error processing photo: {e}")
         try:
             photo.processing_status = 'failed'
+            photo.processed_at = timezone.now()
             photo.save()
+            gallery_cache.bump(photo.event_id)
         except:
             pass
     
     return True
+
+
+@shared_task
+def complete_deferred_photo_task(photo_id):
+    """Run the steps that were skipped for a photo while the pipeline was degraded."""
+    try:
+        photo = Photo.objects.get(id=photo_id)
+    except Photo.DoesNotExist:
+        return False
+    if not photo.deferred_steps:
+        return True
+
+    before = facets.snapshot(photo)
+    original_file = Path(photo.original_image.path)
+    remaining = list(photo.deferred_steps or [])
+    for step in list(remaining):
+        try:
+            DEFERRABLE_STEPS[step](original_file, photo)
+        except Exception as e:
+            print(f"Deferred step {step} failed for photo {photo_id}: {e}")
+            continue
+        remaining.remove(step)
+        incr_counter('deferred_completed')
+
+    if remaining:
+        photo.deferred_attempts += 1
+        if photo.deferred_attempts >= settings.PHOTO_DEFERRED_MAX_ATTEMPTS:
+            print(f"Giving up on deferred steps {remaining} for photo {photo_id}")
+            incr_counter('deferred_abandoned')
+
+    photo.deferred_steps = remaining
+    photo.deferred_enqueued_at = None
+    photo.save(update_fields=['watermarked_image', 'ai_tags', 'deferred_steps', 'deferred_enqueued_at', 'deferred_attempts'])
+    facets.record_change(before, facets.snapshot(photo))
+    gallery_cache.bump(photo.event_id)
+    return not remaining
+
+
+@shared_task
+def sweep_deferred_photos_task():
+    """Periodically pick up deferred work once load has dropped.
+
+    Photos are claimed before they are enqueued, so one that is already
+    queued or running is not sent again unless its claim has gone stale.
+    Photos that have used up their attempts are skipped.
+    """
+    if not can_run_deferred():
+        return 0
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.PHOTO_DEFERRED_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        photo_ids = list(
+            Photo.objects.select_for_update(skip_locked=True)
+            .filter(processing_status='completed', deferred_attempts__lt=settings.PHOTO_DEFERRED_MAX_ATTEMPTS)
+            .filter(Q(deferred_enqueued_at__isnull=True) | Q(deferred_enqueued_at__lt=stale))
+            .exclude(deferred_steps=[])
+            .order_by('created_at')
+            .values_list('id', flat=True)[:settings.PHOTO_DEFERRED_SWEEP_BATCH]
+        )
+        Photo.objects.filter(id__in=photo_ids).update(deferred_enqueued_at=now)
+
+    for photo_id in photo_ids:
+        complete_deferred_photo_task.apply_async(
+            args=(photo_id,),
+            queue=QUEUES['archive'],
+            priority=LOWEST_PRIORITY,
+        )
+    return len(photo_ids)
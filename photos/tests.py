@@ -1,3 +1,951 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import orjson
+import redis
+from django.db import connection, transaction
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from config import autocomplete
+from config.celery import app as celery_app
+from config.search import ranked
+from events import cache as gallery_cache
+from events.models import Event
+from social import likes
+from social.models import Comment, Engagement, Like
+from users.models import CustomUser, Profile
+from . import admission, degradation, facets, imaging, scheduling, tasks, watchdog
+from .validation import InvalidImage, inspect_image
+from .metrics import get_redis
+from .models import Photo, TaggedIn
+from .serializers import PhotoSerializer, annotate_for_serializer
+
+
+class PhotoListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        Profile.objects.create(user=cls.viewer)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _create_photos(self, count):
+        for i in range(count):
+            uploader = CustomUser.objects.create_user(
+                username=f'uploader{Photo.objects.count()}', email=f'u{i}@example.com', password='pw'
+            )
+            Profile.objects.create(user=uploader)
+            photo = Photo.objects.create(original_image='photos/originals/test.jpg', uploader=uploader)
+            TaggedIn.objects.create(photo=photo, user=self.viewer)
+            Like.objects.create(photo=photo, user=uploader)
+            Like.objects.create(photo=photo, user=self.viewer)
+            engagement = Engagement.objects.create(photo=photo, likes_count=2, comments_count=1)
+            Comment.objects.create(engagement=engagement, author=uploader, content='nice')
+
+    def _list_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/v1/photos/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data['results']
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self._create_photos(2)
+        small_page_queries, _ = self._list_queries({'expand': 'uploader,tagged_users'})
+
+        self._create_photos(20)
+        large_page_queries, results = self._list_queries({'expand': 'uploader,tagged_users'})
+
+        self.assertEqual(len(results), 22)
+        self.assertEqual(small_page_queries, large_page_queries)
+
+    def test_list_renders_annotated_counts(self):
+        self._create_photos(1)
+        _, results = self._list_queries({'expand': 'tagged_users'})
+
+        photo = results[0]
+        self.assertEqual(photo['likes_count'], 2)
+        self.assertEqual(photo['comments_count'], 1)
+        self.assertTrue(photo['is_liked'])
+        self.assertEqual(photo['tagged_users'][0]['user']['username'], 'viewer')
+
+
+class PhotoSparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        Profile.objects.create(user=cls.user)
+        cls.photo = Photo.objects.create(
+            original_image='photos/originals/test.jpg', uploader=cls.user,
+            exif_data={'Make': 'Canon'}, ai_tags=['stage'],
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        return response, ' '.join(query['sql'] for query in ctx.captured_queries)
+
+    def test_list_defaults_to_compact_projection(self):
+        response, sql = self._get('/api/v1/photos/')
+
+        self.assertEqual(set(response.data['results'][0]), set(PhotoSerializer.LIST_FIELDS))
+        self.assertNotIn('exif_data', sql)
+        self.assertNotIn('ai_tags', sql)
+
+    def test_expand_adds_to_default(self):
+        response, _ = self._get('/api/v1/photos/', {'expand': 'exif_data'})
+
+        photo = response.data['results'][0]
+        self.assertEqual(photo['exif_data'], {'Make': 'Canon'})
+        self.assertIn('thumbnail_image', photo)
+
+    def test_fields_selects_exactly(self):
+        response, sql = self._get('/api/v1/photos/', {'fields': 'ai_tags'})
+
+        self.assertEqual(response.data['results'][0], {'id': self.photo.id, 'ai_tags': ['stage']})
+        self.assertNotIn('exif_data', sql)
+        self.assertNotIn('engagement', sql)
+
+    def test_compiled_list_matches_serializer(self):
+        response, _ = self._get('/api/v1/photos/')
+
+        photo = annotate_for_serializer(Photo.objects.filter(pk=self.photo.pk), self.user, PhotoSerializer.LIST_FIELDS).get()
+        expected = PhotoSerializer(photo, fields=PhotoSerializer.LIST_FIELDS, context={'request': response.wsgi_request}).data
+        self.assertEqual(response.data['results'][0], expected)
+
+    def test_detail_defaults_to_all_fields(self):
+        response, _ = self._get(f'/api/v1/photos/{self.photo.id}/')
+
+        self.assertEqual(response.data['exif_data'], {'Make': 'Canon'})
+        self.assertIn('uploader', response.data)
+
+    def test_unknown_field_is_rejected(self):
+        response, _ = self._get('/api/v1/photos/', {'fields': 'id,password'})
+
+        self.assertEqual(response.status_code, 400)
+
+
+class PhotoFeedPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        Profile.objects.create(user=cls.user)
+        cls.photos = [
+            Photo.objects.create(original_image='photos/originals/test.jpg', uploader=cls.user)
+            for _ in range(7)
+        ]
+        # A burst uploaded in the same instant, so the cursor has to step through ties
+        Photo.objects.filter(pk__in=[photo.pk for photo in cls.photos[2:6]]).update(created_at=timezone.now())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, params):
+        pages = []
+        response = self.client.get('/api/v1/photos/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([photo['id'] for photo in response.data['results']])
+            if response.data['next'] is None:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_following_next_visits_every_photo_once(self):
+        pages = self._walk({'limit': 2})
+
+        self.assertTrue(all(len(page) <= 2 for page in pages))
+        ids = [photo_id for page in pages for photo_id in page]
+        expected = Photo.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_no_count_and_offset_is_ignored(self):
+        response = self.client.get('/api/v1/photos/', {'limit': 3, 'offset': 3})
+
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        expected = Photo.objects.order_by('-created_at', '-id').values_list('id', flat=True)[:3]
+        self.assertEqual([photo['id'] for photo in response.data['results']], list(expected))
+
+
+class EventGalleryCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='guest', email='guest@example.com', password='pw')
+        Profile.objects.create(user=cls.user)
+        cls.event = Event.objects.create(name='Fest', date=date(2026, 10, 19))
+        cls.photo = Photo.objects.create(original_image='photos/originals/test.jpg', uploader=cls.user, event=cls.event)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Ids are reused across test runs; start from a fresh cache version and like state
+        gallery_cache.bump(self.event.id)
+        self._drop_cached_likes()
+        self.addCleanup(self._drop_cached_likes)
+
+    def _drop_cached_likes(self):
+        try:
+            get_redis().delete(*likes._keys(self.photo.id).values())
+            get_redis().srem(likes.DIRTY_KEY, self.photo.id)
+        except redis.RedisError:
+            pass
+
+    def _gallery(self):
+        response = self.client.get('/api/v1/photos/', {'event': self.event.id})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def test_like_is_visible_through_cache(self):
+        before = self._gallery()
+        self.client.post(f'/api/v1/photos/{self.photo.id}/like/')
+        after = self._gallery()
+
+        self.assertEqual((before['is_liked'], before['likes_count']), (False, 0))
+        self.assertEqual((after['is_liked'], after['likes_count']), (True, 1))
+
+    def test_is_liked_is_per_user(self):
+        self.client.post(f'/api/v1/photos/{self.photo.id}/like/')
+        self._gallery()
+
+        other = CustomUser.objects.create_user(username='other', email='other@example.com', password='pw')
+        self.client.force_authenticate(other)
+        photo = self._gallery()
+
+        self.assertFalse(photo['is_liked'])
+        self.assertEqual(photo['likes_count'], 1)
+
+    def test_unchanged_gallery_answers_304_without_queries(self):
+        etag = self.client.get('/api/v1/photos/', {'event': self.event.id})['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/photos/', {'event': self.event.id}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 0)
+
+    def test_like_changes_etag(self):
+        etag = self.client.get('/api/v1/photos/', {'event': self.event.id})['ETag']
+        self.client.post(f'/api/v1/photos/{self.photo.id}/like/')
+        response = self.client.get('/api/v1/photos/', {'event': self.event.id}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(PHOTO_COMPRESS_MIN_BYTES=0)
+    def test_json_is_compressed_with_weak_etag(self):
+        response = self.client.get('/api/v1/photos/', {'event': self.event.id}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(orjson.loads(gzip.decompress(response.content))['results'][0]['id'], self.photo.id)
+        # The weakened tag still revalidates
+        again = self.client.get('/api/v1/photos/', {'event': self.event.id}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class MediaDeliveryTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, PHOTO_MEDIA_SERVING='python')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.content = bytes(range(256)) * 40
+        os.makedirs(os.path.join(media_root.name, 'photos', 'thumbnails'))
+        with open(os.path.join(media_root.name, 'photos', 'thumbnails', 'thumb_a.jpg'), 'wb') as f:
+            f.write(self.content)
+        self.url = '/media/photos/thumbnails/thumb_a.jpg'
+
+    def test_full_file_with_immutable_caching(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range_request(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(suffix.streaming_content), self.content[-10:])
+
+        beyond = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(beyond.status_code, 416)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_path_traversal_is_rejected(self):
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    def test_originals_are_not_public(self):
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'photos', 'originals'))
+        with open(os.path.join(settings.MEDIA_ROOT, 'photos', 'originals', 'a.jpg'), 'wb') as f:
+            f.write(self.content)
+        uploader = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        photo = Photo.objects.create(original_image='photos/originals/a.jpg', uploader=uploader)
+
+        self.assertEqual(self.client.get('/media/photos/originals/a.jpg').status_code, 404)
+        download = f'/api/v1/photos/{photo.id}/download/'
+        self.assertEqual(APIClient().get(download).status_code, 401)
+
+        client = APIClient()
+        client.force_authenticate(uploader)
+        response = client.get(download)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    @override_settings(PHOTO_MEDIA_SERVING='x-accel')
+    def test_x_accel_hands_off_to_proxy(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/photos/thumbnails/thumb_a.jpg')
+        self.assertEqual(response.content, b'')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = CustomUser.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        Profile.objects.create(user=cls.viewer)
+        cls.concert = Event.objects.create(name='Autumn Concert', date=date(2026, 10, 19), location='Riverside Hall')
+        cls.gala = Event.objects.create(name='Gala', date=date(2026, 10, 18), description='Dinner after the concert')
+        cls.photo = Photo.objects.create(
+            original_image='photos/originals/a.jpg', uploader=cls.viewer, event=cls.concert,
+            ai_tags=['concert', 'crowd'], manual_tags=['stage lights'],
+        )
+        Photo.objects.create(original_image='photos/originals/b.jpg', uploader=cls.viewer, ai_tags=['beach'])
+        engagement = Engagement.objects.create(photo=cls.photo)
+        cls.comment = Comment.objects.create(engagement=engagement, author=cls.viewer, content='What a great concert!')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_matches_every_kind_in_three_queries(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/search/', {'q': 'concerts'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.data['photos']], [self.photo.id])
+        self.assertEqual(set(response.data['photos'][0]), set(PhotoSerializer.LIST_FIELDS))
+        self.assertEqual([c['id'] for c in response.data['comments']], [self.comment.id])
+        self.assertEqual(response.data['comments'][0]['photo'], self.photo.id)
+        # A match in the name outranks one in the description
+        self.assertEqual([e['id'] for e in response.data['events']], [self.concert.id, self.gala.id])
+        self.assertNotIn('search_vector', response.data['events'][0])
+
+    def test_typos_still_match(self):
+        response = self.client.get('/api/v1/search/', {'q': 'concet'})
+
+        self.assertEqual([p['id'] for p in response.data['photos']], [self.photo.id])
+        self.assertIn(self.concert.id, [e['id'] for e in response.data['events']])
+
+    def test_vectors_follow_tag_changes(self):
+        Photo.objects.filter(pk=self.photo.pk).update(manual_tags=['fireworks'])
+
+        response = self.client.get('/api/v1/search/', {'q': 'fireworks'})
+
+        self.assertEqual([p['id'] for p in response.data['photos']], [self.photo.id])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/api/v1/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/search/', {'q': 'x', 'limit': 'many'}).status_code, 400)
+
+
+class SearchMigrationTests(TransactionTestCase):
+    def test_migration_builds_a_usable_trigram_index(self):
+        # Re-run photos.0008 against the real database
+        executor = MigrationExecutor(connection)
+        executor.migrate([('photos', '0007_photo_feed_indexes')])
+        executor.loader.build_graph()
+        executor.migrate([('photos', '0008_photo_search')])
+
+        user = CustomUser.objects.create_user(username='viewer', email='viewer@example.com', password='pw')
+        photo = Photo.objects.create(
+            original_image='photos/originals/a.jpg', uploader=user, ai_tags=['fireworks'], manual_tags=['night sky'],
+        )
+        Photo.objects.create(original_image='photos/originals/b.jpg', uploader=user, ai_tags=['beach'])
+
+        self.assertEqual(Photo.objects.values_list('search_text', flat=True).get(pk=photo.pk), '["fireworks"] ["night sky"]')
+        self.assertEqual(list(ranked(Photo.objects.all(), 'firewrks', 'search_text', ('-created_at', '-id'))), [photo])
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = Photo.objects.filter(search_text__trigram_word_similar='firewrks').explain()
+        self.assertIn('photo_search_trgm_idx', plan)
+
+
+class PhotoFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        for user in (cls.alice, cls.bob):
+            Profile.objects.create(user=user)
+        cls.event = Event.objects.create(name='Fest', date=date(2026, 10, 19))
+        cls.photo = Photo.objects.create(
+            original_image='photos/originals/a.jpg', uploader=cls.alice, event=cls.event,
+            ai_tags=['stage', 'crowd'], manual_tags=['crowd'],
+        )
+        Photo.objects.create(original_image='photos/originals/b.jpg', uploader=cls.alice, event=cls.event, ai_tags=['crowd'])
+        Photo.objects.create(original_image='photos/originals/c.jpg', uploader=cls.bob, ai_tags=['beach'])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        # Ids are reused across test runs; start without cached counts
+        facets.invalidate(self.event.id)
+        self.addCleanup(facets.invalidate, self.event.id)
+
+    @staticmethod
+    def _counts(data, name):
+        return {entry['value']: entry['count'] for entry in data['facets'][name]}
+
+    def test_all_facets_cost_one_query(self):
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get('/api/v1/photos/')
+        with CaptureQueriesContext(connection) as faceted:
+            response = self.client.get('/api/v1/photos/', {'facets': 'tag,photographer,event,month'})
+
+        self.assertEqual(len(faceted), len(plain) + 1)
+        self.assertEqual(self._counts(response.data, 'tag'), {'crowd': 2, 'stage': 1, 'beach': 1})
+        self.assertEqual(self._counts(response.data, 'photographer'), {self.alice.id: 2, self.bob.id: 1})
+        self.assertEqual(response.data['facets']['photographer'][0]['label'], 'alice')
+        self.assertEqual(self._counts(response.data, 'event'), {self.event.id: 2})
+        self.assertEqual(sum(self._counts(response.data, 'month').values()), 3)
+
+    def test_event_counts_are_adjusted_on_write(self):
+        first = self.client.get('/api/v1/photos/', {'event': self.event.id, 'facets': 'tag'})
+        self.client.patch(f'/api/v1/photos/{self.photo.id}/', {'manual_tags': ['encore']}, format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/v1/photos/', {'event': self.event.id, 'facets': 'tag'})
+
+        self.assertEqual(self._counts(first.data, 'tag'), {'crowd': 2, 'stage': 1})
+        self.assertEqual(self._counts(second.data, 'tag'), {'crowd': 2, 'stage': 1, 'encore': 1})
+        # Served from the adjusted hash, not recounted
+        self.assertFalse(any('MATERIALIZED' in query['sql'] for query in queries))
+
+    def test_unknown_facet_is_rejected(self):
+        response = self.client.get('/api/v1/photos/', {'facets': 'colour'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PrefixIndexTests(TestCase):
+    def test_top_is_heaviest_first_within_prefix(self):
+        index = autocomplete.PrefixIndex([('beach', 3, None), ('bear', 5, None), ('bee', 1, None), ('cat', 9, None)])
+        self.assertEqual([key for key, _, _ in index.top('be', 10)], ['bear', 'beach', 'bee'])
+        self.assertEqual([key for key, _, _ in index.top('be', 1)], ['bear'])
+        self.assertEqual(index.top('dog', 10), [])
+
+    def test_memoized_prefix_sees_later_changes(self):
+        index = autocomplete.PrefixIndex((f'tag{i:04}', 1, None) for i in range(autocomplete.SCAN_LIMIT + 1))
+        self.assertEqual(index.top('t', 1)[0][0], 'tag0000')
+        index.add('tag0500', 5)
+        self.assertEqual(index.top('t', 1)[0][:2], ('tag0500', 6))
+
+    def test_keys_at_zero_are_dropped(self):
+        index = autocomplete.PrefixIndex([('beach', 1, None)])
+        index.add('beach', -1)
+        self.assertEqual(len(index), 0)
+        index.add('ghost', -1)
+        self.assertEqual(len(index), 0)
+
+
+@override_settings(PHOTO_AUTOCOMPLETE_SYNC_INTERVAL=0)
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.alfred = CustomUser.objects.create_user(username='Alfred', email='alfred@example.com', password='pw')
+        for user in (cls.alice, cls.alfred):
+            Profile.objects.create(user=user)
+        cls.photo = Photo.objects.create(
+            original_image='photos/originals/a.jpg', uploader=cls.alice, ai_tags=['crowd', 'Crew'],
+        )
+        Photo.objects.create(original_image='photos/originals/b.jpg', uploader=cls.alice, manual_tags=['crowd'])
+        TaggedIn.objects.create(photo=cls.photo, user=cls.alfred)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        # Each test starts from a fresh index loaded from its own data
+        autocomplete._state = autocomplete._State()
+
+    def test_tags_by_popularity(self):
+        response = self.client.get('/api/v1/autocomplete/', {'q': 'CR'})
+        self.assertEqual(response.data, [{'value': 'crowd', 'count': 2}, {'value': 'crew', 'count': 1}])
+
+    def test_users_by_times_tagged(self):
+        response = self.client.get('/api/v1/autocomplete/', {'q': 'al', 'kind': 'user'})
+        self.assertEqual(
+            response.data,
+            [{'id': self.alfred.id, 'username': 'Alfred', 'count': 1}, {'id': self.alice.id, 'username': 'alice', 'count': 0}],
+        )
+
+    def test_tag_changes_are_applied_without_rebuild(self):
+        self.client.get('/api/v1/autocomplete/', {'q': 'cr'})
+        self.client.patch(f'/api/v1/photos/{self.photo.id}/', {'manual_tags': ['crane']}, format='json')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/autocomplete/', {'q': 'cr', 'limit': 5})
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual([entry['value'] for entry in response.data], ['crowd', 'crane', 'crew'])
+
+    def test_changes_published_during_the_load_are_not_replayed(self):
+        load = autocomplete._load
+
+        def load_after_a_write():
+            # Written and published while the snapshot is being read
+            Photo.objects.create(original_image='photos/originals/c.jpg', uploader=self.alice, manual_tags=['crane'])
+            autocomplete.record_tags({'crane': 1})
+            return load()
+
+        with mock.patch.object(autocomplete, '_load', side_effect=load_after_a_write):
+            self.client.get('/api/v1/autocomplete/', {'q': 'cr'})
+        response = self.client.get('/api/v1/autocomplete/', {'q': 'cra'})
+
+        self.assertEqual(response.data, [{'value': 'crane', 'count': 1}])
+
+    def test_index_built_without_redis_is_rebuilt_not_replayed(self):
+        down = mock.Mock()
+        down.xrevrange.side_effect = down.ping.side_effect = redis.ConnectionError('down')
+        with mock.patch.object(autocomplete, 'get_redis', return_value=down), self.assertLogs('config.autocomplete', 'WARNING'):
+            self.client.get('/api/v1/autocomplete/', {'q': 'cr'})
+        self.assertIsNone(autocomplete._state.last_id)
+        # Stream entries the index never saw must not be replayed onto the snapshot
+        autocomplete.record_tags({'crowd': 5})
+
+        response = self.client.get('/api/v1/autocomplete/', {'q': 'crow'})
+
+        self.assertEqual(response.data, [{'value': 'crowd', 'count': 2}])
+        self.assertIsNotNone(autocomplete._state.last_id)
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/autocomplete/', {'kind': 'event'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/autocomplete/', {'limit': '0'}).status_code, 400)
+
+
+@override_settings(PHOTO_DEGRADE_OLDEST_AGE=300, PHOTO_TASK_STALE_AFTER=3600)
+class DegradationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+
+    def setUp(self):
+        patcher = mock.patch.object(degradation, 'get_queue_depth', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pending(self, **fields):
+        return Photo.objects.create(original_image='photos/originals/a.jpg', uploader=self.alice, **fields)
+
+    def test_orphaned_pending_photos_do_not_trigger_degradation(self):
+        # Saved without a task, and enqueued to a worker that crashed long ago
+        self._pending()
+        self._pending(enqueued_at=timezone.now() - timedelta(hours=2))
+
+        self.assertFalse(degradation.is_under_load())
+        self.assertTrue(degradation.can_run_deferred())
+
+    def test_old_enqueued_photo_triggers_degradation(self):
+        self._pending(enqueued_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertTrue(degradation.is_under_load())
+        self.assertFalse(degradation.can_run_deferred())
+
+    def test_enqueue_records_the_send_time(self):
+        photo = self._pending()
+
+        with mock.patch.object(tasks.process_photo_task, 'apply_async'):
+            scheduling.enqueue_photo(photo)
+
+        photo.refresh_from_db()
+        self.assertIsNotNone(photo.enqueued_at)
+
+
+class DeferredProcessingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        Profile.objects.create(user=cls.alice)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(media_root.name, 'photos', 'originals'))
+        self.original_path = os.path.join(media_root.name, 'photos', 'originals', 'a.jpg')
+        Image.new('RGB', (800, 600), 'navy').save(self.original_path)
+
+        patcher = mock.patch.object(tasks, 'can_run_deferred', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(tasks.complete_deferred_photo_task, 'apply_async')
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _deferred_photo(self, **fields):
+        return Photo.objects.create(
+            original_image='photos/originals/a.jpg', uploader=self.alice,
+            processing_status='completed', deferred_steps=['watermark'], **fields,
+        )
+
+    def test_steps_are_deferred_under_load(self):
+        photo = Photo.objects.create(original_image='photos/originals/a.jpg', uploader=self.alice)
+
+        with mock.patch.object(tasks, 'is_under_load', return_value=True):
+            tasks.process_photo_task(photo.id, self.original_path)
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.processing_status, 'completed')
+        self.assertEqual(photo.deferred_steps, list(tasks.DEFERRABLE_STEPS))
+        self.assertTrue(photo.thumbnail_image)
+        self.assertFalse(photo.watermarked_image)
+
+    def test_sweep_claims_each_photo_once(self):
+        first, second = self._deferred_photo(), self._deferred_photo()
+
+        self.assertEqual(tasks.sweep_deferred_photos_task(), 2)
+        self.assertEqual(tasks.sweep_deferred_photos_task(), 0)
+
+        self.assertEqual([call.kwargs['args'] for call in self.enqueue.call_args_list], [(first.id,), (second.id,)])
+        first.refresh_from_db()
+        self.assertIsNotNone(first.deferred_enqueued_at)
+
+    @override_settings(PHOTO_DEFERRED_CLAIM_TIMEOUT=60)
+    def test_stale_claim_is_swept_again(self):
+        photo = self._deferred_photo(deferred_enqueued_at=timezone.now() - timedelta(minutes=5))
+        self._deferred_photo(deferred_enqueued_at=timezone.now())
+
+        self.assertEqual(tasks.sweep_deferred_photos_task(), 1)
+        self.assertEqual(self.enqueue.call_args.kwargs['args'], (photo.id,))
+
+    def test_completed_steps_release_the_claim(self):
+        photo = self._deferred_photo()
+        tasks.sweep_deferred_photos_task()
+
+        self.assertTrue(tasks.complete_deferred_photo_task(photo.id))
+
+        photo.refresh_from_db()
+        self.assertEqual(photo.deferred_steps, [])
+        self.assertIsNone(photo.deferred_enqueued_at)
+        self.assertTrue(photo.watermarked_image)
+
+    @override_settings(PHOTO_DEFERRED_MAX_ATTEMPTS=2)
+    def test_failing_step_stops_after_max_attempts(self):
+        photo = self._deferred_photo()
+        failing = mock.Mock(side_effect=OSError('disk full'))
+
+        with mock.patch.dict(tasks.DEFERRABLE_STEPS, {'watermark': failing}):
+            for _ in range(2):
+                self.assertEqual(tasks.sweep_deferred_photos_task(), 1)
+                self.assertFalse(tasks.complete_deferred_photo_task(photo.id))
+
+        self.assertEqual(tasks.sweep_deferred_photos_task(), 0)
+        photo.refresh_from_db()
+        self.assertEqual(photo.deferred_attempts, 2)
+        self.assertEqual(photo.deferred_steps, ['watermark'])
+
+
+@override_settings(
+    PHOTO_INGEST_SOFT_QUEUE_DEPTH=20, PHOTO_INGEST_HARD_QUEUE_DEPTH=100,
+    PHOTO_INGEST_PER_UPLOADER_LIMIT=10, PHOTO_INGEST_MIN_UPLOADER_SHARE=5,
+    PHOTO_INGEST_NOMINAL_THROUGHPUT=2.0,
+)
+class AdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        Profile.objects.create(user=cls.alice)
+
+    def setUp(self):
+        patcher = mock.patch.object(admission, 'get_queue_depth', return_value=0)
+        self.depth = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _upload(self, count):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        files = [SimpleUploadedFile(f'{i}.jpg', b'', content_type='image/jpeg') for i in range(count)]
+        return client.post('/api/v1/photos/upload/', {'files': files}, format='multipart')
+
+    def test_admitted_with_estimate(self):
+        decision = admission.check_admission(self.alice, 5)
+
+        self.assertTrue(decision.admitted)
+        self.assertFalse(decision.queued)
+        self.assertEqual(decision.estimated_seconds, 3)
+
+    def test_past_soft_limit_is_queued(self):
+        self.depth.return_value = 30
+        decision = admission.check_admission(self.alice, 5)
+
+        self.assertTrue(decision.admitted)
+        self.assertTrue(decision.queued)
+        self.assertEqual(decision.estimated_seconds, 18)
+
+    def test_full_queue_retries_once_overflow_drains(self):
+        self.depth.return_value = 95
+        decision = admission.check_admission(self.alice, 10)
+
+        self.assertFalse(decision.admitted)
+        self.assertFalse(decision.too_large)
+        # 5 photos over the hard limit at 2 photos/sec
+        self.assertEqual(decision.retry_after, 3)
+
+    def test_uploader_over_share_retries_at_their_rate(self):
+        for i in range(8):
+            Photo.objects.create(original_image=f'photos/originals/{i}.jpg', uploader=self.alice)
+        bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        Photo.objects.create(original_image='photos/originals/b.jpg', uploader=bob)
+
+        decision = admission.check_admission(self.alice, 5)
+
+        self.assertFalse(decision.admitted)
+        self.assertEqual(decision.uploader_backlog, 8)
+        # 3 photos over the share, with throughput split between two uploaders
+        self.assertEqual(decision.retry_after, 3)
+
+    def test_rejected_upload_sets_retry_after(self):
+        self.depth.return_value = 95
+        response = self._upload(10)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        self.assertEqual(response.data['retry_after'], 3)
+
+    def test_batch_over_the_share_is_too_large(self):
+        decision = admission.check_admission(self.alice, 11)
+
+        self.assertFalse(decision.admitted)
+        self.assertTrue(decision.too_large)
+        self.assertEqual(decision.batch_limit, 10)
+
+    def test_upload_of_too_large_batch_is_413_without_retry(self):
+        response = self._upload(11)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.data['batch_limit'], 10)
+        self.assertNotIn('Retry-After', response)
+
+
+class BrokerDepthTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(admission._depth_cache, {'value': 7, 'expires': 0.0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_broker_error_keeps_last_depth_and_is_counted(self):
+        with mock.patch.object(celery_app, 'connection_for_read', side_effect=OSError('broker down')), \
+                mock.patch('photos.metrics.incr_counter') as incr, \
+                self.assertLogs('photos.admission', 'ERROR'):
+            depth = admission.get_queue_depth()
+
+        self.assertEqual(depth, 7)
+        incr.assert_called_once_with('broker_depth_errors')
+
+
+@override_settings(PHOTO_SCHEDULER_SHARE_STEP=50, PHOTO_LIVE_EVENT_WINDOW_DAYS=1)
+class SchedulingTests(TestCase):
+    def test_priority_drops_per_share_step_down_to_lowest(self):
+        self.assertEqual(scheduling.priority_for(0), scheduling.HIGHEST_PRIORITY)
+        self.assertEqual(scheduling.priority_for(49), 0)
+        self.assertEqual(scheduling.priority_for(50), 1)
+        self.assertEqual(scheduling.priority_for(10_000), scheduling.LOWEST_PRIORITY)
+
+    def test_events_near_today_are_live(self):
+        today = timezone.localdate()
+        self.assertEqual(scheduling.priority_class_for(None), 'archive')
+        self.assertEqual(scheduling.priority_class_for(Event(name='Now', date=today)), 'live')
+        self.assertEqual(scheduling.priority_class_for(Event(name='Yesterday', date=today - timedelta(days=1))), 'live')
+        self.assertEqual(scheduling.priority_class_for(Event(name='Old', date=today - timedelta(days=3))), 'archive')
+
+    def test_archive_backlog_does_not_delay_the_live_worker(self):
+        # Scratch queues named like the real ones, with the broker's priority options
+        live, archive = (f'test_{scheduling.QUEUES[name]}' for name in ('live', 'archive'))
+        with celery_app.connection_for_write() as conn:
+            queues = {name: conn.SimpleQueue(name) for name in (live, archive)}
+            try:
+                for queue in queues.values():
+                    queue.clear()
+                for i in range(200):
+                    queues[archive].put({'photo': i}, priority=scheduling.HIGHEST_PRIORITY)
+                queues[live].put({'photo': 'live'}, priority=scheduling.LOWEST_PRIORITY)
+
+                # The next message for the dedicated live worker (-Q photos_live)
+                message = queues[live].get(block=False)
+                message.ack()
+            finally:
+                for queue in queues.values():
+                    queue.clear()
+                    queue.close()
+
+        self.assertEqual(message.payload, {'photo': 'live'})
+
+    def test_photo_is_sent_to_its_class_queue(self):
+        uploader = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        photo = Photo.objects.create(original_image='photos/originals/a.jpg', uploader=uploader, priority_class='live')
+
+        with mock.patch.object(tasks.process_photo_task, 'apply_async') as apply_async:
+            scheduling.enqueue_photo(photo, uploader_backlog=120)
+
+        self.assertEqual(apply_async.call_args.kwargs['queue'], 'photos_live')
+        self.assertEqual(apply_async.call_args.kwargs['priority'], 2)
+
+
+class ImagingTests(TestCase):
+    @staticmethod
+    def _encoded(size, fmt='JPEG', mode='RGB'):
+        buffer = io.BytesIO()
+        Image.new(mode, size).save(buffer, fmt)
+        buffer.seek(0)
+        return buffer
+
+    def test_load_bounded_caps_long_edge_in_rgb(self):
+        with imaging.open_image(self._encoded((4000, 1000))) as img:
+            bounded = imaging.load_bounded(img, 400)
+            self.assertEqual(bounded.size, (400, 100))
+            self.assertEqual(bounded.mode, 'RGB')
+
+        with imaging.open_image(self._encoded((300, 200), 'PNG', 'RGBA')) as img:
+            bounded = imaging.load_bounded(img, 400)
+            self.assertEqual(bounded.size, (300, 200))
+            self.assertEqual(bounded.mode, 'RGB')
+
+    @override_settings(PHOTO_LARGE_IMAGE_PIXELS=1_000_000, PHOTO_LARGE_IMAGE_MAX_EDGE=1000)
+    def test_rendition_edge_is_capped_for_large_images(self):
+        self.assertEqual(imaging.rendition_edge(Image.new('RGB', (800, 600))), 800)
+        self.assertEqual(imaging.rendition_edge(Image.new('RGB', (3000, 1000))), 1000)
+
+    @override_settings(PHOTO_MAX_FULL_DECODE_PIXELS=1_000_000)
+    def test_large_png_is_rejected_but_large_jpeg_is_decoded_at_scale(self):
+        with self.assertRaises(imaging.ImageTooLarge):
+            imaging.open_image(self._encoded((2000, 1000), 'PNG'))
+
+        with imaging.open_image(self._encoded((2000, 1000))) as img:
+            self.assertEqual(imaging.load_bounded(img, 400).size, (400, 200))
+
+    @override_settings(PHOTO_MAX_IMAGE_PIXELS=1_000_000)
+    def test_open_image_rejects_oversized_header(self):
+        with self.assertRaises(imaging.ImageTooLarge):
+            imaging.open_image(self._encoded((2000, 1000)))
+
+
+class ValidationTests(TestCase):
+    @staticmethod
+    def _encoded(img, fmt='JPEG'):
+        buffer = io.BytesIO()
+        img.save(buffer, fmt)
+        return buffer.getvalue()
+
+    def _assert_rejected(self, content, message):
+        with self.assertRaisesMessage(InvalidImage, message):
+            inspect_image(io.BytesIO(content))
+
+    def test_valid_image_reports_format_and_size(self):
+        content = self._encoded(Image.new('RGB', (120, 80)))
+        self.assertEqual(inspect_image(io.BytesIO(content)), ('JPEG', 120, 80))
+
+    def test_magic_bytes_must_match_an_allowed_format(self):
+        self._assert_rejected(b'<html>not a photo</html>', 'Unsupported')
+        with override_settings(PHOTO_ALLOWED_FORMATS=['JPEG']):
+            self._assert_rejected(self._encoded(Image.new('RGB', (10, 10)), 'PNG'), 'Unsupported')
+
+    def test_truncated_file_is_rejected(self):
+        content = self._encoded(Image.effect_noise((512, 512), 64).convert('RGB'))
+        self._assert_rejected(content[:len(content) * 2 // 3], 'truncated')
+
+    def test_data_after_the_image_is_accepted(self):
+        content = self._encoded(Image.new('RGB', (64, 64))) + b'motion photo trailer'
+        self.assertEqual(inspect_image(io.BytesIO(content))[0], 'JPEG')
+
+    @override_settings(PHOTO_MAX_FULL_DECODE_PIXELS=1_000_000)
+    def test_large_png_is_rejected_at_upload(self):
+        self._assert_rejected(self._encoded(Image.new('RGB', (2000, 1000)), 'PNG'), 'PNG images are limited')
+        content = self._encoded(Image.new('RGB', (2000, 1000)))
+        self.assertEqual(inspect_image(io.BytesIO(content)), ('JPEG', 2000, 1000))
+
+    def test_decompression_bomb_is_reported_as_over_the_pixel_limit(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            # Past Pillow's error threshold (twice the limit) and in its warning range
+            for size in ((100, 100), (40, 40)):
+                self._assert_rejected(self._encoded(Image.new('RGB', size), 'PNG'), 'pixel limit')
+
+
+@override_settings(PHOTO_WORKER_TRIM_RSS_MB=768, CELERY_WORKER_MAX_MEMORY_PER_CHILD=1536 * 1024)
+class WatchdogTests(TestCase):
+    task = mock.Mock()
+    task.name = 'photos.tasks.process_photo_task'
+
+    def setUp(self):
+        for name in ('record_memory_sample', 'incr_counter', 'release_memory'):
+            patcher = mock.patch.object(watchdog, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def _run(self, before, after, path='missing.jpg'):
+        """Sample around a task; `before`/`after` are (current RSS, lifetime peak) in MB."""
+        with mock.patch.object(watchdog, 'current_rss_mb', return_value=before[0]), \
+                mock.patch.object(watchdog, 'peak_rss_mb', return_value=before[1]):
+            watchdog.sample_before(task_id='t', task=self.task)
+        with mock.patch.object(watchdog, 'current_rss_mb', return_value=after[0]), \
+                mock.patch.object(watchdog, 'peak_rss_mb', return_value=after[1]):
+            watchdog.sample_after(task_id='t', task=self.task, args=(1, path))
+
+    def test_size_buckets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'a.png')
+            Image.new('1', (3000, 2000)).save(path)
+            self.assertEqual(watchdog.size_bucket(path), '4-12MP')
+        self.assertEqual(watchdog.size_bucket('missing.jpg'), 'unknown')
+
+    def test_peak_is_recorded_per_bucket(self):
+        # A new high-water mark during the task is its peak
+        self._run(before=(300, 400), after=(350, 900))
+        self.record_memory_sample.assert_called_once_with('unknown', 900, 50)
+
+        # Otherwise the larger of the two samples is the best estimate
+        self.record_memory_sample.reset_mock()
+        self._run(before=(300, 900), after=(500, 900))
+        self.record_memory_sample.assert_called_once_with('unknown', 500, 200)
+
+    def test_recycle_follows_the_lifetime_peak(self):
+        # Trimmed back under the ceiling, but the peak crossed it: Celery recycles
+        self._run(before=(400, 500), after=(800, 1600))
+        self.release_memory.assert_called_once()
+        self.incr_counter.assert_called_once_with('worker_recycles')
+
+        self.incr_counter.reset_mock()
+        self._run(before=(400, 500), after=(800, 1500))
+        self.incr_counter.assert_not_called()
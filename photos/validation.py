@@ -0,0 +1,115 @@
+"""
+Cheap upload-time image validation.
+
+Runs before a photo is saved or enqueued and only looks at the file header
+and trailer: magic bytes, format, dimensions, pixel count and whether the
+file ends the way its format requires. Pixel data is only decoded (at 1/8
+scale for JPEG) when the trailer check is inconclusive.
+"""
+import warnings
+
+from django.conf import settings
+from PIL import Image
+
+# Pillow's own decompression-bomb check uses the same limit
+Image.MAX_IMAGE_PIXELS = settings.PHOTO_MAX_IMAGE_PIXELS
+
+MAGIC_BYTES = {
+    'JPEG': (b'\xff\xd8\xff',),
+    'PNG': (b'\x89PNG\r\n\x1a\n',),
+    'GIF': (b'GIF87a', b'GIF89a'),
+    'BMP': (b'BM',),
+    'TIFF': (b'II*\x00', b'MM\x00*'),
+    'WEBP': (b'RIFF',),
+}
+
+# What a complete file of each format ends with
+TRAILERS = {
+    'JPEG': b'\xff\xd9',
+    'PNG': b'IEND\xaeB`\x82',
+    'GIF': b';',
+}
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def _detect_format(head):
+    for fmt, prefixes in MAGIC_BYTES.items():
+        if any(head.startswith(prefix) for prefix in prefixes):
+            if fmt == 'WEBP' and head[8:12] != b'WEBP':
+                continue
+            return fmt
+    return None
+
+
+def _is_truncated(file, fmt):
+    trailer = TRAILERS.get(fmt)
+    if trailer is None:
+        return False
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(max(0, size - 32))
+    tail = file.read().rstrip(b'\x00')
+    if tail.endswith(trailer):
+        return False
+
+    # Trailer missing: either truncated, or extra data appended after the image
+    # (motion photos, maker trailers). Decode cheaply to tell them apart.
+    file.seek(0)
+    try:
+        with Image.open(file) as img:
+            if fmt == 'JPEG':
+                img.draft('RGB', (img.width // 8, img.height // 8))
+                img.load()
+            else:
+                img.verify()
+    except Exception:
+        return True
+    return False
+
+
+def inspect_image(file):
+    """
+    Validate an uploaded image and return `(format, width, height)`.
+
+    Raises InvalidImage describing the first problem found.
+    """
+    file.seek(0)
+    head = file.read(16)
+    fmt = _detect_format(head)
+    if fmt is None or fmt not in settings.PHOTO_ALLOWED_FORMATS:
+        raise InvalidImage('Unsupported or unrecognised image format')
+
+    file.seek(0)
+    try:
+        # Pillow only warns between its pixel limit and twice that; fail on both
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(file) as img:
+                # Only the header has been parsed at this point
+                width, height = img.size
+                # Multi-picture JPEGs from some cameras are reported as MPO
+                detected = 'JPEG' if img.format == 'MPO' else img.format
+                if detected != fmt:
+                    raise InvalidImage('File contents do not match its image format')
+    except InvalidImage:
+        raise
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise InvalidImage(f'Image is over the {settings.PHOTO_MAX_IMAGE_PIXELS} pixel limit')
+    except Exception:
+        raise InvalidImage('Corrupt image header')
+
+    if width < 1 or height < 1:
+        raise InvalidImage('Image has no pixels')
+    if width * height > settings.PHOTO_MAX_IMAGE_PIXELS:
+        raise InvalidImage(f'Image is {width}x{height}, larger than {settings.PHOTO_MAX_IMAGE_PIXELS} pixels')
+    if fmt != 'JPEG' and width * height > settings.PHOTO_MAX_FULL_DECODE_PIXELS:
+        # Only JPEG can be decoded at reduced scale; other formats decode in full
+        raise InvalidImage(f'{fmt} images are limited to {settings.PHOTO_MAX_FULL_DECODE_PIXELS} pixels')
+    if _is_truncated(file, fmt):
+        raise InvalidImage('Image file is truncated')
+
+    file.seek(0)
+    return fmt, width, height
@@ -1,58 +1,214 @@
+import os
+import redis
+from django.db import transaction
 from rest_framework import viewsets, permissions, status
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from .models import Photo, TaggedIn
-from .serializers import PhotoSerializer
+from .serializers import PhotoSerializer, annotate_for_serializer, compile_photo_renderer, select_fields
+from . import facets
+from .admission import check_admission
+from .scheduling import enqueue_photo, priority_class_for
+from .metrics import collect as collect_metrics
 from rest_framework.decorators import action
-from social.models import Like, Engagement, Comment
-from social.serializers import CommentSerializer
+from config import autocomplete
+from config.conditional import conditional, make_etag
+from config.media import send_file
+from config.pagination import NewestFirstCursorPagination, OldestFirstCursorPagination
+from config.renderers import ORJSONParser
+from events import cache as gallery_cache
+from social import likes
+from social.models import Engagement, Comment
+from social.serializers import CommentSerializer, attach_replies
 
 class PhotoViewSet(viewsets.ModelViewSet):
-    queryset = Photo.objects.all().order_by('-created_at')
+    queryset = Photo.objects.all().order_by('-created_at', '-id')
     serializer_class = PhotoSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    parser_classes = (MultiPartParser, FormParser, JSONParser)
+    parser_classes = (MultiPartParser, FormParser, ORJSONParser)
+    pagination_class = NewestFirstCursorPagination
     filterset_fields = ['event']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Exactly what the selected fields need, in a constant number of queries per page
+            queryset = annotate_for_serializer(queryset, self.request.user, self.get_fields())
+        return queryset
+
+    def get_fields(self):
+        """Sparse fieldset for list/retrieve; list defaults to PhotoSerializer.LIST_FIELDS."""
+        if not hasattr(self, '_fields'):
+            default = PhotoSerializer.LIST_FIELDS if self.action == 'list' else None
+            self._fields = select_fields(self.request, default)
+        return self._fields
+
+    def list(self, request, *args, **kwargs):
+        # Anything a list can show bumps the gallery versions, so they stand in
+        # for the data when clients revalidate
+        event_id = request.query_params.get('event', '')
+        event_id = int(event_id) if event_id.isdigit() else None
+        facet_names = facets.requested(request)
+        version = gallery_cache.get_version(event_id)
+        etag = None if version is None else make_etag(request, 'photos', version)
+        return conditional(request, etag, lambda: self._gallery_list(request, event_id, facet_names, *args, **kwargs))
+
+    def _gallery_list(self, request, event_id, facet_names, *args, **kwargs):
+        if event_id is None:
+            response = self._list(request, *args, **kwargs)
+            if facet_names:
+                response.data['facets'] = facets.compute(self.filter_queryset(Photo.objects.all()), facet_names)
+            return response
+
+        # Event galleries are cached per event and query; is_liked is per user
+        # so it is filled in after the shared entry is read
+        data = gallery_cache.get_or_build(
+            request, event_id, 'photos', lambda: self._list(request, *args, **kwargs).data,
+        )
+        if 'is_liked' in self.get_fields():
+            results = data['results']
+            liked = likes.liked_photo_ids([photo['id'] for photo in results], request.user)
+            for photo in results:
+                photo['is_liked'] = photo['id'] in liked
+        # Counted over the whole event and kept current as photos change
+        if facet_names:
+            data['facets'] = facets.for_event(event_id, facet_names)
+        return Response(data)
+
+    def _list(self, request, *args, **kwargs):
+        # The default grid projection skips DRF's per-field machinery
+        render = compile_photo_renderer(self.get_fields())
+        if render is None:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(render(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get(self.lookup_field, ''))
+        if not pk.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        event_id = Photo.objects.filter(pk=pk).values_list('event_id', flat=True).first()
+        version = gallery_cache.get_version(event_id)
+        etag = None if version is None else make_etag(request, 'photo', version)
+        retrieve = super().retrieve
+        return conditional(request, etag, lambda: retrieve(request, *args, **kwargs))
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.get_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list':
+            likes.overlay_like_state(page, self.request.user)
+        return page
+
+    def get_object(self):
+        photo = super().get_object()
+        if self.action == 'retrieve':
+            likes.overlay_like_state([photo], self.request.user)
+        return photo
+
     def perform_create(self, serializer):
-        serializer.save(uploader=self.request.user)
+        photo = serializer.save(uploader=self.request.user)
+        facets.record_change(None, facets.snapshot(photo))
+        gallery_cache.bump(photo.event_id)
+
+    def perform_update(self, serializer):
+        previous_event_id = serializer.instance.event_id
+        before = facets.snapshot(serializer.instance)
+        photo = serializer.save()
+        facets.record_change(before, facets.snapshot(photo))
+        gallery_cache.bump(photo.event_id)
+        if previous_event_id != photo.event_id:
+            gallery_cache.bump(previous_event_id)
+
+    def perform_destroy(self, instance):
+        event_id = instance.event_id
+        before = facets.snapshot(instance)
+        instance.delete()
+        facets.record_change(before, None)
+        gallery_cache.bump(event_id)
 
     @action(detail=False, methods=['post'])
     def upload(self, request):
         files = request.FILES.getlist('files')
         event_id = request.data.get('event_id')
         
-        created_photos = []
+        decision = check_admission(request.user, len(files))
+        if decision.too_large:
+            return Response(
+                {'error': decision.reason, 'batch_limit': decision.batch_limit},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if not decision.admitted:
+            return Response(
+                {'error': decision.reason, 'retry_after': decision.retry_after},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(decision.retry_after)},
+            )
+        
+        # Validate every file (header-level, no full decode) before saving or enqueueing any
+        validated = []
         for file in files:
             data = {'original_image': file}
             if event_id:
                 data['event'] = event_id
             
             serializer = self.get_serializer(data=data)
-            if serializer.is_valid():
-                photo_instance = serializer.save(uploader=request.user)
-                created_photos.append(serializer.data)
-                
-                # Trigger background processing
-                from .tasks import process_photo_task
-                process_photo_task.delay(photo_instance.id, photo_instance.original_image.path)
-            else:
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            if not serializer.is_valid():
+                return Response(
+                    {'file': file.name, 'errors': serializer.errors},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            validated.append(serializer)
+        
+        created_photos = []
+        for serializer in validated:
+            event = serializer.validated_data.get('event')
+            photo_instance = serializer.save(
+                uploader=request.user,
+                priority_class=priority_class_for(event),
+            )
+            created_photos.append(serializer.data)
+            facets.record_change(None, facets.snapshot(photo_instance))
+            
+            # Trigger background processing on the queue for this photo's priority
+            enqueue_photo(photo_instance, decision.uploader_backlog + len(created_photos) - 1)
+        
+        # New (pending) photos show in the event gallery straight away
+        if created_photos:
+            gallery_cache.bump(photo_instance.event_id)
         
-        return Response(created_photos, status=status.HTTP_201_CREATED)
+        headers = {
+            'X-Queue-Depth': str(decision.queue_depth),
+            'X-Estimated-Processing-Seconds': str(decision.estimated_seconds),
+        }
+        if decision.queued:
+            # Backlog is deep: photos are stored but processing will lag
+            return Response(created_photos, status=status.HTTP_202_ACCEPTED, headers=headers)
+        return Response(created_photos, status=status.HTTP_201_CREATED, headers=headers)
+
+    @action(detail=False, methods=['get'])
+    def metrics(self, request):
+        """Processing pipeline metrics (queue depth, throughput, latency targets)."""
+        if not request.user.is_authenticated or request.user.role not in ['admin', 'coordinator']:
+            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(collect_metrics())
 
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
         photo = self.get_object()
         user = request.user
         
-        existing_like = Like.objects.filter(photo=photo, user=user).first()
-        if existing_like:
-            existing_like.delete()
-            liked = False
-        else:
-            Like.objects.create(photo=photo, user=user)
-            liked = True
+        # Recorded in Redis and persisted by the write-behind flusher
+        try:
+            liked, likes_count = likes.toggle(photo.id, user.id)
+        except redis.RedisError as e:
+            print(f"Like cache unavailable, writing through: {e}")
+            liked, likes_count = likes.toggle_in_db(photo.id, user.id)
+        gallery_cache.bump(photo.event_id)
             
         # Broadcast update
         from channels.layers import get_channel_layer
@@ -67,7 +223,7 @@ class PhotoViewSet(viewsets.ModelViewSet):
                     "message": {
                         "type": "photo_like_update",
                         "photo_id": photo.id,
-                        "likes_count": photo.likes.count(),
+                        "likes_count": likes_count,
                     }
                 }
             )
@@ -76,7 +232,7 @@ class PhotoViewSet(viewsets.ModelViewSet):
             
         return Response({
             'liked': liked, 
-            'likes_count': photo.likes.count(),
+            'likes_count': likes_count,
             'photo_id': photo.id,
             'user_id': user.id
         })
@@ -85,16 +241,27 @@ class PhotoViewSet(viewsets.ModelViewSet):
     def comments(self, request, pk=None):
         photo = self.get_object()
         
-        # Get or create engagement for this photo
-        engagement, _ = Engagement.objects.get_or_create(photo=photo)
-        
         if request.method == 'GET':
-            # Return all top-level comments (with nested replies via serializer)
-            comments = Comment.objects.filter(engagement=engagement, parent__isnull=True).order_by('created_at')
-            serializer = CommentSerializer(comments, many=True)
-            return Response(serializer.data)
+            # Threads are paginated by top-level comment. One query loads the page
+            # of roots and one the replies under those roots at any depth; the
+            # tree is built in memory.
+            paginator = OldestFirstCursorPagination()
+            thread = (
+                Comment.objects.filter(engagement__photo=photo)
+                .select_related('author__profile')
+            )
+            top_level = paginator.paginate_queryset(
+                thread.filter(parent__isnull=True).order_by('created_at', 'id'), request, view=self
+            )
+            if top_level:
+                attach_replies(top_level, thread.filter(root__in=[comment.id for comment in top_level]))
+            serializer = CommentSerializer(top_level, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
         
         elif request.method == 'POST':
+            # Get or create engagement for this photo
+            engagement, _ = Engagement.objects.get_or_create(photo=photo)
+            
             # Create a new comment
             content = request.data.get('content')
             parent_id = request.data.get('parent_id')
@@ -109,12 +276,15 @@ class PhotoViewSet(viewsets.ModelViewSet):
                 except Comment.DoesNotExist:
                     return Response({'error': 'Parent comment not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            comment = Comment.objects.create(
-                engagement=engagement,
-                author=request.user,
-                content=content,
-                parent=parent
-            )
+            with transaction.atomic():
+                comment = Comment.objects.create(
+                    engagement=engagement,
+                    author=request.user,
+                    content=content,
+                    parent=parent
+                )
+                engagement = Engagement.objects.adjust_counts(photo.id, comments=1)
+            gallery_cache.bump(photo.event_id)
             
             serializer = CommentSerializer(comment)
             
@@ -132,7 +302,7 @@ class PhotoViewSet(viewsets.ModelViewSet):
                             "type": "new_comment",
                             "photo_id": photo.id,
                             "comment": serializer.data,
-                            "comments_count": engagement.comments.count()
+                            "comments_count": engagement.comments_count
                         }
                     }
                 )
@@ -164,8 +334,19 @@ class PhotoViewSet(viewsets.ModelViewSet):
             return Response({'message': 'User already tagged'}, status=status.HTTP_200_OK)
         
         TaggedIn.objects.create(photo=photo, user=user, tagged_by=request.user)
+        autocomplete.record_user(user, delta=1)
+        gallery_cache.bump(photo.event_id)
         return Response({'message': f'User {user.username} tagged successfully'}, status=status.HTTP_201_CREATED)
 
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def download(self, request, pk=None):
+        """Download the original photo; the transfer itself is handed off per PHOTO_MEDIA_SERVING."""
+        photo = self.get_object()
+        if not photo.original_image:
+            return Response({'error': 'Photo file not found'}, status=status.HTTP_404_NOT_FOUND)
+        name = photo.original_image.name
+        return send_file(request, name, download_name=os.path.basename(name))
+
     @action(detail=True, methods=['get'])
     def tagged_users(self, request, pk=None):
         """Get all users tagged in a photo."""
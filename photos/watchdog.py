@@ -0,0 +1,116 @@
+"""
+Worker-side memory watchdog for image processing tasks.
+
+Samples RSS around every photo task and records the peak per image size
+bucket. Recycling itself is done by Celery (`worker_max_memory_per_child`),
+which replaces a pool child only after its current task has finished, so the
+in-flight photo is never lost. Late acks make sure a task whose child is
+OOM-killed anyway is redelivered instead of dropped.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from PIL import Image
+
+from .metrics import incr_counter, record_memory_sample
+
+WATCHED_TASKS = {'photos.tasks.process_photo_task', 'photos.tasks.complete_deferred_photo_task'}
+
+# Megapixel upper bounds for the size buckets peak memory is recorded under
+SIZE_BUCKETS = ((4, '0-4MP'), (12, '4-12MP'), (24, '12-24MP'), (50, '24-50MP'))
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_samples = {}
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'))
+    _malloc_trim = _libc.malloc_trim
+except (OSError, AttributeError, TypeError):
+    _malloc_trim = None
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux - fall back to the lifetime peak
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    if resource is None:
+        return 0
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def size_bucket(path):
+    try:
+        with Image.open(path) as img:
+            megapixels = img.width * img.height / 1_000_000
+    except Exception:
+        return 'unknown'
+    for limit, label in SIZE_BUCKETS:
+        if megapixels < limit:
+            return label
+    return f'{SIZE_BUCKETS[-1][0]}MP+'
+
+
+def recycle_due():
+    """
+    Whether Celery will replace this pool child once its task returns. It
+    compares the lifetime peak (ru_maxrss, KiB) with worker_max_memory_per_child,
+    so trimming the heap afterwards does not prevent it.
+    """
+    limit = settings.CELERY_WORKER_MAX_MEMORY_PER_CHILD
+    return bool(limit) and peak_rss_mb() * 1024 > limit
+
+
+def release_memory():
+    """Return freed heap pages to the OS; PIL/torch leave glibc arenas fragmented."""
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+
+@task_prerun.connect
+def sample_before(task_id=None, task=None, **kwargs):
+    if task is None or task.name not in WATCHED_TASKS:
+        return
+    _samples[task_id] = (current_rss_mb(), peak_rss_mb())
+
+
+@task_postrun.connect
+def sample_after(task_id=None, task=None, args=None, **kwargs):
+    before = _samples.pop(task_id, None)
+    if before is None:
+        return
+    rss_before, peak_before = before
+    rss_after, peak_after = current_rss_mb(), peak_rss_mb()
+
+    # The lifetime peak only moves if this task set a new high-water mark
+    task_peak = peak_after if peak_after > peak_before else max(rss_before, rss_after)
+
+    path = None
+    if task.name == 'photos.tasks.process_photo_task' and args and len(args) > 1:
+        path = args[1]
+    record_memory_sample(size_bucket(path) if path else 'unknown', task_peak, rss_after - rss_before)
+
+    if rss_after >= settings.PHOTO_WORKER_TRIM_RSS_MB:
+        release_memory()
+    if recycle_due():
+        # Celery will replace this child before it takes another task
+        incr_counter('worker_recycles')
+        print(f"Worker {os.getpid()} peak RSS {peak_after:.0f}MB over ceiling, recycling")
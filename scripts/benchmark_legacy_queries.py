@@ -0,0 +1,123 @@
+"""
+Check that legacy photo list pages cost one SQL statement, and time them.
+
+Usage (against a scratch database, from the project root):
+    DATABASE_URL=postgresql://.../scratch python scripts/benchmark_legacy_queries.py --seed 100000
+    DATABASE_URL=postgresql://.../scratch python scripts/benchmark_legacy_queries.py
+
+--seed inserts that many synthetic photos with engagement rows, a like and a
+tag by the seed user on every third photo, and analyzes the tables. Then,
+for page sizes up to 1000, the script loads the /photos list (every field)
+and the /me/library page through crud, counts the statements sent to the
+database and fails (exit 1) if a page takes more than one.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "legacy_fastapi"))
+
+from sqlalchemy import event, text  # noqa: E402
+
+from app.core.database import SessionLocal, engine  # noqa: E402
+from app.crud.engagement import get_user_library  # noqa: E402
+from app.crud.photo import search_photos  # noqa: E402
+from app.schemas.photo import PhotoFilterParams  # noqa: E402
+
+SEED_EMAIL = "list-queries-seed@example.com"
+LIMITS = (10, 100, 500, 1000)
+
+
+def seed(db, count):
+    db.execute(
+        text(
+            "INSERT INTO users (email, password, role, is_verified) VALUES (:email, '!', 'Member', false) "
+            "ON CONFLICT (email) DO NOTHING"
+        ),
+        {"email": SEED_EMAIL},
+    )
+    user_id = db.execute(text("SELECT id FROM users WHERE email = :email"), {"email": SEED_EMAIL}).scalar()
+    db.execute(
+        text(
+            "INSERT INTO photos (original_path, uploader_id, processing_status, created_at) "
+            "SELECT 'media/originals/seed_' || g || '.jpg', :user_id, 'completed', now() - g * interval '1 second' "
+            "FROM generate_series(1, :count) AS g"
+        ),
+        {"user_id": user_id, "count": count},
+    )
+    db.execute(
+        text(
+            "INSERT INTO engagements (photo_id, likes_count, comments_count) "
+            "SELECT id, (id % 3 = 0)::int, id % 5 FROM photos WHERE uploader_id = :user_id "
+            "ON CONFLICT (photo_id) DO NOTHING"
+        ),
+        {"user_id": user_id},
+    )
+    for table in ("likes", "tagged_in"):
+        db.execute(
+            text(
+                f"INSERT INTO {table} (photo_id, user_id, created_at) "
+                "SELECT id, :user_id, now() FROM photos WHERE uploader_id = :user_id AND id % 3 = 0"
+            ),
+            {"user_id": user_id},
+        )
+    db.commit()
+    for table in ("photos", "engagements", "likes", "tagged_in"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+
+
+def measure(load, runs):
+    """(statements per call, median ms) of `load()`."""
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    load()  # warm up
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for _ in range(runs):
+            statements.clear()
+            start = time.perf_counter()
+            load()
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return len(statements), statistics.median(timings)
+
+
+def main(args):
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed(db, args.seed)
+        user_id = db.execute(text("SELECT id FROM users WHERE email = :email"), {"email": SEED_EMAIL}).scalar()
+        print(f"{'page':<22} {'statements':>10} {'median ms':>10}")
+
+        failed = False
+        for limit in LIMITS:
+            cases = {
+                f"/photos, {limit}": lambda: search_photos(db, PhotoFilterParams(limit=limit), user_id),
+                f"/me/library, {limit}": lambda: get_user_library(db, user_id, limit=limit),
+            }
+            for name, load in cases.items():
+                statements, median = measure(load, args.runs)
+                ok = statements == 1
+                failed |= not ok
+                print(f"{name:<22} {statements:>10} {median:>10.1f}{'' if ok else '  FAIL'}")
+                # Fresh identity map, so the next run rebuilds its objects
+                db.expunge_all()
+    finally:
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic photos to insert first")
+    parser.add_argument("--runs", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,61 @@
+"""
+Media download throughput for each delivery mode.
+
+Usage:
+    python scripts/benchmark_media.py URL [URL ...] [--concurrency 8] [--seconds 10] [--range 0-65535]
+
+Pass one URL per setup to compare, for example the same file through nginx
+directly, through Django with PHOTO_MEDIA_SERVING='x-accel', and through
+Django with 'python' under gunicorn (os.sendfile) and under daphne. Each URL
+is downloaded by `concurrency` threads for `seconds`; --range requests a
+byte range instead of the whole file.
+"""
+import argparse
+import threading
+import time
+import urllib.request
+
+
+def worker(url, byte_range, deadline, totals, lock):
+    count = size = 0
+    while time.monotonic() < deadline:
+        request = urllib.request.Request(url)
+        if byte_range:
+            request.add_header("Range", f"bytes={byte_range}")
+        with urllib.request.urlopen(request) as response:
+            while chunk := response.read(1 << 20):
+                size += len(chunk)
+        count += 1
+    with lock:
+        totals["requests"] += count
+        totals["bytes"] += size
+
+
+def benchmark(url, concurrency, seconds, byte_range):
+    totals, lock = {"requests": 0, "bytes": 0}, threading.Lock()
+    deadline = time.monotonic() + seconds
+    threads = [
+        threading.Thread(target=worker, args=(url, byte_range, deadline, totals, lock))
+        for _ in range(concurrency)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    return totals["requests"] / elapsed, totals["bytes"] / elapsed / (1 << 20)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--range", dest="byte_range", help="e.g. 0-65535")
+    args = parser.parse_args()
+
+    print(f"{'req/s':>8} {'MiB/s':>9}  url")
+    for url in args.urls:
+        rate, throughput = benchmark(url, args.concurrency, args.seconds, args.byte_range)
+        print(f"{rate:>8.1f} {throughput:>9.1f}  {url}")
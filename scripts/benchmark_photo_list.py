@@ -0,0 +1,64 @@
+"""
+Payload size and latency of the photo list under different field selections.
+
+Usage:
+    python scripts/benchmark_photo_list.py http://localhost:8000/api/v1/photos/ [--stack legacy] [--token TOKEN]
+
+Works against both the Django and the legacy FastAPI list endpoint. Compare
+the compact default with the full projection to see what `?fields=` and
+`?expand=` save on a page of photos.
+"""
+import argparse
+import statistics
+import time
+import urllib.parse
+import urllib.request
+
+CASES = {
+    "django": {
+        "compact default": {},
+        "grid only": {"fields": "thumbnail_image"},
+        "full (expanded)": {"expand": "original_image,uploader,tagged_users,exif_data,ai_tags,manual_tags"},
+    },
+    "legacy": {
+        "compact default": {},
+        "grid only": {"fields": "thumbnail_path"},
+        "full (expanded)": {"expand": "original_path,uploader_id,tagged_users,exif_data,ai_tags,manual_tags"},
+    },
+}
+
+
+def fetch(url, token):
+    request = urllib.request.Request(url, headers={"Accept-Encoding": "identity"})
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        body = response.read()
+    return time.perf_counter() - start, len(body)
+
+
+def benchmark(base_url, stack, token, runs, limit):
+    print(f"{'case':<18} {'bytes':>10} {'median ms':>10} {'p95 ms':>8}")
+    for name, params in CASES[stack].items():
+        query = urllib.parse.urlencode({"limit": limit, **params})
+        url = f"{base_url}?{query}"
+        fetch(url, token)  # warm up caches and connections
+        timings, size = [], 0
+        for _ in range(runs):
+            elapsed, size = fetch(url, token)
+            timings.append(elapsed * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<18} {size:>10} {statistics.median(timings):>10.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("url", help="Photo list endpoint URL")
+    parser.add_argument("--stack", choices=CASES, default="django")
+    parser.add_argument("--token", help="Bearer token, if the endpoint needs one")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    benchmark(args.url, args.stack, args.token, args.runs, args.limit)
@@ -0,0 +1,94 @@
+"""
+Renders/sec for a 100-photo list page, DRF vs the compiled path.
+
+Usage (from the project root, no database needed):
+    python scripts/benchmark_photo_render.py [--photos 100] [--seconds 3]
+
+Times serialization plus JSON encoding of an in-memory page with EXIF and
+tag blobs, for each combination of PhotoSerializer / compile_photo_renderer
+and DRF's JSONRenderer / ORJSONRenderer, at the compact list projection and
+with the heavy fields expanded.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from config.renderers import ORJSONRenderer  # noqa: E402
+from photos.models import Photo  # noqa: E402
+from photos.serializers import PhotoSerializer, compile_photo_renderer  # noqa: E402
+
+EXPANDED_FIELDS = PhotoSerializer.LIST_FIELDS + ('original_image', 'exif_data', 'ai_tags', 'manual_tags', 'processed_at')
+
+
+def make_page(count):
+    now = timezone.now()
+    page = []
+    for i in range(count):
+        photo = Photo(
+            id=i + 1,
+            original_image=f'photos/originals/IMG_{i:04d}.jpg',
+            thumbnail_image=f'photos/thumbnails/thumb_IMG_{i:04d}.jpg',
+            watermarked_image=f'photos/watermarked/watermarked_IMG_{i:04d}.jpg',
+            width=6000, height=4000, event_id=1, uploader_id=1,
+            processing_status='completed', created_at=now - timedelta(minutes=i), processed_at=now,
+            exif_data={'Make': 'Canon', 'Model': 'EOS R5', 'ExposureTime': '1/250', 'FNumber': '2.8',
+                       'ISOSpeedRatings': '800', 'FocalLength': '50.0', 'DateTimeOriginal': '2026:10:19 18:00:00',
+                       'LensModel': 'RF50mm F1.2 L USM', 'Software': 'Firmware 1.8.1'},
+            ai_tags=['stage', 'concert', 'spotlight', 'crowd', 'microphone'],
+            manual_tags=['fest', 'night'],
+        )
+        photo.likes_total, photo.liked_by_user, photo.comments_total = 120 + i, i % 2 == 0, 7
+        page.append(photo)
+    return page
+
+
+def rate(fn, seconds):
+    fn()  # warm up
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        runs += 1
+    return runs / (time.perf_counter() - start)
+
+
+def main(count, seconds):
+    page = make_page(count)
+    request = APIRequestFactory().get('/api/v1/photos/')
+    context = {'request': request}
+
+    print(f"{count} photos/page, renders/sec (serialize + encode)")
+    print(f"{'fields':<10} {'serializer':<22} {'json':>10} {'orjson':>10} {'bytes':>8}")
+    for label, fields in (('compact', PhotoSerializer.LIST_FIELDS), ('expanded', EXPANDED_FIELDS)):
+        compiled = compile_photo_renderer(fields)
+        serializers = {
+            'PhotoSerializer': lambda: PhotoSerializer(page, many=True, fields=fields, context=context).data,
+            'compiled': lambda: compiled(page, request),
+        }
+        for name, serialize in serializers.items():
+            rates = [
+                rate(lambda: renderer.render(serialize()), seconds)
+                for renderer in (JSONRenderer(), ORJSONRenderer())
+            ]
+            size = len(ORJSONRenderer().render(serialize()))
+            print(f"{label:<10} {name:<22} {rates[0]:>10.1f} {rates[1]:>10.1f} {size:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--photos', type=int, default=100)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+    main(args.photos, args.seconds)
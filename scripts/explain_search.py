@@ -0,0 +1,138 @@
+"""
+Check that /search is served by its GIN indexes and stays within budget.
+
+Usage (against a scratch database, from the project root):
+    python scripts/explain_search.py --seed 500000
+    python scripts/explain_search.py [--budget-ms 50] [--verbose]
+
+--seed inserts that many synthetic photos tagged from a small vocabulary,
+plus one event and one comment per 100 photos, and analyzes the tables.
+Then, for a common word, a rare word, a typo and a phrase, the script runs
+EXPLAIN ANALYZE on each of the search view's three queries and fails
+(exit 1) if a plan seq-scans a searched table or a search takes longer than
+the budget in total.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from config.search import ranked  # noqa: E402
+from events.models import Event  # noqa: E402
+from photos.models import Photo  # noqa: E402
+from social.models import Comment  # noqa: E402
+
+SEED_USERNAME = 'search-seed'
+WORDS = [
+    'concert', 'crowd', 'stage', 'guitar', 'drums', 'lights', 'dance', 'portrait', 'sunset', 'beach',
+    'wedding', 'cake', 'flowers', 'speech', 'award', 'balloons', 'football', 'runner', 'finish', 'medal',
+]
+CASES = {
+    'common word': 'crowd',
+    'rare word': 'trophy',
+    'typo': 'guitr',
+    'phrase': '"stage lights"',
+}
+SEARCHED_TABLES = {'photos_photo', 'events_event', 'social_comment'}
+
+
+def seed(count):
+    # Literal % is doubled in queries that take parameters
+    words = 'ARRAY[%s]' % ', '.join(f"'{word}'" for word in WORDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO users_customuser (username, email, password, role, is_verified, is_superuser, is_staff, "
+            "is_active, first_name, last_name, date_joined) "
+            "VALUES (%s, %s, '!', 'member', false, false, false, true, '', '', now()) "
+            "ON CONFLICT (username) DO NOTHING",
+            [SEED_USERNAME, f'{SEED_USERNAME}@example.com'],
+        )
+        cursor.execute(
+            "INSERT INTO events_event (name, slug, date, location, description) "
+            f"SELECT initcap({words}[1 + g %% 20]) || ' night ' || g, 'search-seed-' || g, current_date - g, "
+            f"'Hall ' || g, 'Photos from the ' || {words}[1 + g * 7 %% 20] "
+            "FROM generate_series(1, %s) AS g",
+            [max(count // 100, 1)],
+        )
+        cursor.execute(
+            "INSERT INTO photos_photo (original_image, uploader_id, processing_status, priority_class, "
+            "deferred_steps, created_at, ai_tags, manual_tags) "
+            "SELECT 'photos/originals/seed_' || g || '.jpg', (SELECT id FROM users_customuser WHERE username = %s), "
+            "'completed', 'archive', '[]', now() - g * interval '1 second', "
+            f"to_jsonb(ARRAY[{words}[1 + g %% 20], {words}[1 + g * 7 %% 20], {words}[1 + g * 13 %% 20]]), "
+            "CASE WHEN g %% 50 = 0 THEN '[\"trophy\"]'::jsonb END "
+            "FROM generate_series(1, %s) AS g",
+            [SEED_USERNAME, count],
+        )
+        cursor.execute(
+            "INSERT INTO social_engagement (photo_id, likes_count, comments_count) "
+            "SELECT id, 0, 1 FROM photos_photo WHERE id %% 100 = 0 "
+            "AND uploader_id = (SELECT id FROM users_customuser WHERE username = %s) "
+            "ON CONFLICT (photo_id) DO NOTHING",
+            [SEED_USERNAME],
+        )
+        cursor.execute(
+            "INSERT INTO social_comment (engagement_id, author_id, content, created_at) "
+            f"SELECT e.id, p.uploader_id, 'Love the ' || {words}[1 + p.id %% 20] || ' here', now() "
+            "FROM social_engagement e JOIN photos_photo p ON p.id = e.photo_id "
+            "WHERE p.uploader_id = (SELECT id FROM users_customuser WHERE username = %s)",
+            [SEED_USERNAME],
+        )
+        for table in SEARCHED_TABLES:
+            cursor.execute(f'ANALYZE {table}')
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(queryset):
+    plan = json.loads(queryset.explain(format='json', analyze=True))[0]
+    return plan, list(plan_nodes(plan['Plan']))
+
+
+def main(args):
+    if args.seed:
+        seed(args.seed)
+    print(f'{Photo.objects.count()} photos, {Event.objects.count()} events, {Comment.objects.count()} comments')
+    print(f"{'case':<14} {'photos':>8} {'events':>8} {'comments':>8} {'total':>8}  seq scans")
+
+    failed = False
+    for name, q in CASES.items():
+        querysets = (
+            ranked(Photo.objects.all(), q, 'search_text', ('-created_at', '-id')),
+            ranked(Event.objects.all(), q, 'name', ('-date', '-id')),
+            ranked(Comment.objects.all(), q, 'content', ('-created_at', '-id')),
+        )
+        timings, seq_scans = [], set()
+        for queryset in querysets:
+            plan, nodes = explain(queryset[:args.limit])
+            timings.append(plan['Execution Time'])
+            seq_scans |= {node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan'} & SEARCHED_TABLES
+            if args.verbose:
+                print(json.dumps(plan['Plan'], indent=2))
+        ok = not seq_scans and sum(timings) <= args.budget_ms
+        failed |= not ok
+        print(f"{name:<14} {timings[0]:>8.2f} {timings[1]:>8.2f} {timings[2]:>8.2f} {sum(timings):>8.2f}  "
+              f"{', '.join(sorted(seq_scans)) or '-'}{'' if ok else '  FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic photos to insert first')
+    parser.add_argument('--limit', type=int, default=20, help='Results per kind')
+    parser.add_argument('--budget-ms', type=float, default=50.0, help='Total execution time allowed per search')
+    parser.add_argument('--verbose', action='store_true', help='Print each plan')
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+"""
+Check that legacy tag search is served by ix_photo_tags_tag at scale.
+
+Usage (against a scratch database, from the project root):
+    DATABASE_URL=postgresql://.../scratch python scripts/explain_tag_search.py --seed 1000000
+    DATABASE_URL=postgresql://.../scratch python scripts/explain_tag_search.py
+
+--seed inserts that many synthetic photos with five tags each (from a
+1,000-tag vocabulary) and analyzes the tables. Then, for exact, prefix, any
+and all-of searches built by crud.photo.build_search_query, the script runs
+EXPLAIN ANALYZE and fails (exit 1) if a plan does not use ix_photo_tags_tag or
+falls back to a sequential scan.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "legacy_fastapi"))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.dialects import postgresql  # noqa: E402
+
+from app.core.database import SessionLocal  # noqa: E402
+from app.crud.photo import build_search_query  # noqa: E402
+from app.schemas.photo import PhotoFilterParams  # noqa: E402
+
+SEED_EMAIL = "tag-search-seed@example.com"
+
+CASES = {
+    "exact, one tag": {"tags": ["tag_0042"]},
+    "exact, any of three": {"tags": ["tag_0042", "tag_0007", "tag_0999"]},
+    "exact, all of two": {"tags": ["tag_0042", "tag_0043"], "tag_match": "all"},
+    "prefix": {"tags": ["tag_004"], "tag_prefix": True},
+    "prefix, all of two": {"tags": ["tag_004", "tag_01"], "tag_prefix": True, "tag_match": "all"},
+}
+
+
+def seed(db, count):
+    db.execute(
+        text(
+            "INSERT INTO users (email, password, role, is_verified) VALUES (:email, '!', 'Member', false) "
+            "ON CONFLICT (email) DO NOTHING"
+        ),
+        {"email": SEED_EMAIL},
+    )
+    db.execute(
+        text(
+            "INSERT INTO photos (original_path, uploader_id, processing_status, created_at) "
+            "SELECT 'media/originals/seed_' || g || '.jpg', (SELECT id FROM users WHERE email = :email), "
+            "'completed', now() - g * interval '1 second' FROM generate_series(1, :count) AS g"
+        ),
+        {"email": SEED_EMAIL, "count": count},
+    )
+    db.execute(
+        text(
+            "INSERT INTO photo_tags (photo_id, tag) "
+            "SELECT DISTINCT photos.id, 'tag_' || lpad(((photos.id * 7919 + k * 104729) % 1000)::text, 4, '0') "
+            "FROM photos CROSS JOIN generate_series(1, 5) AS k "
+            "WHERE photos.uploader_id = (SELECT id FROM users WHERE email = :email) "
+            "ON CONFLICT DO NOTHING"
+        ),
+        {"email": SEED_EMAIL},
+    )
+    db.commit()
+    db.execute(text("ANALYZE photos"))
+    db.execute(text("ANALYZE photo_tags"))
+    db.commit()
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(db, filters):
+    query = build_search_query(filters)
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    result = db.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()
+    plan = (json.loads(result) if isinstance(result, str) else result)[0]
+    return plan, list(plan_nodes(plan["Plan"]))
+
+
+def main(args):
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed(db, args.seed)
+        photos = db.execute(text("SELECT count(*) FROM photos")).scalar()
+        print(f"{photos} photos")
+        print(f"{'case':<24} {'ms':>8}  index used / seq scans")
+
+        failed = False
+        for name, params in CASES.items():
+            plan, nodes = explain(db, PhotoFilterParams(limit=100, **params))
+            uses_index = any(node.get("Index Name") == "ix_photo_tags_tag" for node in nodes)
+            seq_scans = sorted({node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"})
+            ok = uses_index and not seq_scans
+            failed |= not ok
+            print(f"{name:<24} {plan['Execution Time']:>8.2f}  {uses_index} / {', '.join(seq_scans) or '-'}"
+                  f"{'' if ok else '  FAIL'}")
+            if args.verbose:
+                print(json.dumps(plan["Plan"], indent=2))
+    finally:
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic photos to insert first")
+    parser.add_argument("--verbose", action="store_true", help="Print each plan")
+    main(parser.parse_args())
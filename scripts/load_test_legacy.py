@@ -0,0 +1,109 @@
+"""
+Requests/sec and tail latency of the legacy read endpoints under concurrency.
+
+Usage:
+    python scripts/load_test_legacy.py async=http://localhost:8000 [sync=http://localhost:8001] \
+        [--clients 500] [--duration 30] [--token TOKEN]
+
+Each NAME=URL is a running legacy server; give two to compare, e.g. this
+build and the sync build before it (`git worktree add ../sync <revision>`
+and start it on another port against the same database). Every client
+keeps one connection open and requests the hot read paths in turn for
+--duration seconds. Only the standard library is used, so the client side
+runs as one asyncio loop.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import urllib.parse
+
+PATHS = ("/api/v1/photos/?limit=100", "/api/v1/events/")
+AUTHENTICATED_PATHS = ("/api/v1/me/library?limit=100",)
+
+
+async def request(reader, writer, host, path, token):
+    """Send one keep-alive GET and read the response; returns the status code."""
+    headers = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: identity\r\n"
+    if token:
+        headers += f"Authorization: Bearer {token}\r\n"
+    writer.write((headers + "\r\n").encode())
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    fields = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        fields[name.strip().lower()] = value.strip()
+    if "content-length" in fields:
+        await reader.readexactly(int(fields["content-length"]))
+    elif fields.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status
+
+
+async def client(url, token, deadline, latencies, errors):
+    parts = urllib.parse.urlsplit(url)
+    port = parts.port or 80
+    paths = PATHS + AUTHENTICATED_PATHS if token else PATHS
+    reader, writer = await asyncio.open_connection(parts.hostname, port)
+    try:
+        i = 0
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status = await request(reader, writer, parts.netloc, path, token)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                errors.append(path)
+                writer.close()
+                reader, writer = await asyncio.open_connection(parts.hostname, port)
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors.append(path)
+    finally:
+        writer.close()
+
+
+async def run(url, clients, duration, token):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(url, token, deadline, latencies, errors) for _ in range(clients)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main(args):
+    print(f"{'setup':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for target in args.targets:
+        name, _, url = target.partition("=") if not target.startswith("http") else ("", "", target)
+        latencies, errors, elapsed = asyncio.run(run(url, args.clients, args.duration, args.token))
+        latencies.sort()
+        if not latencies:
+            print(f"{name or url:<8} no successful requests ({len(errors)} errors)")
+            continue
+        print(
+            f"{name or url:<8} {len(latencies) / elapsed:>8.0f} {statistics.median(latencies):>8.1f} "
+            f"{percentile(latencies, 0.95):>8.1f} {percentile(latencies, 0.99):>8.1f} {len(errors):>7}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("targets", nargs="+", help="NAME=URL of a legacy server, e.g. async=http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=500, help="Concurrent connections")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per setup")
+    parser.add_argument("--token", help="Bearer token; /me/library is only requested with one")
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+Bytes transferred by a replayed mobile session, with and without HTTP caching.
+
+Usage:
+    python scripts/replay_mobile_session.py http://localhost:8000 --event 1 [--token TOKEN] [--refreshes 5]
+    python scripts/replay_mobile_session.py http://localhost:8000 --session session.json
+
+Replays what the app does when a guest opens an event gallery and pulls to
+refresh: the event, the photo list, every thumbnail on the page, and one
+photo's detail and comments. A recorded session (a JSON list of API paths
+such as "/api/v1/photos/?event=1") can be given instead; thumbnails on any
+photo list in it are fetched too.
+
+The "naive" client asks for identity encoding and refetches everything. The
+"caching" client sends Accept-Encoding: gzip, revalidates JSON with
+If-None-Match, and does not refetch media marked immutable.
+"""
+import argparse
+import gzip
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class Client:
+    def __init__(self, base_url, token, caching):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.caching = caching
+        self.etags = {}
+        self.bodies = {}
+        self.immutable = set()
+        self.bytes = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.skipped = 0
+
+    def get(self, path):
+        url = urllib.parse.urljoin(self.base_url + "/", path)
+        if url in self.immutable:
+            self.skipped += 1
+            return self.bodies[url]
+
+        request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip" if self.caching else "identity"})
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        if self.caching and url in self.etags:
+            request.add_header("If-None-Match", self.etags[url])
+
+        self.requests += 1
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            self.not_modified += 1
+            return self.bodies[url]
+
+        self.bytes += len(body)
+        if headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if self.caching:
+            self.bodies[url] = body
+            if headers.get("ETag"):
+                self.etags[url] = headers["ETag"]
+            if "immutable" in headers.get("Cache-Control", ""):
+                self.immutable.add(url)
+        return body
+
+
+def default_session(event_id):
+    return [
+        f"/api/v1/events/{event_id}/",
+        f"/api/v1/photos/?event={event_id}",
+        "{first_photo}/",
+        "{first_photo}/comments/",
+    ]
+
+
+def replay(client, session):
+    first_photo = None
+    for path in session:
+        if "{first_photo}" in path:
+            if first_photo is None:
+                continue
+            path = path.format(first_photo=f"/api/v1/photos/{first_photo}")
+        body = client.get(path)
+        if "/photos/?" not in path and not path.rstrip("/").endswith("/photos"):
+            continue
+        data = json.loads(body)
+        results = data.get("results", []) if isinstance(data, dict) else data
+        for photo in results:
+            if photo.get("thumbnail_image"):
+                client.get(photo["thumbnail_image"])
+        if results and first_photo is None:
+            first_photo = results[0]["id"]
+
+
+def main(args):
+    if args.session:
+        with open(args.session) as f:
+            session = json.load(f)
+    else:
+        session = default_session(args.event)
+
+    print(f"{'client':<10} {'requests':>9} {'304':>6} {'skipped':>8} {'bytes':>12}")
+    totals = {}
+    for name, caching in (("naive", False), ("caching", True)):
+        client = Client(args.base_url, args.token, caching)
+        for _ in range(args.refreshes + 1):
+            replay(client, session)
+        totals[name] = client.bytes
+        print(f"{name:<10} {client.requests:>9} {client.not_modified:>6} {client.skipped:>8} {client.bytes:>12}")
+
+    if totals["naive"]:
+        saved = 1 - totals["caching"] / totals["naive"]
+        print(f"bandwidth saved: {saved:.1%} over {args.refreshes} refreshes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base_url", help="Server root, e.g. http://localhost:8000")
+    parser.add_argument("--event", type=int, default=1, help="Event id for the built-in session")
+    parser.add_argument("--session", help="JSON list of paths to replay instead of the built-in session")
+    parser.add_argument("--token", help="Bearer token, if the endpoints need one")
+    parser.add_argument("--refreshes", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,280 @@
+"""
+Redis-backed like state with write-behind persistence.
+
+Toggles and `is_liked` checks for a photo hit a Redis set of user ids plus a
+counter instead of the Engagement row, so a viral photo does not serialize
+every tap on one Postgres row. Each toggle also records the user's latest
+state in a per-photo pending hash and marks the photo dirty;
+`social.tasks.flush_likes_task` drains those in batches into Like rows and
+Engagement.likes_count.
+
+Redis is a cache of the database plus unflushed changes: a photo's set is
+(re)built from the Like table the first time it is touched after a restart or
+eviction, with any pending changes replayed on top.
+"""
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from photos.metrics import get_redis
+from photos.models import Photo
+from users.models import CustomUser
+from .models import Engagement, Like
+
+DIRTY_KEY = 'likes:dirty'
+
+
+def _keys(photo_id):
+    # The hash tag keeps a photo's keys in one slot should Redis be clustered
+    prefix = f'likes:{{{photo_id}}}'
+    return {
+        'users': f'{prefix}:users',
+        'count': f'{prefix}:count',
+        'flushing': f'{prefix}:flushing',
+        'pending': f'{prefix}:pending',
+        # Bumped by every finished flush
+        'generation': f'{prefix}:generation',
+    }
+
+
+# Rebuilds the set from a DB snapshot unless a flush finished since the
+# snapshot's generation was read: that flush's changes may be missing from
+# the snapshot and are no longer in the flushing hash, so the caller retries.
+# KEYS: users, count, flushing, pending, generation
+# ARGV: ttl, generation, *user ids from the DB
+_LOAD = """
+if redis.call('EXISTS', KEYS[2]) == 1 then return 0 end
+if (redis.call('GET', KEYS[5]) or '') ~= ARGV[2] then return -1 end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV do redis.call('SADD', KEYS[1], ARGV[i]) end
+for k = 3, 4 do
+    local ops = redis.call('HGETALL', KEYS[k])
+    for i = 1, #ops, 2 do
+        if ops[i + 1] == '1' then
+            redis.call('SADD', KEYS[1], ops[i])
+        else
+            redis.call('SREM', KEYS[1], ops[i])
+        end
+    end
+end
+redis.call('SET', KEYS[2], redis.call('SCARD', KEYS[1]), 'EX', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: users, count, pending, dirty  ARGV: user id, photo id, ttl
+_TOGGLE = """
+local count = redis.call('GET', KEYS[2])
+if not count or (tonumber(count) > 0 and redis.call('EXISTS', KEYS[1]) == 0) then
+    return -1
+end
+local liked = 1
+if redis.call('SREM', KEYS[1], ARGV[1]) == 1 then
+    liked = 0
+else
+    redis.call('SADD', KEYS[1], ARGV[1])
+end
+count = redis.call('INCRBY', KEYS[2], liked == 1 and 1 or -1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('HSET', KEYS[3], ARGV[1], liked)
+redis.call('SADD', KEYS[4], ARGV[2])
+return {liked, count}
+"""
+
+# Moves pending changes into the flushing hash, newer states winning over
+# ones left behind by a failed flush. KEYS: pending, flushing
+_DRAIN = """
+local ops = redis.call('HGETALL', KEYS[1])
+for i = 1, #ops, 2 do redis.call('HSET', KEYS[2], ops[i], ops[i + 1]) end
+redis.call('DEL', KEYS[1])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+
+def _liked_user_ids(photo_id):
+    return list(Like.objects.filter(photo_id=photo_id).values_list('user_id', flat=True))
+
+
+def _load(client, photo_id):
+    keys = _keys(photo_id)
+    for _ in range(3):
+        generation = client.get(keys['generation']) or ''
+        user_ids = _liked_user_ids(photo_id)
+        loaded = client.eval(
+            _LOAD, 5, keys['users'], keys['count'], keys['flushing'], keys['pending'], keys['generation'],
+            settings.PHOTO_LIKES_CACHE_TTL, generation, *user_ids,
+        )
+        if loaded != -1:
+            return
+
+
+def toggle(photo_id, user_id):
+    """
+    Like or unlike `photo_id` for `user_id` in Redis. Returns `(liked, likes_count)`.
+
+    Raises redis.RedisError when Redis is unavailable.
+    """
+    client = get_redis()
+    keys = _keys(photo_id)
+    for _ in range(2):
+        result = client.eval(
+            _TOGGLE, 4, keys['users'], keys['count'], keys['pending'], DIRTY_KEY,
+            user_id, photo_id, settings.PHOTO_LIKES_CACHE_TTL,
+        )
+        if isinstance(result, list):
+            liked, count = result
+            return bool(liked), int(count)
+        _load(client, photo_id)
+    raise redis.RedisError(f'Like state for photo {photo_id} could not be loaded')
+
+
+def toggle_in_db(photo_id, user_id):
+    """Toggle directly in Postgres, used when Redis is unavailable."""
+    with transaction.atomic():
+        unliked, _ = Like.objects.filter(photo_id=photo_id, user_id=user_id).delete()
+        if not unliked:
+            Like.objects.create(photo_id=photo_id, user_id=user_id)
+        engagement = Engagement.objects.adjust_counts(photo_id, likes=-1 if unliked else 1)
+        transaction.on_commit(lambda: forget(photo_id))
+    return not unliked, engagement.likes_count
+
+
+def forget(photo_id):
+    """Drop the cached set after a direct DB write so it is rebuilt on next use."""
+    keys = _keys(photo_id)
+    try:
+        get_redis().delete(keys['users'], keys['count'])
+    except redis.RedisError as e:
+        print(f"Could not invalidate like cache for photo {photo_id}: {e}")
+
+
+def overlay_like_state(photos, user):
+    """
+    Replace `likes_total`/`liked_by_user` on `photos` with Redis state for photos
+    whose like set is cached, so unflushed toggles show up immediately.
+    """
+    if not photos:
+        return
+    authenticated = user is not None and user.is_authenticated
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for photo in photos:
+            keys = _keys(photo.id)
+            pipe.get(keys['count'])
+            if authenticated:
+                pipe.sismember(keys['users'], user.id)
+        results = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Could not read like state: {e}")
+        return
+
+    step = 2 if authenticated else 1
+    for photo, i in zip(photos, range(0, len(results), step)):
+        count = results[i]
+        if count is None:
+            continue
+        photo.likes_total = int(count)
+        if authenticated:
+            photo.liked_by_user = bool(results[i + 1])
+
+
+def liked_photo_ids(photo_ids, user):
+    """Ids among `photo_ids` that `user` likes, including toggles not yet flushed."""
+    if not photo_ids or user is None or not user.is_authenticated:
+        return set()
+    liked = set(Like.objects.filter(user=user, photo_id__in=photo_ids).values_list('photo_id', flat=True))
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for photo_id in photo_ids:
+            keys = _keys(photo_id)
+            pipe.exists(keys['count'])
+            pipe.sismember(keys['users'], user.id)
+        results = pipe.execute()
+    except redis.RedisError as e:
+        print(f"Could not read like state: {e}")
+        return liked
+
+    for photo_id, cached, member in zip(photo_ids, results[::2], results[1::2]):
+        if cached:
+            (liked.add if member else liked.discard)(photo_id)
+    return liked
+
+
+def drain_pending(max_photos):
+    """
+    Take up to `max_photos` dirty photos and return their unflushed changes
+    as `{photo_id: {user_id: liked}}`.
+
+    The changes stay in each photo's flushing hash until `finish_flush`, so
+    a rebuild during the flush still sees them.
+    """
+    client = get_redis()
+    photo_ids = client.spop(DIRTY_KEY, max_photos) or []
+    pending = {}
+    for photo_id in photo_ids:
+        keys = _keys(photo_id)
+        ops = client.eval(_DRAIN, 2, keys['pending'], keys['flushing'])
+        changes = {int(ops[i]): ops[i + 1] == '1' for i in range(0, len(ops), 2)}
+        if changes:
+            pending[int(photo_id)] = changes
+    return pending
+
+
+def finish_flush(photo_ids):
+    """Drop the flushed changes and invalidate DB snapshots read before the flush."""
+    pipe = get_redis().pipeline()
+    for photo_id in photo_ids:
+        keys = _keys(photo_id)
+        pipe.delete(keys['flushing'])
+        pipe.incr(keys['generation'])
+        pipe.expire(keys['generation'], settings.PHOTO_LIKES_CACHE_TTL)
+    pipe.execute()
+
+
+def retry_flush(photo_ids):
+    """Mark photos dirty again after a failed flush; their changes are still in Redis."""
+    get_redis().sadd(DIRTY_KEY, *photo_ids)
+
+
+def apply_like_changes(pending):
+    """
+    Persist `{photo_id: {user_id: liked}}` in one transaction.
+
+    Changes for photos or users deleted in the meantime are dropped. Like
+    rows are inserted and deleted in bulk and likes_count is recounted for
+    every touched photo.
+    """
+    photo_ids = set(pending)
+    user_ids = {user_id for changes in pending.values() for user_id in changes}
+    live_photos = set(Photo.objects.filter(id__in=photo_ids).values_list('id', flat=True))
+    live_users = set(CustomUser.objects.filter(id__in=user_ids).values_list('id', flat=True))
+
+    to_add = []
+    to_remove = Q()
+    for photo_id, changes in pending.items():
+        if photo_id not in live_photos:
+            continue
+        unliked = [user_id for user_id, liked in changes.items() if not liked]
+        if unliked:
+            to_remove |= Q(photo_id=photo_id, user_id__in=unliked)
+        to_add.extend(
+            Like(photo_id=photo_id, user_id=user_id)
+            for user_id, liked in changes.items() if liked and user_id in live_users
+        )
+
+    recount = Like.objects.filter(photo=OuterRef('photo')).order_by().values('photo').annotate(n=Count('*')).values('n')
+    with transaction.atomic():
+        if to_remove:
+            Like.objects.filter(to_remove).delete()
+        Like.objects.bulk_create(to_add, ignore_conflicts=True)
+        Engagement.objects.bulk_create(
+            [Engagement(photo_id=photo_id) for photo_id in live_photos],
+            ignore_conflicts=True,
+        )
+        Engagement.objects.filter(photo_id__in=live_photos).update(
+            likes_count=Coalesce(Subquery(recount), Value(0)),
+        )
+    return live_photos
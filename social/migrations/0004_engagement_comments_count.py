@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counts(apps, schema_editor):
+    Engagement = apps.get_model('social', 'Engagement')
+    Like = apps.get_model('social', 'Like')
+    Comment = apps.get_model('social', 'Comment')
+
+    likes = Like.objects.filter(photo=OuterRef('photo')).order_by().values('photo').annotate(n=Count('*')).values('n')
+    comments = Comment.objects.filter(engagement=OuterRef('pk')).order_by().values('engagement').annotate(n=Count('*')).values('n')
+    Engagement.objects.update(
+        likes_count=Coalesce(Subquery(likes), Value(0)),
+        comments_count=Coalesce(Subquery(comments), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0003_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='engagement',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_roots(apps, schema_editor):
+    Comment = apps.get_model('social', 'Comment')
+
+    # Direct replies first, then one level deeper per pass
+    Comment.objects.filter(parent__isnull=False, parent__parent__isnull=True).update(root=F('parent'))
+    parent_root = Comment.objects.filter(pk=OuterRef('parent')).values('root')
+    while Comment.objects.filter(root__isnull=True, parent__root__isnull=False).update(root=Subquery(parent_root)):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0005_comment_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='social.comment'),
+        ),
+        migrations.RunPython(backfill_roots, migrations.RunPython.noop),
+    ]
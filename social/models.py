@@ -1,12 +1,36 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from photos.models import Photo
 
+class EngagementManager(models.Manager):
+    def adjust_counts(self, photo_id, likes=0, comments=0):
+        """
+        Atomically add to a photo's like/comment counters, creating the row if needed.
+
+        Call inside the same transaction as the Like/Comment write so the
+        counters never disagree with the rows they count.
+        """
+        engagement, _ = self.get_or_create(photo_id=photo_id)
+        self.filter(pk=engagement.pk).update(
+            likes_count=F('likes_count') + likes,
+            comments_count=F('comments_count') + comments,
+        )
+        engagement.refresh_from_db(fields=['likes_count', 'comments_count'])
+        return engagement
+
+
 class Engagement(models.Model):
     photo = models.OneToOneField(Photo, on_delete=models.CASCADE, related_name='engagement')
+    # Denormalized counters, kept exact by EngagementManager.adjust_counts
     likes_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
     extra_metadata = models.JSONField(blank=True, null=True)
 
+    objects = EngagementManager()
+
     def __str__(self):
         return f"Engagement for Photo {self.photo.id}"
 
@@ -17,13 +41,36 @@ class Like(models.Model):
 
     class Meta:
         unique_together = ('photo', 'user')
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='like_feed_idx'),
+        ]
 
 class Comment(models.Model):
     engagement = models.ForeignKey(Engagement, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Top-level comment of the thread (null for top-level comments), so a
+    # page of threads loads its replies at every depth in one query
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_comments')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by Postgres for /search (config/search.py)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('content', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='comment_feed_idx'),
+            GinIndex(fields=['search_vector'], name='comment_search_idx'),
+            GinIndex(fields=['content'], opclasses=['gin_trgm_ops'], name='comment_content_trgm_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.root_id = (self.parent.root_id or self.parent_id) if self.parent_id else None
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Comment by {self.author.username}"
@@ -13,9 +13,39 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ('engagement', 'author')
 
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True).data
-        return []
+        # Threads assembled by attach_replies carry their children already
+        replies = getattr(obj, 'thread_replies', None)
+        if replies is None:
+            replies = obj.replies.select_related('author__profile')
+        return CommentSerializer(replies, many=True, context=self.context).data
+
+
+def attach_replies(top_level, replies):
+    """
+    Assemble comment threads in memory.
+
+    `top_level` are the thread roots and `replies` every reply that may belong
+    under them, at any depth. Each comment gets a `thread_replies` list
+    (oldest first) so CommentSerializer never queries for children.
+    """
+    children = {}
+    for reply in sorted(replies, key=lambda c: (c.created_at, c.id)):
+        children.setdefault(reply.parent_id, []).append(reply)
+
+    stack = list(top_level)
+    while stack:
+        comment = stack.pop()
+        comment.thread_replies = children.get(comment.id, [])
+        stack.extend(comment.thread_replies)
+    return top_level
+
+class CommentSearchResultSerializer(serializers.ModelSerializer):
+    photo = serializers.IntegerField(source='engagement.photo_id', read_only=True)
+    author = serializers.CharField(source='author.username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'photo', 'author', 'content', 'created_at')
 
 class LikeSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
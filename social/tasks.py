@@ -0,0 +1,78 @@
+import redis
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from events import cache as gallery_cache
+from photos.models import Photo
+from . import likes
+from .models import Comment, Engagement, Like
+
+
+def _count_subquery(queryset, field):
+    """Correlated COUNT(*) over `queryset` grouped by `field`, 0 when empty."""
+    counts = queryset.order_by().values(field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+@shared_task
+def reconcile_engagement_counters_task():
+    """
+    Correct any drift between Engagement counters and the Like/Comment rows.
+
+    The API keeps the counters exact transactionally, so this only repairs
+    rows changed outside it (admin, shell, bulk deletes). Returns the number
+    of engagements corrected.
+    """
+    # Photos liked before they ever had an engagement row
+    missing = Photo.objects.filter(engagement__isnull=True, likes__isnull=False).values_list('id', flat=True).distinct()
+    Engagement.objects.bulk_create(
+        [Engagement(photo_id=photo_id) for photo_id in missing],
+        ignore_conflicts=True,
+    )
+
+    actual_likes = _count_subquery(Like.objects.filter(photo=OuterRef('photo')), 'photo')
+    actual_comments = _count_subquery(Comment.objects.filter(engagement=OuterRef('pk')), 'engagement')
+    drifted = list(
+        Engagement.objects.alias(actual_likes=actual_likes, actual_comments=actual_comments)
+        .filter(~Q(likes_count=F('actual_likes')) | ~Q(comments_count=F('actual_comments')))
+        .values_list('pk', flat=True)
+    )
+    if drifted:
+        # Recount inside the UPDATE itself so writes since the scan are included
+        Engagement.objects.filter(pk__in=drifted).update(
+            likes_count=actual_likes,
+            comments_count=actual_comments,
+        )
+        print(f"Reconciled engagement counters for {len(drifted)} photos")
+        event_ids = Engagement.objects.filter(pk__in=drifted).values_list('photo__event_id', flat=True).distinct()
+        for event_id in event_ids:
+            gallery_cache.bump(event_id)
+    return len(drifted)
+
+
+@shared_task
+def flush_likes_task():
+    """
+    Write-behind flush of likes recorded in Redis.
+
+    Persists the latest state per (photo, user) for up to
+    PHOTO_LIKES_FLUSH_BATCH dirty photos. On failure the photos are marked
+    dirty again and the changes retried on the next run.
+    """
+    try:
+        pending = likes.drain_pending(settings.PHOTO_LIKES_FLUSH_BATCH)
+    except redis.RedisError as e:
+        print(f"Could not read pending likes: {e}")
+        return 0
+    if not pending:
+        return 0
+
+    try:
+        likes.apply_like_changes(pending)
+    except Exception as e:
+        print(f"Error flushing likes for {len(pending)} photos: {e}")
+        likes.retry_flush(list(pending))
+        raise
+    likes.finish_flush(list(pending))
+    return len(pending)
@@ -1,3 +1,179 @@
+from unittest import mock
+
+import redis
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from photos import views as photo_views
+from photos.metrics import get_redis
+from photos.models import Photo
+from users.models import CustomUser, Profile
+from . import likes
+from .models import Comment, Engagement, Like
+from .tasks import reconcile_engagement_counters_task
+
+
+class PhotoCommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='commenter', email='c@example.com', password='pw')
+        Profile.objects.create(user=cls.user)
+        cls.photo = Photo.objects.create(original_image='photos/originals/test.jpg', uploader=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/v1/photos/{self.photo.id}/comments/'
+
+    def _add_chain(self, engagement, depth):
+        parent = None
+        for i in range(depth):
+            parent = Comment.objects.create(engagement=engagement, author=self.user, content=f'{i}', parent=parent)
+
+    def _get_thread(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.data['results']
+
+    def test_get_does_not_create_engagement(self):
+        _, results = self._get_thread()
+
+        self.assertEqual(results, [])
+        self.assertFalse(Engagement.objects.filter(photo=self.photo).exists())
+
+    def test_query_count_does_not_grow_with_thread_depth(self):
+        engagement = Engagement.objects.create(photo=self.photo)
+        self._add_chain(engagement, 2)
+        shallow_queries, _ = self._get_thread()
+
+        self._add_chain(engagement, 6)
+        deep_queries, results = self._get_thread()
+
+        self.assertEqual(shallow_queries, deep_queries)
+        self.assertEqual(len(results), 2)
+        depth, node = 0, results[1]
+        while node['replies']:
+            depth, node = depth + 1, node['replies'][0]
+        self.assertEqual(depth, 5)
+
+    def test_only_replies_under_the_page_are_loaded(self):
+        engagement = Engagement.objects.create(photo=self.photo)
+        self._add_chain(engagement, 3)
+        self._add_chain(engagement, 3)
+        first_root = Comment.objects.filter(parent__isnull=True).order_by('created_at', 'id').first()
+
+        with mock.patch.object(photo_views, 'attach_replies', wraps=photo_views.attach_replies) as attach:
+            response = self.client.get(self.url, {'limit': 1})
+
+        self.assertEqual([c['id'] for c in response.data['results']], [first_root.id])
+        loaded = {reply.id for reply in attach.call_args.args[1]}
+        self.assertEqual(loaded, set(Comment.objects.filter(root=first_root).values_list('id', flat=True)))
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(response.data['results'][0]['replies'][0]['replies'][0]['content'], '2')
+
+
+    def test_comment_list_query_count_does_not_grow_with_thread_depth(self):
+        engagement = Engagement.objects.create(photo=self.photo)
+        self._add_chain(engagement, 2)
+
+        def list_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get('/api/v1/comments/', {'limit': 1})
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries), response.data['results']
+
+        shallow_queries, _ = list_queries()
+        Comment.objects.filter(parent__isnull=True).delete()
+        self._add_chain(engagement, 6)
+        deep_queries, results = list_queries()
+
+        self.assertEqual(shallow_queries, deep_queries)
+        depth, node = 0, results[0]
+        while node['replies']:
+            depth, node = depth + 1, node['replies'][0]
+        self.assertEqual(depth, 5)
+
+class EngagementCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='liker', email='l@example.com', password='pw')
+        Profile.objects.create(user=cls.user)
+        cls.photo = Photo.objects.create(original_image='photos/originals/test.jpg', uploader=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Ids are reused across test runs, so like state cached in Redis must not outlive a test
+        self._drop_cached_likes()
+        self.addCleanup(self._drop_cached_likes)
+
+    def _drop_cached_likes(self):
+        try:
+            get_redis().delete(*likes._keys(self.photo.id).values())
+            get_redis().srem(likes.DIRTY_KEY, self.photo.id)
+        except redis.RedisError:
+            pass
+
+    def test_like_toggle_returns_count(self):
+        url = f'/api/v1/photos/{self.photo.id}/like/'
+
+        response = self.client.post(url)
+        self.assertEqual((response.data['liked'], response.data['likes_count']), (True, 1))
+
+        response = self.client.post(url)
+        self.assertEqual((response.data['liked'], response.data['likes_count']), (False, 0))
+
+    def test_rebuild_ignores_snapshot_read_before_a_flush(self):
+        other = CustomUser.objects.create_user(username='other', email='o@example.com', password='pw')
+        likes.toggle(self.photo.id, self.user.id)
+        # The cached set expires while the like is still waiting to be flushed
+        keys = likes._keys(self.photo.id)
+        get_redis().delete(keys['users'], keys['count'])
+        pending = likes.drain_pending(10)
+
+        read_db = likes._liked_user_ids
+        snapshots = []
+
+        def flush_after_snapshot(photo_id):
+            # The first snapshot misses the like; the flush then commits it
+            snapshots.append(read_db(photo_id))
+            if len(snapshots) == 1:
+                likes.apply_like_changes(pending)
+                likes.finish_flush(list(pending))
+            return snapshots[-1]
+
+        with mock.patch.object(likes, '_liked_user_ids', side_effect=flush_after_snapshot):
+            likes.toggle(self.photo.id, other.id)
+
+        self.assertEqual(snapshots, [[], [self.user.id]])
+        self.assertEqual(get_redis().smembers(keys['users']), {str(self.user.id), str(other.id)})
+        self.assertEqual(get_redis().get(keys['count']), '2')
+
+    def test_apply_like_changes_persists_latest_state(self):
+        other = CustomUser.objects.create_user(username='other', email='o@example.com', password='pw')
+        Like.objects.create(photo=self.photo, user=other)
+
+        likes.apply_like_changes({self.photo.id: {self.user.id: True, other.id: False, 999999: True}})
+
+        self.assertEqual(list(Like.objects.filter(photo=self.photo).values_list('user_id', flat=True)), [self.user.id])
+        self.assertEqual(Engagement.objects.get(photo=self.photo).likes_count, 1)
+
+    def test_comment_post_updates_counter(self):
+        url = f'/api/v1/photos/{self.photo.id}/comments/'
+        self.client.post(url, {'content': 'first'}, format='json')
+        self.client.post(url, {'content': 'second'}, format='json')
+
+        self.assertEqual(Engagement.objects.get(photo=self.photo).comments_count, 2)
+
+    def test_reconcile_fixes_drift(self):
+        engagement = Engagement.objects.create(photo=self.photo, likes_count=7, comments_count=0)
+        Comment.objects.create(engagement=engagement, author=self.user, content='added outside the API')
+        Like.objects.create(photo=self.photo, user=self.user)
 
-# Create your tests here.
+        self.assertEqual(reconcile_engagement_counters_task(), 1)
+        engagement.refresh_from_db()
+        self.assertEqual((engagement.likes_count, engagement.comments_count), (1, 1))
+        self.assertEqual(reconcile_engagement_counters_task(), 0)
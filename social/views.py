@@ -1,19 +1,58 @@
+from django.db import transaction
 from rest_framework import viewsets, permissions
-from .models import Comment, Like
-from .serializers import CommentSerializer, LikeSerializer
+from events import cache as gallery_cache
+from . import likes
+from .models import Comment, Engagement, Like
+from .serializers import CommentSerializer, LikeSerializer, attach_replies
+from config.pagination import NewestFirstCursorPagination, OldestFirstCursorPagination
 
 class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all().order_by('created_at')
+    queryset = Comment.objects.select_related('author__profile').order_by('created_at', 'id')
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OldestFirstCursorPagination
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            Engagement.objects.adjust_counts(comment.engagement.photo_id, comments=1)
+        gallery_cache.bump(comment.engagement.photo.event_id)
+
+    def perform_destroy(self, instance):
+        photo = instance.engagement.photo
+        with transaction.atomic():
+            # Replies are removed with their parent and leave the count too
+            _, deleted = instance.delete()
+            Engagement.objects.adjust_counts(photo.id, comments=-deleted.get('social.Comment', 0))
+        gallery_cache.bump(photo.event_id)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        # Every reply under the page shares a root with it, so the threads are
+        # loaded in one query whatever their depth
+        roots = {comment.root_id or comment.id for comment in page}
+        if roots:
+            attach_replies(page, Comment.objects.filter(root__in=roots).select_related('author__profile'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class LikeViewSet(viewsets.ModelViewSet):
-    queryset = Like.objects.all()
+    queryset = Like.objects.all().order_by('-created_at', '-id')
     serializer_class = LikeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NewestFirstCursorPagination
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            like = serializer.save(user=self.request.user)
+            Engagement.objects.adjust_counts(like.photo_id, likes=1)
+            transaction.on_commit(lambda: likes.forget(like.photo_id))
+        gallery_cache.bump(like.photo.event_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Engagement.objects.adjust_counts(instance.photo_id, likes=-1)
+            transaction.on_commit(lambda: likes.forget(instance.photo_id))
+        gallery_cache.bump(instance.photo.event_id)
+
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from config import autocomplete
 from .models import Profile
 
 User = get_user_model()
@@ -39,12 +40,14 @@ class UserSerializer(serializers.ModelSerializer):
             Profile.objects.create(user=user, **profile_data)
         else:
             Profile.objects.create(user=user)
+        autocomplete.record_user(user)
             
         return user
 
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', None)
         password = validated_data.pop('password', None)
+        old_username = instance.username
         
         # Update user fields
         for attr, value in validated_data.items():
@@ -54,6 +57,8 @@ class UserSerializer(serializers.ModelSerializer):
             instance.set_password(password)
         
         instance.save()
+        if instance.username != old_username:
+            autocomplete.record_user(instance, op='rename', old_username=old_username)
         
         # Update profile if provided
         if profile_data:
@@ -1,3 +1,52 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from photos.models import Photo, TaggedIn
+from social.models import Engagement, Like
+from .models import CustomUser, Profile
+
+
+class LibraryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        for user in (cls.alice, cls.bob):
+            Profile.objects.create(user=user)
+        cls.liked, cls.tagged, cls.both, cls.other = (
+            Photo.objects.create(original_image=f'photos/originals/{name}.jpg', uploader=cls.bob)
+            for name in ('liked', 'tagged', 'both', 'other')
+        )
+        for photo in (cls.liked, cls.both):
+            Like.objects.create(photo=photo, user=cls.alice)
+            Engagement.objects.adjust_counts(photo.id, likes=1)
+        for photo in (cls.tagged, cls.both):
+            TaggedIn.objects.create(photo=photo, user=cls.alice)
+        TaggedIn.objects.create(photo=cls.both, user=cls.bob)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_liked_and_tagged_photos_once_each(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/users/me/library/')
+
+        self.assertEqual(len(queries), 1)
+        results = response.data['results']
+        self.assertEqual([photo['id'] for photo in results], [self.both.id, self.tagged.id, self.liked.id])
+        both = results[0]
+        self.assertEqual(both['likes_count'], 1)
+        self.assertTrue(both['is_liked'])
+        self.assertEqual(both['tagged_user_ids'], sorted([self.alice.id, self.bob.id]))
+        self.assertFalse(results[1]['is_liked'])
+
+    def test_pages_do_not_overlap(self):
+        first = self.client.get('/api/v1/users/me/library/', {'limit': 2})
+        second = self.client.get(first.data['next'])
+
+        ids = [photo['id'] for photo in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [self.both.id, self.tagged.id, self.liked.id])
+        self.assertIsNone(second.data['next'])
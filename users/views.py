@@ -3,6 +3,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef
+from config import autocomplete
+from config.pagination import NewestFirstCursorPagination
+from photos.models import Photo, TaggedIn
+from photos.serializers import PhotoSerializer, annotate_for_serializer, compile_photo_renderer, select_fields
+from social import likes
+from social.models import Like
 from .serializers import UserSerializer
 
 User = get_user_model()
@@ -12,6 +20,10 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        autocomplete.record_user(instance, op='remove')
+
     @action(detail=False, methods=['get', 'put', 'patch'])
     def me(self, request):
         user = request.user
@@ -25,6 +37,37 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], url_path='me/library')
+    def library(self, request):
+        """
+        Photos the current user liked or is tagged in, newest first, with
+        keyset pagination. Each page is one query: the user's photo ids are a
+        UNION of their likes and tags, and counts, `is_liked` and the ids of
+        everyone tagged (`tagged_user_ids`) are computed alongside.
+        """
+        user = request.user
+        fields = select_fields(request, PhotoSerializer.LIST_FIELDS)
+        mine = Like.objects.filter(user=user).values('photo_id').union(
+            TaggedIn.objects.filter(user=user).values('photo_id'),
+        )
+        queryset = annotate_for_serializer(Photo.objects.filter(pk__in=mine), user, fields).annotate(
+            tagged_user_ids=ArraySubquery(
+                TaggedIn.objects.filter(photo=OuterRef('pk')).order_by('user_id').values('user_id'),
+            ),
+        )
+        paginator = NewestFirstCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        likes.overlay_like_state(page, user)
+
+        render = compile_photo_renderer(fields)
+        if render is not None:
+            data = render(page, request)
+        else:
+            data = PhotoSerializer(page, many=True, fields=fields, context={'request': request}).data
+        for item, photo in zip(data, page):
+            item['tagged_user_ids'] = photo.tagged_user_ids
+        return paginator.get_paginated_response(data)
+
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
     def upload_profile_pic(self, request):
         """Upload profile picture for current user."""